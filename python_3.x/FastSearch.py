@@ -1,12 +1,12 @@
 #!/usr/bin/env python
 
 # system modules
-import os, sys, threading, time
+import os, re, sys, time
 # add subfolders to the path so imports work correctly
 sys.path.append(os.path.abspath(sys.argv[0])[:os.path.abspath(sys.argv[0]).rfind(os.sep)] + os.sep + 'Support' + os.sep)
 
 # my modules
-import FileHandler, Options, Output, Search, Updater
+import Benchmark, Daemon, FileHandler, History, Instruments, Matcher, Options, Output, PathTable, Profiler, Search, Updater
 
 ## FastSearch is designed to be a speedy, feature-rich alternative for local and remote directory searching of both filenames and file contents.
 # FastSearch is dedicated to my older brother, Andrew, who has countless times shown me the meaning of hard work and inspired me not just sit back and
@@ -18,14 +18,9 @@ import FileHandler, Options, Output, Search, Updater
 #
 # @file FastSearch.py
 # @version 1.2
-# @bug The Output.Status thread slows the searches down by a few seconds, which is intolerable
 # @todo Allow pressing of the tab key when specifying a new root directory to display a list of available folders within the current directory (not sure how to implement this one with Python).
-# @todo Allow the user to press escape to terminate the search and display current results (not sure how to implement this one with Python).
 # @todo The 'open' command for a search result only works in posix.  Make it work in Windows.
-# @todo Split the FastSearch walk x number of times and launch a thread to cover each division; allow the user to specify what x should be. Then uncomment the Options menu code.
-# @todo If it's not too much of a performance hit, launch a new thread to scan through past searches to use old results.
 # @todo Add WebDAV server support.
-# @todo Add support for regular expressions.
 
 ## Return code if the program executed and terminated properly.
 EXIT_CLEAN = 0
@@ -39,18 +34,8 @@ EXIT_RESULTS_BAD = 3
 EXIT_DEBUG = 4
 ## Return code if a debug was run and some error occured.
 EXIT_DEBUG_ERROR = 5
-
-## Splits a list num times and returns a list of lists containing the original elements.
-#
-# @param oldList The list to be split.
-# @param num The number of times to split the list.
-# @return A list of num lists containing the original elements.
-def splitList(oldList, num):
-    newList = []
-    size = (1.0 / num) * len(oldList)
-    for i in range(num):
-            newList.append(oldList[int(round(i * size)):int(round((i + 1) * size))])
-    return newList
+## Return code if the program returned results to the caller, but the search was stopped early so they are incomplete.
+EXIT_RESULTS_INCOMPLETE = 6
 
 ## Where the searching call and output calls are instantiated from.
 #
@@ -59,33 +44,279 @@ def splitList(oldList, num):
 # @param optionsList The settings list for how the search will be performed.
 # @param returnResults True if the results are to be returned, False otherwise.
 # @param colors The colors class for output.
+# @param live True if the disk must be walked even when the filename index covers the root directory.
+# @param stream True if each result is to be displayed as soon as it is found.
+# @param stats True if the calls and times of each phase of the search are to be displayed and saved.
+# @param profiler The Profiler.Profiler to profile the search with, or None.
 # @return The exit code and the results.
-def runSearch(path, string, optionsList, returnResults, colors):
+def runSearch(path, string, optionsList, returnResults, colors, live = False, stream = False, stats = False, profiler = None):
     # start the search thread and timer
     startTime = time.time()
-    search = Search.Search(string, optionsList)
+    instruments = None
+    if stats:
+        instruments = Instruments.Instruments()
+    try:
+        search = Search.Search(string, optionsList, live, None, instruments)
+    except re.error as error:
+        print(colors.alert() + 'The search string is not a valid regular expression (' + str(error) + '). Try again.\n' + colors.end())
+        return EXIT_CLEAN, None
+    waitForSearch(search, string, optionsList, colors, stream, profiler)
+    results = search.finish()
+    
+    # calculate the elapsed time
+    elapsedTime = (time.time() - startTime)
+
+    # print the search results
+    Output.results(path, string, optionsList, results, elapsedTime, colors, stream, search.incomplete and search.token.reason or None, search)
+    if not instruments == None:
+        showSearchStats(instruments.report(search, elapsedTime), colors)
+    if not profiler == None:
+        showProfile(profiler, colors)
+    
+    if returnResults:
+        return EXIT_RESULTS, results
+    else:
+        return EXIT_CLEAN, results
+
+## Runs a search thread until it is finished, either displaying the status animation while it runs or displaying each
+# result as soon as it is found. Pressing Ctrl+C stops the search early, keeping the results found so far.
+#
+# @param search The search thread, which has not been started.
+# @param string The string being searched for.
+# @param optionsList The settings list for how the search will be performed.
+# @param colors The colors class for output.
+# @param stream True if each result is to be displayed as soon as it is found.
+# @param profiler The Profiler.Profiler to profile the search with, or None.
+def waitForSearch(search, string, optionsList, colors, stream, profiler = None):
+    if not profiler == None:
+        # the status display would be profiled along with the search, so the search is simply waited on
+        print(colors.green() + 'Profiling the search for \'' + string + '\' ...\n' + colors.end())
+        profiler.start()
+        search.start()
+        try:
+            search.join()
+        except KeyboardInterrupt:
+            search.cancel()
+            search.join()
+        profiler.stop()
+        return
+    
+    if stream:
+        print(colors.green() + 'In ' + optionsList[5] + ' and all its subfolders, FastSearch is %s' % (optionsList[0] and 'performing a Deep Search ' \
+              or 'searching ') + 'for the string \'' + string + '\'.\n' + colors.end())
+        try:
+            for result in search.matches():
+                Output.streamedResult(result, colors)
+        except KeyboardInterrupt:
+            search.cancel()
+        search.join()
+        print('')
+        return
+    
     search.start()
     
     # start the status thread
     status = Output.Status(optionsList, string, search, False, colors)
     status.start()
     
-    # join the threads and grab the results
-    search.join()
-    results = search.finish()
+    # join the threads
+    try:
+        search.join()
+    except KeyboardInterrupt:
+        search.cancel()
+        search.join()
     status.finish()
     status.join()
+
+## Where a batch search for several patterns in one walk, and the output of each pattern's results, are instantiated from.
+#
+# @param path The path of FastSearch.
+# @param patterns The list of strings to be searched for.
+# @param optionsList The settings list for how the search will be performed.
+# @param colors The colors class for output.
+# @param live True if the disk must be walked even when the filename index covers the root directory.
+# @param stream True if each result is to be displayed as soon as it is found.
+# @param stats True if the calls and times of each phase of the search are to be displayed and saved.
+# @param profiler The Profiler.Profiler to profile the search with, or None.
+# @return The exit code and a dictionary from each pattern to its results.
+def runBatchSearch(path, patterns, optionsList, colors, live = False, stream = False, stats = False, profiler = None):
+    # start the search thread and timer
+    startTime = time.time()
+    instruments = None
+    if stats:
+        instruments = Instruments.Instruments()
+    search = Search.BatchSearch(patterns, optionsList, live, None, instruments)
+    waitForSearch(search, ', '.join(search.patterns), optionsList, colors, stream, profiler)
+    results = search.finish()
     
     # calculate the elapsed time
     elapsedTime = (time.time() - startTime)
 
-    # print the search results
-    Output.results(path, string, optionsList, results, elapsedTime, colors)
+    # print the search results of each pattern in turn
+    for pattern in search.patterns:
+        Output.results(path, pattern, optionsList, results[pattern], elapsedTime, colors, stream, search.incomplete and search.token.reason or None, \
+                       search)
+    if not instruments == None:
+        showSearchStats(instruments.report(search, elapsedTime), colors)
+    if not profiler == None:
+        showProfile(profiler, colors)
     
-    if returnResults:
-        return EXIT_RESULTS, results
+    return EXIT_CLEAN, results
+
+## Displays the calls and times of each phase of an instrumented search, and saves them as JSON in the Support directory.
+#
+# @param report The report returned by Instruments.Instruments.report().
+# @param colors The colors class for output.
+def showSearchStats(report, colors):
+    fileName = Instruments.save(report)
+    Output.searchStats(report, fileName, colors)
+
+## Displays the profile of a profiled search, and saves it in the Support directory for reading with pstats.
+#
+# @param profiler The Profiler.Profiler the search was profiled with.
+# @param colors The colors class for output.
+def showProfile(profiler, colors):
+    fileName = profiler.save()
+    allocations = None
+    if profiler.memory:
+        allocations = profiler.allocationSummary()
+    Output.profile(profiler.timeSummary(), allocations, profiler.peakMemory, fileName, colors)
+
+## Reads the patterns for a batch search from the command-line arguments that follow the batch argument, either as
+# one pattern per argument or from a file named after the file argument.
+#
+# @param args The command-line arguments following the batch argument.
+# @return The list of patterns, or None if no patterns could be read.
+def batchPatterns(args):
+    if len(args) > 1 and args[0][1:].lower() in ('f', 'file'):
+        patterns = FileHandler.readPatterns(args[1])
     else:
-        return EXIT_CLEAN, results
+        patterns = [arg.lower() for arg in args]
+    
+    if patterns == None or len([pattern for pattern in patterns if not pattern.strip() == '']) == 0:
+        return None
+    return patterns
+
+## Runs a search thread for the return argument until it is finished, printing each result as a line of plain text as
+# soon as it is found if the caller wants them streamed.
+#
+# @param search The search thread, which has not been started.
+# @param stream True if each result is to be printed as soon as it is found.
+def returnSearch(search, stream):
+    startTime = time.time()
+    try:
+        if stream:
+            for result in search.matches():
+                print(Output.resultLine(result))
+                sys.stdout.flush()
+        else:
+            search.start()
+            search.join()
+    except KeyboardInterrupt:
+        # Ctrl+C stops the search early, keeping the results found so far
+        search.cancel()
+        search.join()
+    # the caller is reading the results, so the report of an instrumented search is only saved
+    if not search.instruments == None:
+        Instruments.save(search.instruments.report(search, time.time() - startTime))
+
+## Runs a search for the return argument in the daemon, if one is running, printing each result as a line of plain text
+# as soon as it is found if the caller wants them streamed.
+#
+# @param string The search string, or None for a batch search.
+# @param patterns The list of patterns of a batch search, or None.
+# @param optionsList The settings list for how the search will be performed.
+# @param live True if the disk must be walked even when the filename index covers the root directory.
+# @param stream True if each result is to be printed as soon as it is found.
+# @return The exit code and the results, or None and None if no daemon is running.
+# @throws re.error If the search string is meant to be a regular expression, but is not a valid one.
+def daemonSearch(string, patterns, optionsList, live, stream):
+    onResult = None
+    if stream:
+        def onResult(result):
+            print(Output.resultLine(result))
+            sys.stdout.flush()
+    
+    try:
+        incomplete, results = Daemon.search(string, patterns, optionsList, live, onResult)
+    except KeyboardInterrupt:
+        # Ctrl+C ends the search in the daemon, and the results it found are lost with the connection
+        return EXIT_RESULTS_INCOMPLETE, None
+    if results == None:
+        return None, None
+    return (incomplete and EXIT_RESULTS_INCOMPLETE or EXIT_RESULTS), results
+
+## Runs the daemon until it is told to stop, or stops the daemon that is running.
+#
+# @param args The command-line arguments following the daemon argument.
+# @param optionsList The settings list for how a directory of the filename index will be listed again.
+# @param colors The colors class for output.
+# @return The exit code.
+def runDaemon(args, optionsList, colors):
+    if not Daemon.available():
+        print(colors.error() + 'The daemon needs Unix domain sockets, which this platform does not have.\n' + colors.end())
+        return EXIT_UNKNOWN_ERROR
+    
+    if len(args) > 0 and args[0].lstrip('-').lower() == 'stop':
+        if Daemon.stop():
+            print(colors.alert() + 'The daemon was told to stop.\n' + colors.end())
+        else:
+            print(colors.alert() + 'The daemon is not running.\n' + colors.end())
+        return EXIT_CLEAN
+    
+    try:
+        server = Daemon.Server(optionsList)
+    except OSError as error:
+        print(colors.error() + 'The daemon could not be started (' + str(error) + ').\n' + colors.end())
+        return EXIT_UNKNOWN_ERROR
+    print(colors.alert() + 'The daemon is answering searches with the return argument at ' + Daemon.socketPath() + '.\n' \
+          'Stop it with the daemon stop argument, or Ctrl+C.\n' + colors.end())
+    if not server.watcher == None:
+        print(colors.alert() + 'Watching the ' + str(len(server.watcher.watches)) + ' directories of the filename index for changes.\n' + colors.end())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    if not server.watcher == None and server.watcher.numChanges > 0:
+        print(colors.alert() + 'The filename index was kept up to date with ' + str(server.watcher.numChanges) + ' change%s.\n' % (server.watcher.numChanges != 1 and 's' or '') + colors.end())
+    print(colors.alert() + 'The daemon stopped after ' + str(server.numSearches) + ' search%s.\n' % (server.numSearches != 1 and 'es' or '') + colors.end())
+    return EXIT_CLEAN
+
+## Displays the recent searches and, if the user picks one, displays its results again without searching.
+#
+# @param fastSearchDir The location on the local computer of FastSearch.
+# @param optionsList The settings list for how the search will be performed.
+# @param colors The colors class for output.
+# @param results The results currently available to be opened from the main menu.
+# @return The results of the search picked, or the results passed in if none was picked.
+def showRecentSearches(fastSearchDir, optionsList, colors, results):
+    try:
+        searches = History.recent()
+        Output.recentSearches(searches, colors)
+        if len(searches) == 0:
+            return results
+
+        string = input(colors.blue() + 'Enter the number of a search to show its results again, or press Enter to go back: ' + colors.end()).strip('[] ')
+        if not string.isdigit() or int(string) < 1 or int(string) > len(searches):
+            print('')
+            return results
+        search = searches[int(string) - 1]
+        pastResults = History.results(search[0])
+    except History.Error:
+        print(colors.error() + 'The recent searches could not be read.\n' + colors.end())
+        return results
+    if pastResults == None:
+        print(colors.alert() + 'That search is no longer in the recent searches.\n' + colors.end())
+        return results
+
+    # display the results as the search displayed them, without saving them to the recent searches again
+    pastOptions = list(optionsList)
+    pastOptions[0], pastOptions[1], pastOptions[3], pastOptions[4], pastOptions[5], pastOptions[8] = bool(search[4]), search[5], search[6], \
+        bool(search[7]), search[2], False
+    print('')
+    Output.results(fastSearchDir, search[3], pastOptions, pastResults, search[9], colors)
+    return pastResults
 
 ## Checks to see if any updates are available, prompts the user if there are, and downloads and installs them.
 #
@@ -109,105 +340,34 @@ def runUpdater(fastSearchDir, colors):
         else:
             print(colors.alert() + 'There are no updates available at this time.\n' + colors.end())
 
-## The debug thread for a standard os.walk comparison.
-class Debug(threading.Thread):
-    ## Initialize the local Debug class with passed in variables.
-    #
-    # @param self A pointer to the local class.
-    # @param string The search string.
-    # @param optionsList The default settings for a debug search.
-    def __init__(self, string, optionsList):
-        threading.Thread.__init__(self)
-        
-        ## The search string to be found.
-        self.string = string
-        ## The settings list for how the search will be performed.
-        self.optionsList = optionsList
-        
-        ## The list of folders found matching the search string.
-        self.folderResults = []
-        ## The list of files found matching the search string.
-        self.fileResults = []
-        ## The list of files containing the search string.
-        self.inFileResults = []
-        
-        ## The current directory being searched.
-        self.curDir = None
-    
-    ## Run the debug os.walk method in its own thread.
-    #
-    # @param self A pointer to the loca class.
-    def run(self):
-        for root, dirs, files in os.walk(self.optionsList[5]):
-            for folder in dirs:
-                if folder == '':
-                    pass
-            for fileName in files:
-                if fileName == '':
-                    pass
-
-## Runs the debugging procedure for FastSearch.
+## Runs the benchmark of every search engine over a synthetic directory tree, prints a summary of each engine, and
+# writes the full report as JSON.
 #
 # @param args The command-line arguments.
 # @param colors The colors class for output.
 # @return 4 if the debug was successful, 5 if an unknown error occured.
 def debug(args, colors):
-    start = 0
     try:
-        stop = int(args[2])
-    except:
-        stop = 5
+        settings = Benchmark.readSettings(args[2:])
+    except ValueError:
+        print(colors.alert() + 'The debug settings were not valid. View the help menu for assistance.\n' + colors.end())
+        return EXIT_DEBUG_ERROR
     
-    differences = []
     print(colors.alert() + '---RUNNING IN DEBUG MODE---')
-    for i in range(start, stop):
-        print('--Running Iteration ' + str(i + 1) + ' of ' + str(stop) + '--')
-        startTimeOs = time.time()
-        print('::Running Standard Search Algorithm Benchmark::')
-        print('Running Standard Search: ' + str(startTimeOs))
-        debug = Debug('', [False, 2, True, 0, True, os.getcwd(), None, True, True, 1])
-        debug.start()
-        debug.join()
-        endTimeOs = time.time()
-        print('Standard Search complete: ' + str(endTimeOs))
-        elapsedTimeOs = endTimeOs - startTimeOs
-        print('Total time for Standard Search: ' + str(elapsedTimeOs))
-        print('\n::Running Single-Threaded FastSearch Algorithm Benchmark::')
-        startTimeFsS = time.time()
-        print('Running Single-Threaded FastSearch: ' + str(startTimeFsS))
-        search = Search.Search('', [False, 2, True, 0, True, os.getcwd(), None, True, True, 1])
-        search.start()
-        search.join()
-        endTimeFsS = time.time()
-        print('Single-Threaded FastSearch complete: ' + str(endTimeFsS))
-        elapsedTimeFsS = endTimeFsS - startTimeFsS
-        print('Total time for Single-Threaded FastSearch: ' + str(elapsedTimeFsS))
-        print('\n::Running Multi-Threaded FastSearch Algorithm Benchmark::')
-        startTimeFsM = time.time()
-        print('Running Multi-Threaded FastSearch: ' + str(startTimeFsM))
-        search = Search.Search('', [False, 2, True, 0, True, os.getcwd(), None, True, True, 2])
-        search.start()
-        search.join()
-        endTimeFsM = time.time()
-        print('Multi-Threaded FastSearch complete: ' + str(endTimeFsM))
-        elapsedTimeFsM = endTimeFsM - startTimeFsM
-        print('Total time for Multi-Threaded FastSearch: ' + str(elapsedTimeFsM))
-        print('\n::Iteration ' + str(i + 1) + ' of ' + str(stop) + ' Complete::')
-        differences.append(elapsedTimeFsS - elapsedTimeOs)
-        print('Difference between Standard Search and Single-Threaded FastSearch: ' + str(differences[i]) + '\n')
-        print('Difference between Single and Multi-Threaded FastSearch: ' + str(elapsedTimeFsS - elapsedTimeFsM) + '\n')
-    
-    total = 0
-    for item in differences:
-        total += item
-    avg = total / len(differences)
+    report = Benchmark.run(settings)
     
     print('----------------------------')
-    if avg > 0:
-        print('On averge, Standard Search was ' + str(avg) + ' seconds faster than Single-Threaded FastSearch.')
-    else:
-        print('On averge, Single-Threaded FastSearch was ' + str(avg * (-1)) + ' seconds faster than Standard Search.')
+    print('%-20s %12s %12s %12s %14s %10s' % ('Engine', 'Cold Median', 'Warm Median', 'Warm p95', 'Entries/s', 'MB/s'))
+    for name, result in report['engines'].items():
+        print('%-20s %12.4f %12.4f %12.4f %14s %10s' % (name, result['cold']['median'], result['warm']['median'], result['warm']['p95'], \
+              result['warm']['entriesPerSecond'], result['warm']['mbPerSecond'] == None and '-' or result['warm']['mbPerSecond']))
     print('----------------------------')
+    
+    text = Benchmark.writeReport(report, settings['json'])
+    if settings['json'] == None:
+        print(text)
+    else:
+        print('The full report was written to ' + settings['json'])
     print('---EXITING DEBUG MODE---\n' + colors.end())
     
     return EXIT_DEBUG
@@ -240,8 +400,46 @@ def main(args):
     # instantiate pre-run update condition
     preRunUpdateCheck = False
     
+    # a live walk skips the filename index for this run only
+    live = False
+    for arg in args[1:]:
+        if arg.lower() in ('-l', '-live'):
+            live = True
+    args = [arg for arg in args if not arg.lower() in ('-l', '-live')]
+    
+    # each result may be displayed as soon as it is found for this run only
+    stream = False
+    for arg in args[1:]:
+        if arg.lower() == '-stream':
+            stream = True
+    args = [arg for arg in args if not arg.lower() == '-stream']
+    
+    # the calls and times of each phase of the search may be counted for this run only
+    stats = False
+    for arg in args[1:]:
+        if arg.lower() == '-stats':
+            stats = True
+    args = [arg for arg in args if not arg.lower() == '-stats']
+    
+    # the search may be profiled for this run only, optionally along with its memory allocations
+    profiler = None
+    if '-profile' in [arg.lower() for arg in args[1:]]:
+        profiler = Profiler.Profiler('-memory' in [arg.lower() for arg in args[1:]])
+    args = [arg for arg in args if not arg.lower() in ('-profile', '-memory')]
+    
+    # the search string may be matched as a pattern or regular expression for this run only
+    matchMode = None
+    for arg in args[1:]:
+        if arg.lower() in ('-g', '-glob'):
+            matchMode = Matcher.MATCH_GLOB
+        elif arg.lower() in ('-re', '-regex'):
+            matchMode = Matcher.MATCH_REGEX
+    args = [arg for arg in args if not arg.lower() in ('-g', '-glob', '-re', '-regex')]
+    
     # declare options list
     optionsList = FileHandler.initializeOptionsList(fastSearchDir, [])
+    if not matchMode == None:
+        optionsList[18] = matchMode
     colors = Output.Colors(optionsList)
     
     # FastSearch has been updated
@@ -255,6 +453,8 @@ def main(args):
     if len(args) > 1 and args[1][1:].lower() in ('r', 'return'):
         if len(args) > 2:
             optionsList = FileHandler.defaultList
+            if not matchMode == None:
+                optionsList[18] = matchMode
             if len(args) > 3 and args[2][1:].lower() in ('d', 'deep', 'deepsearch', 'ds'):
                 optionsList[0] = True
                 start = 3
@@ -265,14 +465,47 @@ def main(args):
             if args[start][1:] in ('d', 'deep', 'deepsearch', 'ds'):
                 return EXIT_RESULTS_BAD, None
             
-            string = args[start].lower()            
+            # search for every pattern in one walk and return the results of each
+            if args[start][1:].lower() in ('b', 'batch'):
+                patterns = batchPatterns(args[start + 1:])
+                if patterns == None:
+                    return EXIT_RESULTS_BAD, None
+                
+                # a running daemon answers the search with its caches already warm
+                if not stats:
+                    code, results = daemonSearch(None, patterns, optionsList, live, stream)
+                    if not code == None:
+                        return code, results
+                
+                instruments = None
+                if stats:
+                    instruments = Instruments.Instruments()
+                search = Search.BatchSearch(patterns, optionsList, live, None, instruments)
+                returnSearch(search, stream)
+                return (search.incomplete and EXIT_RESULTS_INCOMPLETE or EXIT_RESULTS), PathTable.toLists(search.finish())
+            
+            string = args[start]
             for i in range(start + 1, len(args)):
-                string += ' ' + args[i].lower()
+                string += ' ' + args[i]
             
-            search = Search.Search(string, optionsList, colors)
-            search.start()
-            search.join()
-            return EXIT_RESULTS, search.finish()
+            # a running daemon answers the search with its caches already warm
+            if not stats:
+                try:
+                    code, results = daemonSearch(string, None, optionsList, live, stream)
+                except re.error:
+                    return EXIT_RESULTS_BAD, None
+                if not code == None:
+                    return code, results
+            
+            instruments = None
+            if stats:
+                instruments = Instruments.Instruments()
+            try:
+                search = Search.Search(string, optionsList, live, None, instruments)
+            except re.error:
+                return EXIT_RESULTS_BAD, None
+            returnSearch(search, stream)
+            return (search.incomplete and EXIT_RESULTS_INCOMPLETE or EXIT_RESULTS), PathTable.toLists(search.finish())
         else:
             return EXIT_RESULTS_BAD, None
     
@@ -281,7 +514,17 @@ def main(args):
     # if arguments are specified, use them as the search string
     if len(args) > 1 and not args[1] == '-updatesuccess':
         if args[1].startswith('-'):
-            if len(args) == 2 and not args[1][1:].lower() in ('d', 'debug'):
+            # search for every pattern in one walk
+            if args[1][1:].lower() in ('b', 'batch'):
+                patterns = batchPatterns(args[2:])
+                if patterns != None:
+                    code = runBatchSearch(fastSearchDir, patterns, optionsList, colors, live, stream, stats, profiler)[0]
+                else:
+                    print(colors.alert() + 'No patterns were given for the batch search. View the help menu for assistance.\n' + colors.end())
+            # answer searches with the return argument from a long-running process
+            elif args[1][1:].lower() == 'daemon':
+                return runDaemon(args[2:], optionsList, colors)
+            elif len(args) == 2 and not args[1][1:].lower() in ('d', 'debug'):
                 if args[1][1:].lower() in ('help', 'h'):
                     Output.help(colors)
                 elif args[1][1:].lower() in ('update', 'updates', 'u'):
@@ -292,7 +535,7 @@ def main(args):
                     optionsList = Options.options(fastSearchDir, optionsList, colors)
                 else:
                     print(colors.alert() + 'The command-line arguments were not valid. View the help menu for assistance.\n' + colors.end())
-            # run a benchmark comparing a standard os.walk method (with no comparisons) to the FastSearch localWalk method
+            # benchmark every search engine over a synthetic directory tree
             elif args[1][1:].lower() in ('d', 'debug'):
                 try:
                     code = debug(args, colors)
@@ -303,12 +546,12 @@ def main(args):
             else:
                 print(colors.alert() + 'The command-line arguments were not valid. View the help menu for assistance.\n' + colors.end())
         else:
-            string = args[1].lower()
+            string = args[1]
             for i in range(2, len(args)):
-                string += ' ' + args[i].lower()
+                string += ' ' + args[i]
     
             # the search will be launched immedietly with the current working directory as root
-            code = runSearch(fastSearchDir, string, optionsList, False, colors)[0]
+            code = runSearch(fastSearchDir, string, optionsList, False, colors, live, stream, stats, profiler)[0]
     # if no arguments were specified
     elif len(args) == 1:
         if preRunUpdateCheck:
@@ -320,7 +563,7 @@ def main(args):
     # loop until the user wants out
     while looping:
         # retreive a command from the user
-        string = input(colors.blue() + 'Type (s)earch, (o)ptions, (u)pdate, (h)elp, (c)redits, or (q)uit: ' + colors.end()).lower()
+        string = input(colors.blue() + 'Type (s)earch, (r)ecent, (o)ptions, (u)pdate, (h)elp, (c)redits, or (q)uit: ' + colors.end()).lower()
         
         # the user entered a number
         if string.strip('[]').isdigit():
@@ -351,9 +594,12 @@ def main(args):
         # the user wants to search
         if string in ('s', 'search', 'f', 'find'):
             # retreive the string to search for from the user
-            string = input(colors.blue() + 'Enter a search string: ' + colors.end()).lower()
+            string = input(colors.blue() + 'Enter a search string: ' + colors.end())
             
-            code, results = runSearch(fastSearchDir, string, optionsList, False, colors)
+            code, results = runSearch(fastSearchDir, string, optionsList, False, colors, live, stream, stats, profiler)
+        # the user wants to see the recent searches
+        elif string in ('r', 'recent', 'recent searches', 'history'):
+            results = showRecentSearches(fastSearchDir, optionsList, colors, results)
         # the user wants to check for updates
         elif string in ('u', 'update', 'updates'):
             runUpdater(fastSearchDir, colors)
@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+
+# system modules
+import json, logging, multiprocessing, os, platform, random, shutil, tempfile, threading, time
+
+# my modules
+import Binary, Cache, ContentIndex, FileHandler, Index, Listings, Matcher, Remote, Search
+
+## This module benchmarks the search engines against a synthetic directory tree of a chosen shape, so that runs are
+# repeatable and can be compared between versions. Every engine (each walker, the parallel walk, the filename index, each
+# Deep Search engine, the process pool, the content index, and FTP against a local server) is run cold and warm, several
+# times each, and the median and 95th percentile times are reported along with entries and megabytes searched per second.
+# Cold runs start with every cache FastSearch keeps emptied, and the tree's files dropped from the operating system's
+# page cache where it allows that; warm runs follow a run that is thrown away. The Support directory is never touched:
+# everything the engines would keep there is kept in a temporary directory instead.
+#
+# @file Benchmark.py
+# @version 1.2
+
+## The string planted in the names and contents of the matching files of the synthetic tree.
+NEEDLE = 'fastsearchneedle'
+## The words the text files of the synthetic tree are made of.
+WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet', 'kilo', 'lima', \
+         'mike', 'november', 'oscar', 'papa', 'quebec', 'romeo', 'sierra', 'tango', 'uniform', 'victor', 'whiskey', 'xray']
+
+## The default shape of the synthetic tree, and the default number of runs of each engine.
+DEFAULT_SETTINGS = {'width': 4, 'depth': 3, 'files': 20, 'size': 8192, 'binary': 0.1, 'density': 0.05, 'seed': 1, \
+                    'reps': 5, 'threads': 4, 'processes': 2, 'engines': 'all', 'root': None, 'json': None, 'keep': False}
+
+## Builds a synthetic directory tree. Every directory holds the given number of files and subdirectories, down to the
+# given depth. A share of the files are binary, and a share of the files have the needle in their names and, if they are
+# text, on one of their lines.
+#
+# @param top The directory to build the tree in.
+# @param width The number of subdirectories in each directory.
+# @param depth The number of levels of subdirectories.
+# @param files The number of files in each directory.
+# @param size The size of each file, in bytes.
+# @param binary The share of the files that are binary.
+# @param density The share of the files that match the needle.
+# @param seed The seed of the random choices, so that the same settings always build the same tree.
+# @return The number of directories and the number of files built.
+def makeTree(top, width, depth, files, size, binary, density, seed):
+    generator = random.Random(seed)
+    numDirs, numFiles = 0, 0
+    pending = [(top, 0)]
+    while len(pending) > 0:
+        path, level = pending.pop()
+        os.makedirs(path, exist_ok = True)
+        numDirs += 1
+
+        for i in range(files):
+            matches = generator.random() < density
+            isBinary = generator.random() < binary
+            name = 'file' + str(i) + (matches and '_' + NEEDLE or '') + (isBinary and '.dat' or '.txt')
+            if isBinary:
+                data = bytes([generator.randrange(256) for j in range(min(size, 4096))])
+                data = (data * (size // len(data) + 1))[:size]
+            else:
+                lines = []
+                length = 0
+                while length < size:
+                    line = ' '.join([generator.choice(WORDS) for j in range(10)])
+                    lines.append(line)
+                    length += len(line) + 1
+                if matches:
+                    lines[generator.randrange(len(lines))] += ' ' + NEEDLE
+                data = ('\n'.join(lines) + '\n').encode('utf-8')
+            dataFile = open(os.path.join(path, name), 'wb')
+            try:
+                dataFile.write(data)
+            finally:
+                dataFile.close()
+            numFiles += 1
+
+        if level < depth:
+            for i in range(width):
+                pending.append((os.path.join(path, 'dir' + str(i)), level + 1))
+    return numDirs, numFiles
+
+## Drops the files of a tree from the operating system's page cache, so that the next read comes from the disk. Only
+# possible where os.posix_fadvise is available; elsewhere, cold runs only start with FastSearch's own caches emptied.
+#
+# @param top The top directory of the tree.
+# @return True if the files were dropped, False otherwise.
+def dropPageCache(top):
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for root, dirs, files in os.walk(top):
+        for fileName in files:
+            try:
+                fd = os.open(os.path.join(root, fileName), os.O_RDONLY)
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+    return True
+
+## Empties every cache FastSearch keeps between searches in this process, along with the files they are kept in. The
+# filename and content indexes are only read from disk again, since building them is not part of a search.
+#
+# @param supportDir The directory the caches are kept in during the benchmark.
+def clearCaches(supportDir):
+    Cache.resultCache.clear()
+    Index.loadedIndex = None
+    ContentIndex.loadedIndex = None
+    Binary.cache = None
+    Binary.added, Binary.dirty = {}, False
+    Listings.cache = None
+    Listings.dirty = False
+    for fileName in (Binary.binaryCacheFileName, Listings.listingsFileName):
+        if os.path.exists(supportDir + fileName):
+            os.remove(supportDir + fileName)
+
+## Returns the given percentile of a list of times, by the nearest-rank method.
+#
+# @param times The list of times.
+# @param percent The percentile wanted.
+# @return The time.
+def percentile(times, percent):
+    ordered = sorted(times)
+    rank = max(1, int(-(-percent * len(ordered) // 100)))
+    return ordered[rank - 1]
+
+## Returns the summary of the runs of an engine.
+#
+# @param times The list of times of the runs.
+# @param numEntries The number of directories and files searched in each run.
+# @param numBytes The number of bytes of file contents searched in each run.
+# @param numResults The number of results found in each run.
+# @return The summary, ready to be written as JSON.
+def summarize(times, numEntries, numBytes, numResults):
+    median = percentile(times, 50)
+    return {'runs': [round(elapsed, 6) for elapsed in times], 'median': round(median, 6), 'p95': round(percentile(times, 95), 6), \
+            'entriesPerSecond': median > 0 and round(numEntries / median, 1) or None, \
+            'mbPerSecond': numBytes > 0 and median > 0 and round(numBytes / median / (1024 * 1024), 2) or None, \
+            'results': numResults}
+
+## Returns the options list a benchmark search starts from: a Full Search of the given root, with every cache and limit
+# turned off, so that each run does the same work.
+#
+# @param top The root directory.
+# @return The options list.
+def baseOptions(top):
+    return [False, 2, True, 0, True, top, None, False, False, 1, 0, False, Search.WALKER_STANDARD, 0, False, False, \
+            Search.DEEP_SEARCH_MAPPED, set(FileHandler.defaultDeepSearchExclude), Matcher.MATCH_LITERAL, 0, 0, 0]
+
+## Returns the engines to benchmark: the name of each, and the options it changes from the base options.
+#
+# @param settings The benchmark settings.
+# @return The list of the name and the changes (a dictionary from option index to value) of each engine.
+def localEngines(settings):
+    return [('walk.standard', {12: Search.WALKER_STANDARD}),
+            ('walk.scandir', {12: Search.WALKER_SCANDIR}),
+            ('walk.parallel', {12: Search.WALKER_SCANDIR, 9: settings['threads']}),
+            ('walk.index', {14: True}),
+            ('deep.lines', {0: True, 16: Search.DEEP_SEARCH_LINES}),
+            ('deep.mapped', {0: True, 16: Search.DEEP_SEARCH_MAPPED}),
+            ('deep.processes', {0: True, 13: settings['processes']}),
+            ('deep.contentIndex', {0: True, 14: True, 15: True})]
+
+## Times a single search.
+#
+# @param optionsList The options list of the search.
+# @return The time the search took, and the finished search.
+def timeSearch(optionsList):
+    search = Search.Search(NEEDLE, optionsList)
+    start = time.perf_counter()
+    search.start()
+    search.join()
+    return time.perf_counter() - start, search
+
+## Times a plain os.walk of the tree, which lists every directory without looking at a single name, as the baseline
+# every walker is measured against.
+#
+# @param top The root directory.
+# @return The time the walk took, and the number of directories and files walked.
+def timeOsWalk(top):
+    numEntries = 0
+    start = time.perf_counter()
+    for root, dirs, files in os.walk(top):
+        numEntries += 1 + len(files)
+    return time.perf_counter() - start, numEntries
+
+## Runs one engine cold and warm, the given number of times each.
+#
+# @param run The function running the engine once, returning the time taken, the number of entries searched, the number
+# of bytes searched, and the number of results.
+# @param prepare The function run before every cold run, which empties the caches.
+# @param reps The number of runs of each kind.
+# @return The summaries of the cold and warm runs.
+def measure(run, prepare, reps):
+    report = {}
+    for kind in ('cold', 'warm'):
+        times = []
+        if kind == 'warm':
+            # the first warm run only fills the caches
+            run()
+        for i in range(reps):
+            if kind == 'cold':
+                prepare()
+            elapsed, numEntries, numBytes, numResults = run()
+            times.append(elapsed)
+        report[kind] = summarize(times, numEntries, numBytes, numResults)
+    return report
+
+## Starts an FTP server on a free local port, serving the given directory to an anonymous user, if pyftpdlib is
+# installed.
+#
+# @param top The directory to be served.
+# @return The server and its port, or None and None if pyftpdlib is not installed.
+def startFtpServer(top):
+    try:
+        from pyftpdlib.authorizers import DummyAuthorizer
+        from pyftpdlib.handlers import FTPHandler
+        from pyftpdlib.servers import ThreadedFTPServer
+    except ImportError:
+        return None, None
+
+    # the server logs every command it is sent, which would bury the progress of the benchmark
+    logger = logging.getLogger('pyftpdlib')
+    if len(logger.handlers) == 0:
+        logger.addHandler(logging.NullHandler())
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(top)
+    handler = type('BenchmarkHandler', (FTPHandler,), {'authorizer': authorizer})
+    server = ThreadedFTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target = server.serve_forever, kwargs = {'handle_exit': False})
+    thread.daemon = True
+    thread.start()
+    return server, server.socket.getsockname()[1]
+
+## Reads the benchmark settings from the command-line arguments that follow the debug argument: a bare number is the
+# number of runs of each engine, and anything else is a setting written as name=value.
+#
+# @param args The command-line arguments following the debug argument.
+# @return The settings.
+# @throws ValueError If an argument is not a known setting.
+def readSettings(args):
+    settings = dict(DEFAULT_SETTINGS)
+    for arg in args:
+        if arg.isdigit():
+            settings['reps'] = int(arg)
+            continue
+        name, _, value = arg.lstrip('-').partition('=')
+        if not name in settings:
+            raise ValueError('unknown benchmark setting: ' + name)
+        if name in ('root', 'json', 'engines'):
+            settings[name] = value
+        elif name == 'keep':
+            settings[name] = value.lower() in ('', '1', 'true', 'yes')
+        elif name in ('binary', 'density'):
+            settings[name] = float(value)
+        else:
+            settings[name] = int(value)
+    return settings
+
+## Runs the benchmark.
+#
+# @param settings The benchmark settings (see DEFAULT_SETTINGS).
+# @param progress The function each line of progress is handed to.
+# @return The report, ready to be written as JSON.
+def run(settings, progress = print):
+    workDir = tempfile.mkdtemp(prefix = 'FastSearchBenchmark')
+    supportDir = os.path.join(workDir, 'Support') + os.sep
+    os.makedirs(supportDir)
+    # keep everything the engines write out of the real Support directory
+    savedDirs = (Binary.supportDir, Index.supportDir, ContentIndex.supportDir, Listings.supportDir)
+    Binary.supportDir = Index.supportDir = ContentIndex.supportDir = Listings.supportDir = supportDir
+    savedIndexes = (Index.loadedIndex, ContentIndex.loadedIndex)
+    Index.loadedIndex = ContentIndex.loadedIndex = None
+
+    try:
+        top = settings['root']
+        if top == None:
+            top = os.path.join(workDir, 'tree')
+            progress('Building the synthetic tree in ' + top + ' ...')
+            numDirs, numFiles = makeTree(top, settings['width'], settings['depth'], settings['files'], settings['size'], \
+                                         settings['binary'], settings['density'], settings['seed'])
+        else:
+            top = os.path.abspath(top)
+            numDirs, numFiles = 0, 0
+            for root, dirs, files in os.walk(top):
+                numDirs += 1
+                numFiles += len(files)
+
+        report = {'version': 1, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(), \
+                  'platform': platform.platform(), 'cpus': multiprocessing.cpu_count(), 'pageCacheDropped': dropPageCache(top), \
+                  'settings': dict(settings, root = top), 'tree': {'dirs': numDirs, 'files': numFiles}, 'engines': {}}
+        wanted = None
+        if not settings['engines'] == 'all':
+            wanted = settings['engines'].split(',')
+
+        def prepare():
+            clearCaches(supportDir)
+            dropPageCache(top)
+
+        if wanted == None or 'os.walk' in wanted:
+            progress('Running os.walk ...')
+            def runOsWalk():
+                elapsed, numEntries = timeOsWalk(top)
+                return elapsed, numEntries, 0, 0
+            report['engines']['os.walk'] = measure(runOsWalk, prepare, settings['reps'])
+
+        engines = localEngines(settings)
+        for name, changes in engines:
+            if not wanted == None and not name in wanted:
+                continue
+            progress('Running ' + name + ' ...')
+            optionsList = baseOptions(top)
+            for index, value in changes.items():
+                optionsList[index] = value
+            if optionsList[14]:
+                Index.rebuild(top, optionsList)
+
+            def runEngine():
+                elapsed, search = timeSearch(optionsList)
+                results = search.finish()
+                return elapsed, search.numDirs + search.numFiles, search.numBytes, len(results[0]) + len(results[1]) + len(results[2])
+            report['engines'][name] = measure(runEngine, prepare, settings['reps'])
+            Index.loadedIndex = ContentIndex.loadedIndex = None
+            for fileName in (Index.indexFileName, ContentIndex.contentIndexFileName):
+                if os.path.exists(supportDir + fileName):
+                    os.remove(supportDir + fileName)
+
+        ftpEngines = [name for name in ('ftp.walk', 'ftp.deep') if wanted == None or name in wanted]
+        if len(ftpEngines) > 0:
+            server, port = startFtpServer(top)
+            if server == None:
+                progress('Skipping the FTP engines, since pyftpdlib is not installed ...')
+            else:
+                try:
+                    for name in ftpEngines:
+                        progress('Running ' + name + ' ...')
+                        ftp = Remote.Connection('127.0.0.1', port = port)
+                        ftp.login()
+                        optionsList = baseOptions('127.0.0.1')
+                        optionsList[6] = ftp
+                        optionsList[9] = settings['threads']
+                        optionsList[0] = name == 'ftp.deep'
+
+                        def runFtp():
+                            elapsed, search = timeSearch(optionsList)
+                            results = search.finish()
+                            return elapsed, search.numDirs + search.numFiles, search.numBytes, len(results[0]) + len(results[1]) + len(results[2])
+                        try:
+                            report['engines'][name] = measure(runFtp, prepare, settings['reps'])
+                        finally:
+                            ftp.close()
+                finally:
+                    server.close_all()
+        return report
+    finally:
+        Binary.supportDir, Index.supportDir, ContentIndex.supportDir, Listings.supportDir = savedDirs
+        Index.loadedIndex, ContentIndex.loadedIndex = savedIndexes
+        clearCaches(supportDir)
+        Binary.added, Binary.dirty = {}, False
+        Listings.dirty = False
+        if settings['keep']:
+            progress('The synthetic tree was kept in ' + workDir)
+        else:
+            shutil.rmtree(workDir, ignore_errors = True)
+
+## Writes a benchmark report as JSON.
+#
+# @param report The report returned by run().
+# @param fileName The file to write it to, or None to return it as a string instead.
+# @return The JSON.
+def writeReport(report, fileName):
+    text = json.dumps(report, indent = 2, sort_keys = True)
+    if not fileName == None:
+        reportFile = open(fileName, 'w')
+        try:
+            reportFile.write(text + '\n')
+        finally:
+            reportFile.close()
+    return text
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+# system modules
+import os, pickle, threading
+
+## This module decides whether a file is binary, and so not worth a Deep Search, by looking at its first block of bytes.
+# A verdict is remembered for as long as the file's inode, size, and mtime stay the same, and the verdicts are kept in the
+# Support directory so that later searches never read a known file's first block again.
+#
+# @file Binary.py
+# @version 1.2
+
+## The Support directory, where the cache is stored alongside the options file.
+supportDir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+## The binary cache file name.
+binaryCacheFileName = 'BinaryCache.dat'
+## The number of bytes read from the start of a file to decide whether it is binary.
+BLOCK_SIZE = 8192
+## A file whose first block has more than this share of control characters is binary.
+MAX_NON_TEXT_RATIO = 0.3
+## The most verdicts kept in the cache; the oldest are dropped first.
+MAX_CACHE_ENTRIES = 1000000
+## The most batches of new verdicts appended to the cache file before it is written again as a whole.
+MAX_APPENDED_BATCHES = 64
+
+## The bytes that may appear in a text file: the printable range, the common whitespace and control characters, and every
+# byte with the high bit set, since those make up UTF-8 and the other common text encodings.
+textBytes = bytes([7, 8, 9, 10, 12, 13, 27]) + bytes(range(0x20, 0x7f)) + bytes(range(0x80, 0x100))
+
+## Maps the device, inode, size, and mtime of each file seen to True if it is binary, False otherwise.
+cache = None
+## The verdicts found since the cache was last written to the Support directory.
+added = {}
+## True if verdicts were dropped from the cache, so that the cache file must be written again as a whole.
+dirty = False
+## The number of batches of new verdicts appended to the cache file since it was last written as a whole.
+numBatches = 0
+## Guards loading and writing the cache.
+lock = threading.Lock()
+
+## Decides whether a block of bytes from the start of a file is binary.
+#
+# @param block The bytes.
+# @return True if the bytes are binary, False if they are text.
+def isBinaryBlock(block):
+    if len(block) == 0:
+        return False
+    if b'\0' in block:
+        return True
+    return len(block.translate(None, textBytes)) > MAX_NON_TEXT_RATIO * len(block)
+
+## Checks to see if a file is binary, reading its first block only if the cache has no verdict for it.
+#
+# @param path The full path of the file.
+# @param stat The result of os.stat for the file, if the caller already has it.
+# @return True if the file is binary, False if it is text or could not be read.
+def isBinary(path, stat = None):
+    global dirty
+
+    if stat == None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+    key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    verdicts = load()
+    verdict = verdicts.get(key)
+    if verdict != None:
+        return verdict
+
+    try:
+        binaryFile = open(path, 'rb')
+        try:
+            verdict = isBinaryBlock(binaryFile.read(BLOCK_SIZE))
+        finally:
+            binaryFile.close()
+    except (IOError, OSError):
+        return False
+
+    with lock:
+        # make room by dropping the oldest verdicts
+        if len(verdicts) >= MAX_CACHE_ENTRIES:
+            for oldKey in list(verdicts)[:MAX_CACHE_ENTRIES // 10]:
+                verdicts.pop(oldKey, None)
+            dirty = True
+        verdicts[key] = verdict
+        added[key] = verdict
+
+    return verdict
+
+## Reads the cache from the Support directory, if it has not been read already. The file holds the whole cache as it
+# was last written, followed by each batch of verdicts appended since.
+#
+# @return The cache.
+def load():
+    global cache, dirty, numBatches
+
+    if cache != None:
+        return cache
+
+    with lock:
+        if cache == None:
+            verdicts = {}
+            numBatches = 0
+            try:
+                cacheFile = open(supportDir + binaryCacheFileName, 'rb')
+                try:
+                    verdicts = pickle.load(cacheFile)
+                    while True:
+                        try:
+                            verdicts.update(pickle.load(cacheFile))
+                        except EOFError:
+                            break
+                        except:
+                            # a batch cut short by an interrupted append is dropped, and the cache written whole when it
+                            # is next saved so that later batches are not appended after it
+                            dirty = True
+                            break
+                        numBatches += 1
+                finally:
+                    cacheFile.close()
+            except:
+                # a missing or unreadable cache is simply started again, and written whole when it is next saved
+                verdicts = {}
+                numBatches = 0
+                dirty = True
+            cache = verdicts
+    return cache
+
+## Writes the verdicts found since the cache was last written to the Support directory. They are appended to the cache
+# file, so that a search that met a few new files does not write the whole cache again; the whole cache is only written
+# when verdicts were dropped from it, or when enough batches have been appended.
+def save():
+    global added, dirty, numBatches
+
+    if len(added) == 0 and not dirty:
+        return
+
+    with lock:
+        try:
+            if not dirty and numBatches < MAX_APPENDED_BATCHES and os.path.exists(supportDir + binaryCacheFileName):
+                cacheFile = open(supportDir + binaryCacheFileName, 'ab')
+                try:
+                    pickle.dump(added, cacheFile, pickle.HIGHEST_PROTOCOL)
+                finally:
+                    cacheFile.close()
+                numBatches += 1
+            else:
+                # write to a temporary file first so that an interrupted write never leaves a broken cache behind
+                cacheFile = open(supportDir + binaryCacheFileName + '.tmp', 'wb')
+                try:
+                    pickle.dump(dict(cache), cacheFile, pickle.HIGHEST_PROTOCOL)
+                finally:
+                    cacheFile.close()
+                os.replace(supportDir + binaryCacheFileName + '.tmp', supportDir + binaryCacheFileName)
+                numBatches = 0
+                dirty = False
+            added = {}
+        except (IOError, OSError):
+            pass
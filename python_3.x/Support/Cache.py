@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+# system modules
+import os, sys, threading
+from collections import OrderedDict
+
+## This module keeps the results of recent searches in memory, so that running the same search again, or a narrower
+# one (a search whose string contains the string of a cached search), is answered without walking the tree again. Each
+# entry remembers the mtimes of a sample of the directories its search walked; a directory's mtime changes whenever an
+# entry is added to, removed from, or renamed within it, so an entry is thrown away as soon as any of its sampled
+# directories has changed. Editing a file in place leaves its directory's mtime alone, so the results of a Deep Search
+# are never kept. The least recently used entries are dropped first once the cache grows past its size limit.
+#
+# @file Cache.py
+# @version 1.2
+
+## The number of directories, picked at random from the walk, whose mtimes are checked before a cached entry is used.
+SAMPLE_SIZE = 64
+## The most directories holding results whose mtimes are also checked before a cached entry is used.
+MAX_RESULT_DIRS = 192
+
+## The results of one search, along with what is needed to tell whether they are still up to date.
+class Entry:
+    ## Initialize the local class variables with passed in variables.
+    #
+    # @param self A pointer to the local class.
+    # @param results The list of folders, files, and in files results found.
+    # @param mtimes Maps the absolute path of each sampled directory to its mtime.
+    def __init__(self, results, mtimes):
+        ## The list of folders, files, and in files results found.
+        self.results = results
+        ## Maps the absolute path of each sampled directory to its mtime.
+        self.mtimes = mtimes
+        ## The rough number of bytes of memory the entry takes up.
+        self.size = sys.getsizeof(results) + sys.getsizeof(mtimes)
+        for path in mtimes:
+            self.size += sys.getsizeof(path)
+        for item in results[0] + results[1]:
+            self.size += sys.getsizeof(item)
+        for item in results[2]:
+            self.size += sys.getsizeof(item) + sys.getsizeof(item[0]) + sys.getsizeof(item[1]) + 8 * len(item[1])
+
+    ## Checks to see if the entry is still up to date.
+    #
+    # @param self A pointer to the local class.
+    # @return True if none of the sampled directories has changed, False otherwise.
+    def isValid(self):
+        for path, mtime in self.mtimes.items():
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+## The cache of the results of recent searches, kept in least recently used order.
+class ResultCache:
+    ## Initialize an empty cache.
+    #
+    # @param self A pointer to the local class.
+    def __init__(self):
+        ## Maps the key of each cached search to its Entry, from the least to the most recently used.
+        self.entries = OrderedDict()
+        ## The rough number of bytes of memory the entries take up.
+        self.size = 0
+        ## Guards the entries, since several searches may run at once.
+        self.lock = threading.Lock()
+
+    ## Finds the cached entry that can answer a search: the entry for the same search if there is one, otherwise (for
+    # a plain text search) the entry for the longest cached search string that the search string contains.
+    #
+    # @param self A pointer to the local class.
+    # @param key The key of the search: its root directory, its search string, and the options that change its results.
+    # @param narrowable True if the search string is plain text, so that the results of a search for part of it can be
+    # narrowed down.
+    # @return The entry and True if it is for the same search, False if it has to be narrowed down; or None and False
+    # if there is no up to date entry that can answer the search.
+    def find(self, key, narrowable):
+        with self.lock:
+            candidates = []
+            if key in self.entries:
+                candidates.append((self.entries[key], True, key))
+            if narrowable:
+                supersets = []
+                for cachedKey in self.entries:
+                    if cachedKey[0] == key[0] and cachedKey[2] == key[2] and cachedKey[1] != key[1] and key[1].find(cachedKey[1]) != -1:
+                        supersets.append(cachedKey)
+                # the longest cached string leaves the fewest results to narrow down
+                supersets.sort(key = lambda cachedKey: len(cachedKey[1]), reverse = True)
+                candidates.extend([(self.entries[cachedKey], False, cachedKey) for cachedKey in supersets])
+
+            for entry, exact, cachedKey in candidates:
+                if entry.isValid():
+                    self.entries.move_to_end(cachedKey)
+                    return entry, exact
+                self.remove(cachedKey)
+        return None, False
+
+    ## Adds the results of a search to the cache, dropping the least recently used entries to stay within the size limit.
+    #
+    # @param self A pointer to the local class.
+    # @param key The key of the search.
+    # @param results The list of folders, files, and in files results found.
+    # @param mtimes Maps the absolute path of each sampled directory to its mtime.
+    # @param maxSize The most bytes of memory the cache may take up.
+    def store(self, key, results, mtimes, maxSize):
+        entry = Entry([list(results[0]), list(results[1]), list(results[2])], dict(mtimes))
+        # an entry bigger than the whole cache would only push everything else out
+        if entry.size > maxSize:
+            return
+
+        with self.lock:
+            self.remove(key)
+            self.entries[key] = entry
+            self.size += entry.size
+            while self.size > maxSize:
+                self.remove(next(iter(self.entries)))
+
+    ## Removes an entry from the cache. The lock must already be held.
+    #
+    # @param self A pointer to the local class.
+    # @param key The key of the search.
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if not entry == None:
+            self.size -= entry.size
+
+    ## Empties the cache.
+    #
+    # @param self A pointer to the local class.
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+## The cache shared by every search in this process.
+resultCache = ResultCache()
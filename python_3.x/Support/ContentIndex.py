@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+
+# system modules
+import os, pickle, zlib
+
+## This module keeps a trigram index of file contents so that a Deep Search only has to read the files that could contain
+# the search string. For every three-byte sequence (trigram) found in the indexed files, the index stores the ids of the
+# files containing it. A file can only contain the search string if it contains every trigram of the search string, so
+# intersecting those lists gives the few files worth reading. Each list is stored as the differences between consecutive
+# ids, written as variable-length integers and compressed, which keeps the index a small fraction of the size of the files.
+#
+# @file ContentIndex.py
+# @version 1.2
+
+## The Support directory, where the index is stored alongside the options file.
+supportDir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+## The content index file name.
+contentIndexFileName = 'ContentIndex.dat'
+## The version of the index file format; an index written in any other format is rebuilt.
+CONTENT_INDEX_VERSION = 1
+## Files larger than this are left out of the index; a Deep Search always reads them.
+MAX_INDEXED_FILE_SIZE = 16 * 1024 * 1024
+
+## The index that has already been read from disk, so that repeated searches do not read it again.
+loadedIndex = None
+
+## Writes a sorted list of file ids as compressed, variable-length differences.
+#
+# @param ids The sorted list of file ids.
+# @return The encoded list.
+def encodePostings(ids):
+    data = bytearray()
+    last = 0
+    for fileId in ids:
+        delta = fileId - last
+        last = fileId
+        # seven bits at a time, with the high bit set on every byte but the last
+        while delta >= 0x80:
+            data.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        data.append(delta)
+    return zlib.compress(bytes(data))
+
+## Reads a list of file ids written by encodePostings.
+#
+# @param data The encoded list.
+# @return The sorted list of file ids.
+def decodePostings(data):
+    ids = []
+    last = 0
+    delta = 0
+    shift = 0
+    for byte in zlib.decompress(data):
+        delta |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            last += delta
+            ids.append(last)
+            delta = 0
+            shift = 0
+    return ids
+
+## Checks to see if the index can rule out files for a search string. Trigrams need at least three characters of text
+# every match contains, and the trigrams of a file are lowercased as bytes, which only folds the case of ASCII letters;
+# a search string with any other letter could match text whose case the index did not fold.
+#
+# @param string The text every match contains.
+# @return True if candidates() may be called with the string, False if every file has to be read.
+def usable(string):
+    return len(string) >= 3 and string.isascii()
+
+## Returns the trigrams of a string of bytes, ignoring the case of ASCII letters.
+#
+# @param data The bytes.
+# @return The set of trigrams.
+def trigrams(data):
+    data = data.lower()
+    return set([data[i:i + 3] for i in range(len(data) - 2)])
+
+## The trigram index of the contents of the files below one or more root directories.
+class ContentIndex:
+    ## Initialize an empty index.
+    #
+    # @param self A pointer to the local class.
+    def __init__(self):
+        ## The absolute paths of the directories the index was built from.
+        self.roots = []
+        ## Maps the absolute path of each indexed file to its id, size, and mtime.
+        self.files = {}
+        ## Maps the id of each indexed file back to its absolute path.
+        self.paths = {}
+        ## The next unused file id.
+        self.nextId = 0
+        ## Maps each trigram to the encoded ids of the files containing it.
+        self.postings = {}
+
+    ## Checks to see if the given directory is covered by the index.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory to check.
+    # @return True if the directory lies within an indexed root, False otherwise.
+    def covers(self, top):
+        top = os.path.abspath(top)
+        for root in self.roots:
+            if top == root or top.startswith(root.rstrip(os.sep) + os.sep):
+                return True
+        return False
+
+    ## Returns the files that may contain the search string.
+    #
+    # @param self A pointer to the local class.
+    # @param string The search string, for which usable() must be True.
+    # @return The set of the absolute paths of the indexed files that contain every trigram of the search string.
+    def candidates(self, string):
+        grams = trigrams(string.encode('utf-8'))
+
+        # start with the rarest trigram, which has the shortest list
+        lists = []
+        for gram in grams:
+            if not gram in self.postings:
+                return set()
+            lists.append(self.postings[gram])
+        lists.sort(key = len)
+
+        ids = set(decodePostings(lists[0]))
+        for data in lists[1:]:
+            if len(ids) == 0:
+                break
+            ids.intersection_update(decodePostings(data))
+
+        return set([self.paths[fileId] for fileId in ids])
+
+    ## Checks to see if a file may contain the search string.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the file.
+    # @param candidates The set returned by candidates().
+    # @param stat The result of os.stat for the file, or None if it is not known.
+    # @return False if the index shows the file cannot contain the search string, True otherwise.
+    def mayContain(self, path, candidates, stat = None):
+        if path in candidates:
+            return True
+        record = self.files.get(path)
+        # a file that was never indexed has to be read, and so does one that has changed since it was indexed
+        if record == None:
+            return True
+        if not stat == None and not (record[1] == stat.st_size and record[2] == stat.st_mtime):
+            return True
+        return False
+
+    ## Reads a file and adds its trigrams to the pending lists.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the file.
+    # @param size The size of the file.
+    # @param mtime The mtime of the file.
+    # @param pending Maps each trigram to the list of ids of the files added in this pass.
+    def add(self, path, size, mtime, pending):
+        if size > MAX_INDEXED_FILE_SIZE:
+            return
+        try:
+            indexFile = open(path, 'rb')
+            try:
+                data = indexFile.read()
+            finally:
+                indexFile.close()
+        except (IOError, OSError):
+            return
+
+        fileId = self.nextId
+        self.nextId += 1
+        self.files[path] = (fileId, size, mtime)
+        self.paths[fileId] = path
+        for gram in trigrams(data):
+            if gram in pending:
+                pending[gram].append(fileId)
+            else:
+                pending[gram] = [fileId]
+
+    ## Merges the pending lists into the encoded lists and removes the ids of files that are no longer indexed.
+    #
+    # @param self A pointer to the local class.
+    # @param pending Maps each trigram to the list of ids of the files added in this pass.
+    # @param removed The set of ids of the files that are no longer indexed.
+    def merge(self, pending, removed):
+        # without removals, only the lists that gained ids need to be written again
+        if len(removed) > 0:
+            grams = set(self.postings) | set(pending)
+        else:
+            grams = pending
+        for gram in grams:
+            ids = []
+            if gram in self.postings:
+                ids = decodePostings(self.postings[gram])
+                if len(removed) > 0:
+                    ids = [fileId for fileId in ids if not fileId in removed]
+            # new ids are always larger than old ones, so the list stays sorted
+            ids.extend(pending.get(gram, []))
+
+            if len(ids) > 0:
+                self.postings[gram] = encodePostings(ids)
+            else:
+                del self.postings[gram]
+
+    ## Brings the index of the files below top up to date with the filename index. Files whose size and mtime are
+    # unchanged are not read again; new and changed files are read and their old entries removed.
+    #
+    # @param self A pointer to the local class.
+    # @param top The root directory to be indexed.
+    # @param index The filename index covering top.
+    # @param rebuild True to read every file again, False to read only new and changed files.
+    # @return The number of files that were read.
+    def update(self, top, index, rebuild):
+        top = os.path.abspath(top)
+        prefix = top.rstrip(os.sep) + os.sep
+
+        pending = {}
+        removed = set()
+        seen = set()
+        numRead = 0
+        for dirPath, record in index.dirs.items():
+            if not (dirPath == top or dirPath.startswith(prefix)):
+                continue
+            for fileName in record[2]:
+                path = os.path.join(dirPath, fileName)
+                seen.add(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                old = self.files.get(path)
+                if not rebuild and old != None and old[1] == stat.st_size and old[2] == stat.st_mtime:
+                    continue
+                if old != None:
+                    removed.add(old[0])
+                    del self.files[path]
+                    del self.paths[old[0]]
+                self.add(path, stat.st_size, stat.st_mtime, pending)
+                numRead += 1
+
+        # files below top that are gone from the filename index are gone from the disk
+        for path in list(self.files):
+            if (path == top or path.startswith(prefix)) and not path in seen:
+                fileId = self.files.pop(path)[0]
+                del self.paths[fileId]
+                removed.add(fileId)
+
+        self.merge(pending, removed)
+
+        # roots below the new root are now covered by it
+        for root in self.roots[:]:
+            if root.startswith(prefix):
+                self.roots.remove(root)
+        if not self.covers(top):
+            self.roots.append(top)
+
+        return numRead
+
+## Reads the content index from the Support directory.
+#
+# @return The index, or None if no index has been built.
+def load():
+    global loadedIndex
+
+    if loadedIndex != None:
+        return loadedIndex
+    if not os.path.exists(supportDir + contentIndexFileName):
+        return None
+
+    try:
+        indexFile = open(supportDir + contentIndexFileName, 'rb')
+        try:
+            data = pickle.load(indexFile)
+        finally:
+            indexFile.close()
+        if data[0] != CONTENT_INDEX_VERSION:
+            return None
+        loadedIndex = data[1]
+    except:
+        # an unreadable index is treated as though none had been built
+        return None
+
+    return loadedIndex
+
+## Writes the content index to the Support directory.
+#
+# @param index The index to be written.
+def save(index):
+    global loadedIndex
+
+    # write to a temporary file first so that an interrupted write never leaves a broken index behind
+    indexFile = open(supportDir + contentIndexFileName + '.tmp', 'wb')
+    try:
+        pickle.dump((CONTENT_INDEX_VERSION, index), indexFile, pickle.HIGHEST_PROTOCOL)
+    finally:
+        indexFile.close()
+    os.replace(supportDir + contentIndexFileName + '.tmp', supportDir + contentIndexFileName)
+
+    loadedIndex = index
+
+## Builds or refreshes the content index for the given root directory and writes it to the Support directory.
+#
+# @param top The root directory to be indexed.
+# @param index The filename index covering top.
+# @param rebuild True to read every file again, False to read only new and changed files.
+# @return The content index and the number of files that were read.
+def update(top, index, rebuild):
+    contentIndex = load()
+    if contentIndex == None:
+        contentIndex = ContentIndex()
+    numRead = contentIndex.update(top, index, rebuild)
+    save(contentIndex)
+    return contentIndex, numRead
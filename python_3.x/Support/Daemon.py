@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+
+# system modules
+import json, os, re, socket, socketserver, struct, threading
+
+# my modules
+import Binary, ContentIndex, Index, PathTable, Search, Watcher
+
+## This module runs FastSearch as a daemon: a long-running process that answers searches over a Unix domain socket, so
+# that a script running many searches with the return argument pays for the interpreter and a cold start only once.
+# The daemon keeps in memory everything a local search would otherwise read again from the Support directory (the
+# filename and content indexes, the binary verdicts, and the cached results of recent searches), and reloads an index
+# only when its file has changed. On Linux, the daemon also watches every directory of the filename index with inotify
+# and applies each change to the index in memory as it happens, so that searches answered from the index see the
+# directory tree as it is now rather than as it was when the index was last refreshed. The caller always sends the
+# whole options list, so a search run by the daemon is the same search it would have run itself. Remote searches are
+# never sent to the daemon: the return argument only searches local roots, and an FTP connection cannot be sent over
+# the socket.
+#
+# Every message is a frame: its length as a 4-byte big-endian number, then that many bytes of JSON. A request is a
+# single frame; the reply is a frame for each result as it is found, if the request asked for them to be streamed,
+# followed by a final frame with the results (or an error).
+#
+# @file Daemon.py
+# @version 1.2
+
+## The Support directory, where the daemon's socket is created alongside the options file.
+supportDir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+## The daemon socket file name.
+socketFileName = 'FastSearch.sock'
+## The version of the protocol; a daemon answers a request in any other version with an error, and the caller falls back
+# to searching in its own process.
+PROTOCOL_VERSION = 1
+## The number of seconds the caller waits to connect to the daemon before searching in its own process instead.
+CONNECT_TIMEOUT = 1
+## The largest frame either side accepts, in bytes.
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+## The frame header: the length of the JSON that follows.
+frameHeader = struct.Struct('!I')
+
+## Checks to see if this platform has Unix domain sockets.
+#
+# @return True if a daemon can be run and reached, False otherwise.
+def available():
+    return hasattr(socket, 'AF_UNIX')
+
+## Returns the path of the daemon socket.
+#
+# @return The path.
+def socketPath():
+    return supportDir + socketFileName
+
+## Sends a single frame.
+#
+# @param connection The connected socket.
+# @param message The message, which must be JSON serializable.
+def sendFrame(connection, message):
+    data = json.dumps(message, separators = (',', ':')).encode('utf-8')
+    connection.sendall(frameHeader.pack(len(data)) + data)
+
+## Reads exactly the given number of bytes.
+#
+# @param connection The connected socket.
+# @param size The number of bytes.
+# @return The bytes.
+# @throws EOFError If the other side closed the connection first.
+def receiveExactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        block = connection.recv(min(size - len(data), 1024 * 1024))
+        if not block:
+            raise EOFError('the connection was closed')
+        data += block
+    return bytes(data)
+
+## Reads a single frame.
+#
+# @param connection The connected socket.
+# @return The message.
+# @throws EOFError If the other side closed the connection first.
+# @throws ValueError If the frame is too large or not valid JSON.
+def receiveFrame(connection):
+    size = frameHeader.unpack(receiveExactly(connection, frameHeader.size))[0]
+    if size > MAX_FRAME_SIZE:
+        raise ValueError('the frame is too large')
+    return json.loads(receiveExactly(connection, size).decode('utf-8'))
+
+## Converts an options list to a form that can be sent as JSON. The FTP connection cannot be sent, so a daemon only
+# runs local searches.
+#
+# @param optionsList The settings list for how the search will be performed.
+# @return The options list, with the set of excluded extensions as a sorted list and no FTP connection.
+def encodeOptions(optionsList):
+    options = list(optionsList)
+    options[6] = None
+    options[17] = sorted(optionsList[17])
+    return options
+
+## Converts an options list sent as JSON back to an options list.
+#
+# @param options The options list from encodeOptions().
+# @return The settings list for how the search will be performed.
+def decodeOptions(options):
+    optionsList = list(options)
+    optionsList[17] = set(optionsList[17])
+    return optionsList
+
+## Asks the daemon to run a search, if it is running.
+#
+# @param string The search string, or None for a batch search.
+# @param patterns The list of patterns of a batch search, or None.
+# @param optionsList The settings list for how the search will be performed.
+# @param live True if the disk must be walked even when the filename index covers the root directory.
+# @param onResult A function each Search.Result is handed to as soon as it is found, or None to only be handed the
+# results once the search is finished.
+# @return True if the search was stopped early and the results are incomplete, and the results (as Search.finish() or
+# BatchSearch.finish() returns them); or None and None if the daemon is not running or could not run the search.
+# @throws re.error If the search string is meant to be a regular expression, but is not a valid one.
+def search(string, patterns, optionsList, live = False, onResult = None):
+    if not available() or not optionsList[6] == None or not os.path.exists(socketPath()):
+        return None, None
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.settimeout(CONNECT_TIMEOUT)
+        try:
+            connection.connect(socketPath())
+        except (OSError, socket.timeout):
+            return None, None
+        # the search itself may take as long as it takes
+        connection.settimeout(None)
+
+        try:
+            sendFrame(connection, {'version': PROTOCOL_VERSION, 'string': string, 'patterns': patterns, \
+                                   'options': encodeOptions(optionsList), 'live': live, 'stream': not onResult == None})
+            while True:
+                reply = receiveFrame(connection)
+                if 'result' in reply:
+                    onResult(Search.Result(*reply['result']))
+                else:
+                    break
+        except (OSError, EOFError, ValueError):
+            return None, None
+    finally:
+        connection.close()
+
+    if 'error' in reply:
+        if reply['error'] == 'regex':
+            raise re.error(reply['message'])
+        return None, None
+    return reply['incomplete'], reply['results']
+
+## Asks the daemon to stop, if it is running.
+#
+# @return True if the daemon was told to stop, False if it is not running.
+def stop():
+    if not available() or not os.path.exists(socketPath()):
+        return False
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.settimeout(CONNECT_TIMEOUT)
+        connection.connect(socketPath())
+        sendFrame(connection, {'version': PROTOCOL_VERSION, 'stop': True})
+        receiveFrame(connection)
+    except (OSError, EOFError, ValueError):
+        return False
+    finally:
+        connection.close()
+    return True
+
+## Checks to see if the daemon is running, by connecting to its socket.
+#
+# @return True if the daemon is running, False otherwise.
+def running():
+    if not available() or not os.path.exists(socketPath()):
+        return False
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.settimeout(CONNECT_TIMEOUT)
+        connection.connect(socketPath())
+    except OSError:
+        return False
+    finally:
+        connection.close()
+    return True
+
+## Handles a single connection to the daemon: reads the request, runs the search, and sends back the reply.
+class RequestHandler(socketserver.BaseRequestHandler):
+    ## Answers the request.
+    #
+    # @param self A pointer to the local class.
+    def handle(self):
+        try:
+            request = receiveFrame(self.request)
+        except (OSError, EOFError, ValueError):
+            return
+        try:
+            if not request.get('version') == PROTOCOL_VERSION:
+                sendFrame(self.request, {'error': 'version', 'message': 'the daemon speaks protocol version ' + str(PROTOCOL_VERSION)})
+            elif request.get('stop'):
+                sendFrame(self.request, {'stopped': True})
+                # shutdown() waits for serve_forever() to return, so it must not be called from the thread it runs in
+                threading.Thread(target = self.server.shutdown).start()
+            else:
+                self.server.runSearch(self.request, request)
+        except (OSError, EOFError):
+            # the caller went away
+            pass
+
+## The daemon: a server on a Unix domain socket that runs one search at a time, each in a thread of its own, keeping
+# the caches of every search in memory in between.
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    ## Threads handling connections do not keep the daemon running once it is told to stop.
+    daemon_threads = True
+
+    ## Create the socket, replacing the file of a daemon that is no longer running, and start watching the filename index.
+    #
+    # @param self A pointer to the local class.
+    # @param optionsList The settings list for how a directory of the filename index will be listed again.
+    # @throws OSError If another daemon is already running.
+    def __init__(self, optionsList):
+        if running():
+            raise OSError('a FastSearch daemon is already running')
+        if os.path.exists(socketPath()):
+            os.remove(socketPath())
+        # only the user running the daemon may connect to it
+        umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socketPath(), RequestHandler)
+        finally:
+            os.umask(umask)
+
+        ## The settings list for how a directory of the filename index will be listed again.
+        self.optionsList = optionsList
+        ## Makes searches run one at a time, since they share the caches; the watcher holds it while it changes the
+        # filename index.
+        self.searchLock = threading.Lock()
+        ## Makes the index files be checked by one connection at a time.
+        self.refreshLock = threading.Lock()
+        ## The modification time of each index file when it was loaded, to tell when it has been rebuilt.
+        self.indexTimes = {}
+        ## The Watcher.Watcher keeping the filename index up to date, or None if it is not being watched.
+        self.watcher = None
+        ## The number of searches run.
+        self.numSearches = 0
+
+        self.refreshIndexes()
+
+    ## Drops an index from memory if its file has changed since it was loaded, so that the next search reads it again,
+    # and watches the filename index that was read.
+    #
+    # @param self A pointer to the local class.
+    def refreshIndexes(self):
+        with self.refreshLock:
+            for module, fileName in ((Index, Index.indexFileName), (ContentIndex, ContentIndex.contentIndexFileName)):
+                try:
+                    modified = os.stat(module.supportDir + fileName).st_mtime_ns
+                except OSError:
+                    modified = None
+                if not self.indexTimes.get(module.__name__) == modified:
+                    module.loadedIndex = None
+                    self.indexTimes[module.__name__] = modified
+                    if module == Index:
+                        self.watchIndex()
+
+    ## Stops watching the filename index that was in memory, and starts watching the one in the Support directory.
+    #
+    # @param self A pointer to the local class.
+    def watchIndex(self):
+        if not self.watcher == None:
+            # the index on disk is newer than the one being watched, so the changes applied to it are dropped
+            self.watcher.stop()
+            self.watcher = None
+
+        index = Index.load()
+        if index == None or not Watcher.available():
+            return
+        try:
+            watcher = Watcher.Watcher(index, self.optionsList, self.searchLock)
+            watcher.start()
+        except OSError:
+            # searches are answered from the index as it was last refreshed
+            return
+        self.watcher = watcher
+
+    ## Runs a search and sends back its results.
+    #
+    # @param self A pointer to the local class.
+    # @param connection The connected socket.
+    # @param request The request.
+    def runSearch(self, connection, request):
+        optionsList = decodeOptions(request['options'])
+        self.refreshIndexes()
+        with self.searchLock:
+            try:
+                if request['patterns'] == None:
+                    search = Search.Search(request['string'], optionsList, request['live'])
+                else:
+                    search = Search.BatchSearch(request['patterns'], optionsList, request['live'])
+            except re.error as error:
+                sendFrame(connection, {'error': 'regex', 'message': str(error)})
+                return
+
+            if request['stream']:
+                # a caller that goes away ends the search, since matches() is closed as the error leaves the loop
+                for result in search.matches():
+                    sendFrame(connection, {'result': list(result)})
+            else:
+                search.start()
+                search.join()
+            self.numSearches += 1
+        sendFrame(connection, {'incomplete': search.incomplete, 'results': PathTable.toLists(search.finish())})
+
+    ## Removes the socket file once the daemon has stopped, and writes back the filename index if the watcher changed it.
+    #
+    # @param self A pointer to the local class.
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.remove(socketPath())
+        except OSError:
+            pass
+        if not self.watcher == None:
+            self.watcher.stop()
+            try:
+                modified = os.stat(Index.supportDir + Index.indexFileName).st_mtime_ns
+            except OSError:
+                modified = None
+            # an index rebuilt by another process since it was last checked is not overwritten
+            if self.watcher.changed and modified == self.indexTimes.get(Index.__name__):
+                try:
+                    Index.save(self.watcher.index)
+                except (IOError, OSError):
+                    pass
+        # keep whatever the searches learned for the next daemon or search
+        Binary.save()
@@ -2,10 +2,6 @@
 
 # system modules
 import os
-from time import strftime
-
-# my modules
-import Output
 
 ## This module contains the methods that handle the interactions in file I/O to the search.
 #
@@ -20,12 +16,15 @@ if os.name == 'posix':
     # any other environment
     #showColors = True
 
+## The file extensions a Deep Search skips by default.
+defaultDeepSearchExclude = set(['.exe', '.zip', '.tar', '.bz', '.gz', '.hqx', '.app', '.dll', '.mov', '.mpeg', '.mpg', '.wmv', '.avi', '.dv', \
+                                '.jpg', '.jpeg', '.bmp', '.png', '.psd', '.iso', '.pdf', '.so', '.class', '.pyc', '.pyo', '.o', '.a', \
+                                '.jar', '.bz2', '.xz', '.7z', '.rar', '.dmg', '.gif', '.tif', '.tiff', '.ico', '.mp3', '.mp4', '.wav'])
+
 ## The default options list to be used if none is set.
-defaultList = [False, 2, True, 0, True, os.getcwd(), None, True, True, 2, 2, showColors]
+defaultList = [False, 2, True, 0, True, os.getcwd(), None, True, True, 2, 2, showColors, 1, 0, True, False, 1, set(defaultDeepSearchExclude), 0, 0, 0, 16]
 ## The options file name.
 optionsFileName = 'Options.ldf'
-## The recent searches file name.
-recentSearchesFileName = 'RecentSearches.txt'
 
 ## Read the current options file (if it exists), and ensure that all its values are valid. Return the options list.
 #
@@ -38,6 +37,8 @@ def initializeOptionsList(fastSearchDir, optionsList):
         exists = True
         try:
             optionsFile = open(fastSearchDir + 'Support' + os.sep + optionsFileName, 'r')
+            text = optionsFile.read()
+            optionsFile.seek(0)
             
             # deep search
             optionsList.append(optionsFile.readline().split('#')[0])
@@ -94,6 +95,8 @@ def initializeOptionsList(fastSearchDir, optionsList):
             optionsList.append(optionsFile.readline().split('#')[0])
             try:
                 optionsList[9] = int(optionsList[9])
+                if optionsList[9] < 1:
+                    optionsList[9] = 2
             except:
                 optionsList[9] = 2
             # display search animations
@@ -110,19 +113,103 @@ def initializeOptionsList(fastSearchDir, optionsList):
                 optionsList[11] = True
             else:
                 optionsList[11] = False
-                
+            # directory walker
+            optionsList.append(optionsFile.readline().split('#')[0])
+            try:
+                optionsList[12] = int(optionsList[12])
+                if optionsList[12] < 0 or optionsList[12] > 1:
+                    optionsList[12] = 1
+            except:
+                optionsList[12] = 1
+            # deep search processes
+            optionsList.append(optionsFile.readline().split('#')[0])
+            try:
+                optionsList[13] = int(optionsList[13])
+                if optionsList[13] < 0:
+                    optionsList[13] = 0
+            except:
+                optionsList[13] = 0
+            # use the filename index
+            optionsList.append(optionsFile.readline().split('#')[0])
+            if optionsList[14] == 'False':
+                optionsList[14] = False
+            else:
+                optionsList[14] = True
+            # build the content index
+            optionsList.append(optionsFile.readline().split('#')[0])
+            if optionsList[15] == 'True':
+                optionsList[15] = True
+            else:
+                optionsList[15] = False
+            # deep search engine
+            optionsList.append(optionsFile.readline().split('#')[0])
+            try:
+                optionsList[16] = int(optionsList[16])
+                if optionsList[16] < 0 or optionsList[16] > 1:
+                    optionsList[16] = 1
+            except:
+                optionsList[16] = 1
+            # deep search excluded extensions
+            optionsList.append(optionsFile.readline().split('#')[0].strip())
+            if optionsList[17] == '':
+                optionsList[17] = set(defaultDeepSearchExclude)
+            elif optionsList[17] == 'None':
+                optionsList[17] = set()
+            else:
+                optionsList[17] = set([extension.strip().lower() for extension in optionsList[17].split(',') if not extension.strip() == ''])
+            # match mode
+            optionsList.append(optionsFile.readline().split('#')[0])
+            try:
+                optionsList[18] = int(optionsList[18])
+                if optionsList[18] < 0 or optionsList[18] > 2:
+                    optionsList[18] = 0
+            except:
+                optionsList[18] = 0
+            # search time limit
+            optionsList.append(optionsFile.readline().split('#')[0])
+            try:
+                optionsList[19] = int(optionsList[19])
+                if optionsList[19] < 0:
+                    optionsList[19] = 0
+            except:
+                optionsList[19] = 0
+            # search result limit
+            optionsList.append(optionsFile.readline().split('#')[0])
+            try:
+                optionsList[20] = int(optionsList[20])
+                if optionsList[20] < 0:
+                    optionsList[20] = 0
+            except:
+                optionsList[20] = 0
+            # result cache size
+            optionsList.append(optionsFile.readline().split('#')[0])
+            try:
+                optionsList[21] = int(optionsList[21])
+                if optionsList[21] < 0:
+                    optionsList[21] = 16
+            except:
+                optionsList[21] = 16
             
             optionsFile.close()
+            
+            # the file only needs writing again if a value was invalid or missing; the root directory is not read back,
+            # so it is left out of the comparison
+            lines = text.split('\n')
+            newLines = optionsText(optionsList).split('\n')
+            upToDate = len(lines) == len(newLines) and lines[:5] + lines[6:] == newLines[:5] + newLines[6:]
         except:
             # some error occured in reading the file, write a new one
             optionsList = defaultList
+            upToDate = False
     # if the options file doesn't exist, make our own values
     else:
         exists = False
         optionsList = defaultList
+        upToDate = False
     
-    # write values to the options file
-    writeNewOptionsList(fastSearchDir, optionsList, exists)
+    # write values to the options file, unless they are already there
+    if not upToDate:
+        writeNewOptionsList(fastSearchDir, optionsList, exists)
     
     return optionsList
     
@@ -136,72 +223,55 @@ def writeNewOptionsList(fastSearchDir, optionsList, exists):
         os.remove(fastSearchDir + 'Support' + os.sep + optionsFileName)
     
     optionsFile = open(fastSearchDir + 'Support' + os.sep + optionsFileName, 'w')
-    optionsFile.write(str(optionsList[0]) + '# Deep Search\n')
-    optionsFile.write(str(optionsList[1]) + '# Show Files (0), Folders (1), or Both (2)\n')
-    optionsFile.write(str(optionsList[2]) + '# Show Hidden Files and Folders\n')
-    optionsFile.write(str(optionsList[3]) + '# Show Full (0), Relative (1), or No Path (2)\n')
-    optionsFile.write(str(optionsList[4]) + '# Full Search\n')
-    optionsFile.write(str(optionsList[5]) + '# Root Directory\n')
-    optionsFile.write(str(optionsList[7]) + '# Clear Screen Before Displaying Search Results\n')
-    optionsFile.write(str(optionsList[8]) + '# Write Recent Searches to File\n')
-    optionsFile.write(str(optionsList[9]) + '# Number of Threads Used\n')
-    optionsFile.write(str(optionsList[10]) + '# To display search animations\n')
-    optionsFile.write(str(optionsList[11]) + '# Text coloring')
+    optionsFile.write(optionsText(optionsList))
     
     optionsFile.close()
-    
-## Write the information regarding this search to the search history file.
+
+## Returns the contents of the options file for an options list.
 #
-# @param fastSearchDir The path of FastSearch.
-# @param string The search string.
-# @param optionsList The settings list for how the search will be performed.
-# @param results The results from the search.
-# @param time The amount of time the search required.
-def writeSearchHistory(fastSearchDir, string, optionsList, results, time):
-    # if the file already exists, append to it, otherwise create it
-    if os.path.exists(fastSearchDir + 'Support' + os.sep + recentSearchesFileName):
-        recentSearchesFile = open(fastSearchDir + 'Support' + os.sep + recentSearchesFileName, 'a')
-    else:
-        recentSearchesFile = open(fastSearchDir + 'Support' + os.sep + recentSearchesFileName, 'w')
+# @param optionsList The list of options to be written.
+# @return The text of the options file.
+def optionsText(optionsList):
+    text = str(optionsList[0]) + '# Deep Search\n'
+    text += str(optionsList[1]) + '# Show Files (0), Folders (1), or Both (2)\n'
+    text += str(optionsList[2]) + '# Show Hidden Files and Folders\n'
+    text += str(optionsList[3]) + '# Show Full (0), Relative (1), or No Path (2)\n'
+    text += str(optionsList[4]) + '# Full Search\n'
+    text += str(optionsList[5]) + '# Root Directory\n'
+    text += str(optionsList[7]) + '# Clear Screen Before Displaying Search Results\n'
+    text += str(optionsList[8]) + '# Write Recent Searches to File\n'
+    text += str(optionsList[9]) + '# Number of Threads Used\n'
+    text += str(optionsList[10]) + '# To display search animations\n'
+    text += str(optionsList[11]) + '# Text coloring\n'
+    text += str(optionsList[12]) + '# Directory Walker: Standard (0) or Scandir (1)\n'
+    text += str(optionsList[13]) + '# Deep Search Processes (0 to search in the walk)\n'
+    text += str(optionsList[14]) + '# Use Filename Index\n'
+    text += str(optionsList[15]) + '# Build Content Index for Deep Search\n'
+    text += str(optionsList[16]) + '# Deep Search Engine: Lines (0) or Memory-Mapped (1)\n'
+    text += (len(optionsList[17]) > 0 and ','.join(sorted(optionsList[17])) or 'None') + '# Deep Search Excluded Extensions\n'
+    text += str(optionsList[18]) + '# Match Mode: Literal (0), Glob (1), or Regular Expression (2)\n'
+    text += str(optionsList[19]) + '# Search Time Limit in Seconds (0 for no limit)\n'
+    text += str(optionsList[20]) + '# Search Result Limit (0 for no limit)\n'
+    text += str(optionsList[21]) + '# Result Cache Size in MB (0 to turn it off)'
+    return text
     
-    numResults = Output.getNumResults(results)
-    if numResults > 0:
-        recentSearchesFile.write('-----------------------------\n')
-        recentSearchesFile.write('Date and Time: ' + strftime("%Y-%m-%d %H:%M:%S") + '\n')
-        recentSearchesFile.write('Root Directory: ' + optionsList[5] + '\n')
-        recentSearchesFile.write('Search String: ' + string + '\n')
-        recentSearchesFile.write('Search Time: ' + str(time) + '\n')
-        recentSearchesFile.write('Result Count: ' + str(numResults) + '\n')
-        recentSearchesFile.write('\n--Results--')
-        
-        # scan through and print the full path for each folder result (if folders are displayed)
-        if optionsList[1] == 1 or optionsList[1] == 2:
-            recentSearchesFile.write('\n\n::Matching Folder Names::')
-            if len(results[0]) != 0:
-                for item in results[0]:
-                    recentSearchesFile.write('\n' + item)
-            else:
-                recentSearchesFile.write('\n-None Found-')
+## Reads a list of search patterns from a file, one pattern per line.
+#
+# @param fileName The path of the patterns file.
+# @return The list of patterns, or None if the file could not be read.
+def readPatterns(fileName):
+    try:
+        patternsFile = open(fileName, 'r')
+    except (IOError, OSError):
+        return None
 
-        # scan through and print full paths for each file result (if files are displayed)
-        if optionsList[1] == 0 or optionsList[1] == 2:
-            recentSearchesFile.write('\n\n::Matching File Names::')
-            if len(results[1]) != 0:
-                for item in results[1]:
-                    recentSearchesFile.write('\n' + item)
-            else:
-                recentSearchesFile.write('\n-None Found-')
+    patterns = []
+    try:
+        for line in patternsFile:
+            # blank lines are skipped
+            if not line.strip() == '':
+                patterns.append(line.rstrip('\r\n').lower())
+    finally:
+        patternsFile.close()
 
-        # scan through and print full paths for each file the string was found within (if a deep search was run)
-        if optionsList[0]:
-            recentSearchesFile.write('\n\n::Found in Files::')
-            if len(results[2]) != 0:
-                for item in results[2]:
-                    recentSearchesFile.write('\n' + item[0] + '\n  On Line%s: ' % (len(item[1]) != 1 and 's' or '') + str(item[1]))
-            else:
-                recentSearchesFile.write('\n-None Found-')
-        
-        recentSearchesFile.write('\n-----------------------------\n\n')
-
-    recentSearchesFile.close()
-    
+    return patterns
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+# system modules
+import json, os, sqlite3, time, zlib
+
+# my modules
+import PathTable
+
+## This module keeps the history of recent searches, and their results, in an SQLite database in the Support directory.
+# Each search is a row indexed on its search string, root directory, and time, so looking up past searches never reads
+# more than the rows asked for. The results of each search are stored apart from the list of searches, as a single
+# compressed blob, so listing the history never reads them, and fetching them is a single read. Once the stored results
+# grow past MAX_HISTORY_SIZE, the oldest searches are dropped.
+#
+# @file History.py
+# @version 1.2
+
+## The Support directory, where the history is stored alongside the options file.
+supportDir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+## The search history file name.
+historyFileName = 'RecentSearches.db'
+## The most bytes of compressed results the history keeps; the oldest searches are dropped first.
+MAX_HISTORY_SIZE = 32 * 1024 * 1024
+## How many seconds to wait for another FastSearch writing the history at the same time.
+LOCK_TIMEOUT = 5
+
+## The error raised when the history cannot be read or written.
+Error = sqlite3.Error
+
+## The columns of a search in the history, in the order lookups return them.
+SEARCH_COLUMNS = 'id, time, root, string, deep, show, pathMode, fullSearch, matchMode, duration, numResults'
+
+## Opens the history, creating its tables and indexes if they do not exist yet.
+#
+# @return The connection to the history.
+def connect():
+    connection = sqlite3.connect(supportDir + historyFileName, timeout = LOCK_TIMEOUT)
+    connection.execute('CREATE TABLE IF NOT EXISTS searches (id INTEGER PRIMARY KEY, time REAL, root TEXT, string TEXT, '
+                       'deep INTEGER, show INTEGER, pathMode INTEGER, fullSearch INTEGER, matchMode INTEGER, duration REAL, '
+                       'numResults INTEGER, size INTEGER)')
+    connection.execute('CREATE TABLE IF NOT EXISTS results (search INTEGER PRIMARY KEY, data BLOB)')
+    connection.execute('CREATE INDEX IF NOT EXISTS searchesByString ON searches (string)')
+    connection.execute('CREATE INDEX IF NOT EXISTS searchesByRoot ON searches (root)')
+    connection.execute('CREATE INDEX IF NOT EXISTS searchesByTime ON searches (time)')
+    return connection
+
+## Adds a search and its results to the history, then drops the oldest searches if the history has grown too large.
+#
+# @param string The search string.
+# @param optionsList The settings list the search was performed with.
+# @param results The list of folders, files, and in files results found.
+# @param duration The amount of time the search required.
+# @return The id of the search in the history.
+def record(string, optionsList, results, duration):
+    data = zlib.compress(json.dumps(PathTable.toLists(results)).encode('utf-8'))
+    numResults = len(results[0]) + len(results[1]) + len(results[2])
+    # a directory on an FTP server is kept as it was given, since it means nothing relative to the local cwd
+    root = optionsList[5]
+    if optionsList[6] == None:
+        root = os.path.abspath(root)
+
+    connection = connect()
+    try:
+        with connection:
+            cursor = connection.execute('INSERT INTO searches (time, root, string, deep, show, pathMode, fullSearch, matchMode, '
+                                        'duration, numResults, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                        (time.time(), root, string, bool(optionsList[0]), optionsList[1],
+                                         optionsList[3], bool(optionsList[4]), optionsList[18], duration, numResults, len(data)))
+            searchId = cursor.lastrowid
+            connection.execute('INSERT INTO results (search, data) VALUES (?, ?)', (searchId, data))
+            trim(connection, MAX_HISTORY_SIZE)
+    finally:
+        connection.close()
+
+    return searchId
+
+## Drops the oldest searches until the stored results fit within the given size. The newest search is always kept.
+#
+# @param connection The connection to the history.
+# @param maxSize The most bytes of compressed results to keep.
+def trim(connection, maxSize):
+    total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM searches').fetchone()[0]
+    if total <= maxSize:
+        return
+
+    dropped = []
+    for searchId, size in connection.execute('SELECT id, size FROM searches ORDER BY time').fetchall()[:-1]:
+        if total <= maxSize:
+            break
+        dropped.append((searchId,))
+        total -= size
+    connection.executemany('DELETE FROM searches WHERE id = ?', dropped)
+    connection.executemany('DELETE FROM results WHERE search = ?', dropped)
+
+## Returns the most recent searches, newest first, optionally only those with a given root directory or search string.
+#
+# @param limit The most searches to return.
+# @param root Only return searches of this root directory, or None for any root directory.
+# @param string Only return searches for this search string, or None for any search string.
+# @param remote True if root is a directory on an FTP server, which is matched as it is rather than made absolute.
+# @return A list of tuples of the columns in SEARCH_COLUMNS.
+def recent(limit = 10, root = None, string = None, remote = False):
+    if not os.path.exists(supportDir + historyFileName):
+        return []
+
+    conditions = []
+    values = []
+    if not root == None:
+        conditions.append('root = ?')
+        values.append(remote and root or os.path.abspath(root))
+    if not string == None:
+        conditions.append('string = ?')
+        values.append(string)
+    query = 'SELECT ' + SEARCH_COLUMNS + ' FROM searches'
+    if len(conditions) > 0:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY time DESC LIMIT ?'
+    values.append(limit)
+
+    connection = connect()
+    try:
+        return connection.execute(query, values).fetchall()
+    finally:
+        connection.close()
+
+## Returns the results of a search in the history.
+#
+# @param searchId The id of the search.
+# @return The list of folders, files, and in files results, or None if the search is no longer in the history.
+def results(searchId):
+    connection = connect()
+    try:
+        row = connection.execute('SELECT data FROM results WHERE search = ?', (searchId,)).fetchone()
+    finally:
+        connection.close()
+
+    if row == None:
+        return None
+    return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+## Returns the results of the most recent search of a root directory for a search string.
+#
+# @param root The root directory.
+# @param string The search string.
+# @param remote True if root is a directory on an FTP server.
+# @return The search (a tuple of the columns in SEARCH_COLUMNS) and its list of folders, files, and in files results,
+# or None and None if the history has no such search.
+def lastResults(root, string, remote = False):
+    searches = recent(1, root, string, remote)
+    if len(searches) == 0:
+        return None, None
+    return searches[0], results(searches[0][0])
+
+## Removes every search from the history.
+def clear():
+    connection = connect()
+    try:
+        with connection:
+            connection.execute('DELETE FROM searches')
+            connection.execute('DELETE FROM results')
+        connection.execute('VACUUM')
+    finally:
+        connection.close()
@@ -0,0 +1,513 @@
+#!/usr/bin/env python
+
+# system modules
+import array, os, pickle, random, sys, time
+
+# my modules
+import ContentIndex, PathTable, Search
+
+## This module keeps a persistent index of the directory tree so that name searches can be answered without walking the disk.
+# The index of a large tree is held for as long as the daemon runs, so it is stored compactly: the path of each directory
+# is a node of a PathTable, and the names each directory holds are kept together in a single string of bytes rather than
+# as a list of strings.
+#
+# @file Index.py
+# @version 1.2
+
+## The Support directory, where the index is stored alongside the options file.
+supportDir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+## The filename index file name.
+indexFileName = 'FileIndex.dat'
+## The version of the index file format; an index written in any other format is rebuilt.
+INDEX_VERSION = 2
+## The number of random paths down from the searched directory whose directories have their mtimes checked before the
+# index is trusted to answer a search.
+SAMPLE_SIZE = 64
+
+## The index that has already been read from disk, so that repeated searches do not read it again.
+loadedIndex = None
+
+## The directories of an index, read and written like a dictionary from the absolute path of each directory to its mtime,
+# its list of dirs, and its list of files. The paths are nodes of a PathTable, so that the parent directories they share
+# are stored once, and the names in each directory are kept as one string of bytes, with a null byte (which no name
+# can hold) between each name; the lists are only made again when a directory is read.
+class DirTable:
+    ## Initialize an empty table.
+    #
+    # @param self A pointer to the local class.
+    def __init__(self):
+        ## The PathTable holding the node of each directory, and of the directories above the roots.
+        self.paths = PathTable.PathTable()
+        ## The mtime of the directory of each node.
+        self.mtimes = array.array('d')
+        ## The number of the names in the listing of each node that are dirs; the rest are files.
+        self.numDirs = array.array('I')
+        ## The names of the dirs and then the files in the directory of each node, or None if the node is not in the
+        # index (because it was removed, or lies above a root).
+        self.listings = []
+        ## The number of directories in the table.
+        self.count = 0
+
+    ## Returns the number of directories in the table.
+    #
+    # @param self A pointer to the local class.
+    # @return The number of directories.
+    def __len__(self):
+        return self.count
+
+    ## Returns the node of a directory in the table.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the directory.
+    # @return The number of the node, or None if the directory is not in the table.
+    def node(self, path):
+        node = self.paths.findDir(path)
+        if node == None or self.listings[node] == None:
+            return None
+        return node
+
+    ## Returns the node of a directory in the table below the directory of a node.
+    #
+    # @param self A pointer to the local class.
+    # @param node The number of the node of the directory above.
+    # @param name The name of the directory.
+    # @return The number of the node, or None if the directory is not in the table.
+    def child(self, node, name):
+        node = self.paths.dirNodes.get((node, name))
+        if node == None or self.listings[node] == None:
+            return None
+        return node
+
+    ## Checks to see if a directory is in the table.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the directory.
+    # @return True if the directory is in the table, False otherwise.
+    def __contains__(self, path):
+        return not self.node(path) == None
+
+    ## Returns the record of a directory.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the directory.
+    # @param default What to return if the directory is not in the table.
+    # @return The mtime, the list of dirs, and the list of files of the directory, or default.
+    def get(self, path, default = None):
+        node = self.node(path)
+        if node == None:
+            return default
+        return self.record(node)
+
+    ## Returns the record of a directory.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the directory.
+    # @return The mtime, the list of dirs, and the list of files of the directory.
+    # @throws KeyError If the directory is not in the table.
+    def __getitem__(self, path):
+        node = self.node(path)
+        if node == None:
+            raise KeyError(path)
+        return self.record(node)
+
+    ## Puts the record of a node back together.
+    #
+    # @param self A pointer to the local class.
+    # @param node The number of the node.
+    # @return The mtime, the list of dirs, and the list of files of the directory.
+    def record(self, node):
+        listing = self.listings[node]
+        names = len(listing) > 0 and listing.decode(sys.getfilesystemencoding(), sys.getfilesystemencodeerrors()).split('\0') or []
+        return self.mtimes[node], names[:self.numDirs[node]], names[self.numDirs[node]:]
+
+    ## Stores the record of a directory, replacing the one it had.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the directory.
+    # @param record The mtime, the list of dirs, and the list of files of the directory.
+    def __setitem__(self, path, record):
+        mtime, dirs, nonDirs = record
+        with self.paths.lock:
+            node = self.paths.internDir(path)
+        # the nodes of directories above this one were added along with it
+        while len(self.listings) < len(self.paths):
+            self.mtimes.append(0)
+            self.numDirs.append(0)
+            self.listings.append(None)
+
+        if self.listings[node] == None:
+            self.count += 1
+        self.mtimes[node] = mtime
+        self.numDirs[node] = len(dirs)
+        self.listings[node] = '\0'.join(list(dirs) + list(nonDirs)).encode(sys.getfilesystemencoding(), sys.getfilesystemencodeerrors())
+
+    ## Removes a directory from the table. Its node stays in the PathTable, to be used again if the directory comes back.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the directory.
+    # @param default What to return if the directory is not in the table.
+    # @return The record the directory had, or default.
+    def pop(self, path, default = None):
+        node = self.node(path)
+        if node == None:
+            return default
+        record = self.record(node)
+        self.listings[node] = None
+        self.count -= 1
+        return record
+
+    ## Iterates through the absolute paths of the directories.
+    #
+    # @param self A pointer to the local class.
+    # @return A generator yielding each path.
+    def __iter__(self):
+        for node in range(len(self.listings)):
+            if not self.listings[node] == None:
+                yield self.paths.path(node)
+
+    ## Iterates through the directories and their records.
+    #
+    # @param self A pointer to the local class.
+    # @return A generator yielding the absolute path and the record of each directory.
+    def items(self):
+        for node in range(len(self.listings)):
+            if not self.listings[node] == None:
+                yield self.paths.path(node), self.record(node)
+
+    ## Iterates through the records of the directories.
+    #
+    # @param self A pointer to the local class.
+    # @return A generator yielding the record of each directory.
+    def values(self):
+        for node in range(len(self.listings)):
+            if not self.listings[node] == None:
+                yield self.record(node)
+
+## The index of the directory tree below one or more root directories.
+class Index:
+    ## Initialize an empty index.
+    #
+    # @param self A pointer to the local class.
+    def __init__(self):
+        ## The absolute paths of the directories the index was built from.
+        self.roots = []
+        ## The time each root was last built or refreshed.
+        self.built = {}
+        ## Maps the absolute path of each indexed directory to its mtime, its list of dirs, and its list of files.
+        self.dirs = DirTable()
+
+    ## Checks to see if the given directory is covered by the index.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory to check.
+    # @return True if the directory was indexed, False otherwise.
+    def covers(self, top):
+        return os.path.abspath(top) in self.dirs
+
+    ## Checks to see if the index still matches the disk below the given directory, the same way a cached search result
+    # is checked: a directory's mtime changes whenever an entry is added to, removed from, or renamed within it, so the
+    # directory itself and the directories along a random sample of paths down from it are stat'ed, and compared with
+    # the mtimes they were indexed with. Only a stat per sampled directory is needed, so the check costs far less than
+    # a walk; a change in a directory outside the sample is only caught by the next refresh.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory to check, which must be covered by the index.
+    # @return True if none of the sampled directories has changed, False otherwise.
+    def isFresh(self, top):
+        top = os.path.abspath(top)
+        checked = set()
+        for i in range(SAMPLE_SIZE):
+            path = top
+            while True:
+                record = self.dirs.get(path)
+                if record == None:
+                    break
+                if not path in checked:
+                    checked.add(path)
+                    try:
+                        if os.stat(path).st_mtime != record[0]:
+                            return False
+                    except OSError:
+                        return False
+                # only the subdirectories that were entered are in the index
+                dirs = [name for name in record[1] if os.path.join(path, name) in self.dirs]
+                if len(dirs) == 0:
+                    break
+                path = os.path.join(path, random.choice(dirs))
+        return True
+
+    ## Returns the root the given directory was indexed under.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory to check.
+    # @return The indexed root containing the directory, or None if the directory is not indexed.
+    def rootOf(self, top):
+        top = os.path.abspath(top)
+        for root in self.roots:
+            if top == root or top.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return None
+
+    ## Returns the number of directories and files in the index.
+    #
+    # @param self A pointer to the local class.
+    # @return The number of directories and the number of files.
+    def size(self):
+        numFiles = 0
+        for record in self.dirs.values():
+            numFiles += len(record[2])
+        return len(self.dirs), numFiles
+
+    ## Walks through the index in the same top-down order as Search.localWalk. The lists yielded are copies, so a
+    # caller may remove dirs from them (to skip hidden folders) without changing the index.
+    #
+    # @param self A pointer to the local class.
+    # @param top The current top directory.
+    # @return The current root, a list of dirs in the cwd, and a list of files in the cwd.
+    def walk(self, top):
+        node = self.dirs.node(os.path.abspath(top))
+        if node == None:
+            return
+        for x in self.walkNode(top, node):
+            yield x
+
+    ## Walks through the index below the directory of a node, following the nodes of its subdirectories rather than
+    # looking up each of their paths.
+    #
+    # @param self A pointer to the local class.
+    # @param top The current top directory.
+    # @param node The number of the node of the current top directory.
+    # @return The current root, a list of dirs in the cwd, and a list of files in the cwd.
+    def walkNode(self, top, node):
+        mtime, dirs, nonDirs = self.dirs.record(node)
+
+        yield top, dirs, nonDirs
+        for name in dirs:
+            # symbolic links to directories are listed but were never entered, just as in a live walk
+            child = self.dirs.child(node, name)
+            if not child == None:
+                for x in self.walkNode(os.path.join(top, name), child):
+                    yield x
+
+    ## Lists a directory and records it in the index.
+    #
+    # @param self A pointer to the local class.
+    # @param search The Search whose directory listing is used.
+    # @param top The absolute path of the directory.
+    # @return The list of subdirectories to be entered, or None if the directory could not be read.
+    def record(self, search, top):
+        # the mtime is read before the listing so that a change made during the listing is caught by the next refresh
+        try:
+            mtime = os.stat(top).st_mtime
+        except OSError:
+            return None
+        listing = search.readDir(top)
+        if listing == None:
+            return None
+        dirs, nonDirs, links = listing
+
+        self.dirs[top] = (mtime, dirs, nonDirs)
+        return [name for name in dirs if not name in links]
+
+    ## Removes a directory and everything below it from the index.
+    #
+    # @param self A pointer to the local class.
+    # @param top The absolute path of the directory.
+    def forget(self, top):
+        record = self.dirs.pop(top, None)
+        if record == None:
+            return
+        for name in record[1]:
+            self.forget(os.path.join(top, name))
+
+    ## Brings a single entry of an indexed directory up to date with the disk, after it was reported created, deleted,
+    # or moved. A subdirectory that was there before is forgotten along with everything below it, since another
+    # directory may have been moved into its place; a subdirectory that is there now is added to the directory's list,
+    # but is not listed itself.
+    #
+    # @param self A pointer to the local class.
+    # @param top The absolute path of the indexed directory.
+    # @param name The name of the entry.
+    # @return The absolute path of the subdirectory to be recorded, or None if there is none.
+    def updateEntry(self, top, name):
+        record = self.dirs.get(top)
+        if record == None:
+            return None
+        mtime, dirs, nonDirs = record
+        path = os.path.join(top, name)
+
+        if name in dirs:
+            self.forget(path)
+        dirs = [x for x in dirs if not x == name]
+        nonDirs = [x for x in nonDirs if not x == name]
+
+        # the entry is told apart just as Search.listDir tells it apart
+        enter = None
+        if os.path.isdir(path):
+            dirs.append(name)
+            if not os.path.islink(path):
+                enter = path
+        elif os.path.lexists(path):
+            nonDirs.append(name)
+
+        try:
+            mtime = os.stat(top).st_mtime
+        except OSError:
+            pass
+        self.dirs[top] = (mtime, dirs, nonDirs)
+        return enter
+
+    ## Walks the directory tree below top and records every directory in the index, replacing whatever was indexed there before.
+    #
+    # @param self A pointer to the local class.
+    # @param top The root directory to be indexed.
+    # @param optionsList The settings list for how the walk will be performed.
+    def build(self, top, optionsList):
+        top = os.path.abspath(top)
+        search = Search.Search('', optionsList)
+
+        # a root that was indexed before, or that lies inside another root, is replaced
+        self.forget(top)
+        stack = [top]
+        while len(stack) > 0:
+            path = stack.pop()
+            dirs = self.record(search, path)
+            if dirs != None:
+                for name in reversed(dirs):
+                    stack.append(os.path.join(path, name))
+
+        # roots below the new root are now covered by it
+        for root in self.roots[:]:
+            if root.startswith(top.rstrip(os.sep) + os.sep):
+                self.roots.remove(root)
+                self.built.pop(root, None)
+        if self.rootOf(top) == None:
+            self.roots.append(top)
+        self.built[self.rootOf(top)] = time.time()
+
+    ## Brings the index for the given root up to date without rebuilding it. A directory's mtime changes whenever an entry
+    # is added to, removed from, or renamed within it, so only the directories themselves are stat'ed; just those whose
+    # mtime has changed are listed again, and everything else is taken from the index. The directories are visited in the
+    # same top-down order as Search.localWalk.
+    #
+    # @param self A pointer to the local class.
+    # @param top The root directory to be refreshed.
+    # @param optionsList The settings list for how the walk will be performed.
+    # @return The number of directories checked and the number of directories that had to be listed again.
+    def refresh(self, top, optionsList):
+        top = os.path.abspath(top)
+        search = Search.Search('', optionsList)
+        numChecked, numListed = 0, 0
+
+        stack = [top]
+        while len(stack) > 0:
+            path = stack.pop()
+            old = self.dirs.get(path)
+            numChecked += 1
+
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                # the directory is gone, so everything below it is too
+                self.forget(path)
+                continue
+
+            if old != None and old[0] == mtime:
+                # nothing was added or removed here; only the subdirectories that were entered before are entered again
+                dirs = [name for name in old[1] if os.path.join(path, name) in self.dirs]
+            else:
+                numListed += 1
+                dirs = self.record(search, path)
+                if dirs == None:
+                    self.forget(path)
+                    continue
+
+                # subdirectories that have been removed or renamed are forgotten along with everything below them
+                if old != None:
+                    for name in old[1]:
+                        if not name in dirs:
+                            self.forget(os.path.join(path, name))
+
+            for name in reversed(dirs):
+                stack.append(os.path.join(path, name))
+
+        if self.rootOf(top) == None:
+            self.roots.append(top)
+        self.built[self.rootOf(top)] = time.time()
+
+        return numChecked, numListed
+
+## Reads the filename index from the Support directory.
+#
+# @return The index, or None if no index has been built.
+def load():
+    global loadedIndex
+
+    if loadedIndex != None:
+        return loadedIndex
+    if not os.path.exists(supportDir + indexFileName):
+        return None
+
+    try:
+        indexFile = open(supportDir + indexFileName, 'rb')
+        try:
+            data = pickle.load(indexFile)
+        finally:
+            indexFile.close()
+        if data[0] != INDEX_VERSION:
+            return None
+        loadedIndex = data[1]
+    except:
+        # an unreadable index is treated as though none had been built
+        return None
+
+    return loadedIndex
+
+## Writes the filename index to the Support directory.
+#
+# @param index The index to be written.
+def save(index):
+    global loadedIndex
+
+    # write to a temporary file first so that an interrupted write never leaves a broken index behind
+    indexFile = open(supportDir + indexFileName + '.tmp', 'wb')
+    try:
+        pickle.dump((INDEX_VERSION, index), indexFile, pickle.HIGHEST_PROTOCOL)
+    finally:
+        indexFile.close()
+    os.replace(supportDir + indexFileName + '.tmp', supportDir + indexFileName)
+
+    loadedIndex = index
+
+## Builds the filename index for the given root directory and writes it to the Support directory.
+#
+# @param top The root directory to be indexed.
+# @param optionsList The settings list for how the walk will be performed.
+# @return The index.
+def rebuild(top, optionsList):
+    index = load()
+    if index == None:
+        index = Index()
+    index.build(top, optionsList)
+    save(index)
+    # the content index is built from the same walk
+    if optionsList[15]:
+        ContentIndex.update(top, index, True)
+    return index
+
+## Brings the filename index for the given root directory up to date, building it if the root has not been indexed,
+# and writes it to the Support directory.
+#
+# @param top The root directory to be refreshed.
+# @param optionsList The settings list for how the walk will be performed.
+# @return The index, the number of directories checked, and the number of directories that had to be listed again.
+def refresh(top, optionsList):
+    index = load()
+    if index == None:
+        index = Index()
+    numChecked, numListed = index.refresh(top, optionsList)
+    save(index)
+    # only the files that are new or have changed since the last pass are read into the content index
+    if optionsList[15]:
+        ContentIndex.update(top, index, False)
+    return index, numChecked, numListed
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+# system modules
+import heapq, json, os, threading, time
+
+## This module counts the calls a search makes in each phase of its work, and the time they take, so that a slow search
+# shows where its time went: listing directories, telling the directories from the files, checking whether files are
+# binary, opening files, reading them, or matching the search string against them. It also keeps the directories that
+# took the longest to list and the files that took the longest to search. A search only does this when it is handed an
+# Instruments, so an ordinary search pays nothing more than a check of one attribute per directory and per file.
+#
+# @file Instruments.py
+# @version 1.2
+
+## The Support directory, where the report of the last instrumented search is written alongside the options file.
+supportDir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+## The search statistics file name.
+statsFileName = 'SearchStats.json'
+
+## Listing a directory (os.listdir, os.scandir, or a remote listing).
+PHASE_LISTDIR = 'listdir'
+## Telling the entries of a directory apart, and reading the size of each file to be Deep Searched.
+PHASE_STAT = 'stat'
+## Checking whether a file is binary, from the binary cache or its first block.
+PHASE_BINARY = 'binary'
+## Opening a file, and memory-mapping it for the memory-mapped engine.
+PHASE_OPEN = 'open'
+## Reading a file (a remote file, the whole download).
+PHASE_READ = 'read'
+## Matching the search string against the contents of a file. A memory-mapped file is read as its pages are first
+# touched, which happens while it is matched, so for the memory-mapped engines this includes the reading.
+PHASE_MATCH = 'match'
+## Every phase, in the order the work of a search goes through them.
+PHASES = [PHASE_LISTDIR, PHASE_STAT, PHASE_BINARY, PHASE_OPEN, PHASE_READ, PHASE_MATCH]
+
+## The number of slowest directories and slowest files kept.
+SLOWEST_SIZE = 10
+
+## The calls and times of each phase of a search. Several walker threads may add to it at once, and a copy sent to a
+# Deep Search process can be merged back into it.
+class Instruments:
+    ## Initialize empty counts and times.
+    #
+    # @param self A pointer to the local class.
+    def __init__(self):
+        ## The number of calls made in each phase.
+        self.calls = dict.fromkeys(PHASES, 0)
+        ## The number of seconds spent in each phase.
+        self.times = dict.fromkeys(PHASES, 0.0)
+        ## A heap of the time and path of the directories that took the longest to list.
+        self.slowestDirs = []
+        ## A heap of the time and path of the files that took the longest to search.
+        self.slowestFiles = []
+        ## Guards the counts and times when several walker threads are searching.
+        self.lock = threading.Lock()
+
+    ## Returns the state to be pickled, for sending to a Deep Search process; the lock cannot be pickled.
+    #
+    # @param self A pointer to the local class.
+    # @return The counts, times, and slowest directories and files.
+    def __getstate__(self):
+        return (self.calls, self.times, self.slowestDirs, self.slowestFiles)
+
+    ## Restores the state that was pickled.
+    #
+    # @param self A pointer to the local class.
+    # @param state The counts, times, and slowest directories and files.
+    def __setstate__(self, state):
+        self.calls, self.times, self.slowestDirs, self.slowestFiles = state
+        self.lock = threading.Lock()
+
+    ## Adds calls to a phase.
+    #
+    # @param self A pointer to the local class.
+    # @param phase The phase (one of PHASES).
+    # @param elapsed The number of seconds the calls took.
+    # @param calls The number of calls.
+    def add(self, phase, elapsed, calls = 1):
+        with self.lock:
+            self.calls[phase] += calls
+            self.times[phase] += elapsed
+
+    ## Keeps a directory if it is one of the slowest to list so far.
+    #
+    # @param self A pointer to the local class.
+    # @param path The path of the directory.
+    # @param elapsed The number of seconds it took to list.
+    def addDir(self, path, elapsed):
+        with self.lock:
+            keepSlowest(self.slowestDirs, path, elapsed)
+
+    ## Keeps a file if it is one of the slowest to search so far.
+    #
+    # @param self A pointer to the local class.
+    # @param path The path of the file.
+    # @param elapsed The number of seconds it took to search.
+    def addFile(self, path, elapsed):
+        with self.lock:
+            keepSlowest(self.slowestFiles, path, elapsed)
+
+    ## Adds the counts, times, and slowest directories and files of another Instruments to these.
+    #
+    # @param self A pointer to the local class.
+    # @param other The other Instruments.
+    def merge(self, other):
+        with self.lock:
+            for phase in PHASES:
+                self.calls[phase] += other.calls[phase]
+                self.times[phase] += other.times[phase]
+            for elapsed, path in other.slowestDirs:
+                keepSlowest(self.slowestDirs, path, elapsed)
+            for elapsed, path in other.slowestFiles:
+                keepSlowest(self.slowestFiles, path, elapsed)
+
+    ## Reads the lines of a text file a block at a time, so that reading the file and matching its lines can be timed
+    # apart: the time spent reading each block is added to the read phase, and the time the caller spends on the lines
+    # of the block before asking for the next one is added to the match phase. The whole file counts as one call of each.
+    #
+    # @param self A pointer to the local class.
+    # @param fileStream The open text file.
+    # @param blockSize The number of characters to read at a time, roughly.
+    # @return A generator yielding each line of the file.
+    def readLines(self, fileStream, blockSize):
+        calls = 1
+        while True:
+            started = time.perf_counter()
+            lines = fileStream.readlines(blockSize)
+            read = time.perf_counter()
+            self.add(PHASE_READ, read - started, calls)
+            if len(lines) == 0:
+                return
+            try:
+                for line in lines:
+                    yield line
+            finally:
+                # also runs when the caller stops reading partway through the block
+                self.add(PHASE_MATCH, time.perf_counter() - read, calls)
+            calls = 0
+
+    ## Returns the report of the counts and times, ready to be written as JSON.
+    #
+    # @param self A pointer to the local class.
+    # @param search The finished Search.Search the counts and times were taken from.
+    # @param elapsed The number of seconds the whole search took.
+    # @return The report.
+    def report(self, search, elapsed):
+        with self.lock:
+            phases = {}
+            for phase in PHASES:
+                phases[phase] = {'calls': self.calls[phase], 'seconds': round(self.times[phase], 6)}
+            return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'string': search.string, 'root': search.optionsList[5], \
+                    'seconds': round(elapsed, 6), 'threads': search.optionsList[9], 'dirs': search.numDirs, \
+                    'files': search.numFiles, 'bytes': search.numBytes, 'usedIndex': search.usedIndex, \
+                    'usedCache': search.usedCache, 'phases': phases, \
+                    'slowestDirs': [{'path': path, 'seconds': round(seconds, 6)} for seconds, path in sorted(self.slowestDirs, reverse = True)], \
+                    'slowestFiles': [{'path': path, 'seconds': round(seconds, 6)} for seconds, path in sorted(self.slowestFiles, reverse = True)]}
+
+## Keeps a path in a heap of the slowest paths if it is slower than the fastest of them.
+#
+# @param heap The heap of the time and path of the slowest paths, the fastest first.
+# @param path The path.
+# @param elapsed The number of seconds it took.
+def keepSlowest(heap, path, elapsed):
+    if len(heap) < SLOWEST_SIZE:
+        heapq.heappush(heap, (elapsed, path))
+    elif elapsed > heap[0][0]:
+        heapq.heapreplace(heap, (elapsed, path))
+
+## Writes the report of an instrumented search as JSON to the Support directory.
+#
+# @param report The report returned by Instruments.report().
+# @return The path the report was written to, or None if it could not be written.
+def save(report):
+    # write to a temporary file first so that an interrupted write never leaves a broken report behind
+    try:
+        statsFile = open(supportDir + statsFileName + '.tmp', 'w')
+        try:
+            statsFile.write(json.dumps(report, indent = 2, sort_keys = True) + '\n')
+        finally:
+            statsFile.close()
+        os.replace(supportDir + statsFileName + '.tmp', supportDir + statsFileName)
+    except (IOError, OSError):
+        return None
+    return supportDir + statsFileName
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+# system modules
+import ftplib, os, pickle, threading, time
+from collections import OrderedDict
+
+# my modules
+import Remote
+
+## This module keeps the listings of remote directories from past searches, so that a repeat search of an FTP server
+# only lists the directories that have changed. Each listing is stored with the modify fact of its directory (the MLSD
+# modify time, or the date a LIST shows). A listing read within the last LISTING_TTL seconds is used as it is. An older
+# one is checked before it is used: against the modify fact in its parent's listing, if the parent was just listed
+# again, or else with a single MLST of the directory, which costs one reply on the control connection rather than a
+# data connection and a transfer. The listings are kept in the Support directory; the least recently used are dropped
+# once they hold more than MAX_LISTING_ENTRIES entries.
+#
+# @file Listings.py
+# @version 1.2
+
+## The Support directory, where the listings are stored alongside the options file.
+supportDir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+## The remote listings file name.
+listingsFileName = 'RemoteListings.dat'
+## The version of the listings file format; listings written in any other format are thrown away.
+LISTINGS_VERSION = 1
+## The number of seconds a listing is used without checking whether its directory has changed.
+LISTING_TTL = 60
+## The most directory entries kept across every stored listing; the least recently used listings are dropped first.
+MAX_LISTING_ENTRIES = 500000
+
+## Maps the server and the path of each stored directory to the time it was last checked, its modify fact, and its
+# entries, from the least to the most recently used.
+cache = None
+## The number of entries in the stored listings.
+numEntries = 0
+## True if the listings have changed since they were read from the Support directory.
+dirty = False
+## Guards the stored listings, since several walker threads may list at once.
+lock = threading.Lock()
+
+## Returns the key that the listings of a server are stored under.
+#
+# @param ftp The logged in connection.
+# @return The address of the server and the username logged in with.
+def serverKey(ftp):
+    return (ftp.host, getattr(ftp, 'username', None))
+
+## Asks the server for the modify fact of a single directory with MLST.
+#
+# @param ftp The logged in connection.
+# @param top The directory.
+# @return The modify fact, or None if the server does not support MLST or did not send one.
+# @throws ftplib.Error If the connection was lost.
+def modifyFact(ftp, top):
+    if not isinstance(ftp, Remote.Connection) or not ftp.supportsMlsd():
+        return None
+    try:
+        reply = ftp.sendcmd('MLST ' + top)
+    except ftplib.error_perm:
+        return None
+    # the facts are on the line between the first and last lines of the reply
+    for line in reply.splitlines()[1:-1]:
+        for fact in line.strip().split(' ', 1)[0].split(';'):
+            name, _, value = fact.partition('=')
+            if name.lower() == 'modify':
+                return value
+    return None
+
+## The listings one search reads, which come from the stored listings where those are still up to date.
+class Listings:
+    ## Initialize the listings for a search of the given server.
+    #
+    # @param self A pointer to the local class.
+    # @param ftp The connection the search was started with.
+    def __init__(self, ftp):
+        ## The key the listings of the server are stored under.
+        self.server = serverKey(ftp)
+        ## Maps the path of each directory seen in a listing read from the server during this search to its modify fact.
+        self.fresh = {}
+        ## The number of directories listed from the server.
+        self.numListed = 0
+        ## The number of directories served from the stored listings.
+        self.numStored = 0
+        load()
+
+    ## Lists a single remote directory, from the stored listing if its directory has not changed.
+    #
+    # @param self A pointer to the local class.
+    # @param ftp The logged in connection.
+    # @param top The directory to be listed.
+    # @return A list of the name and the facts (see Remote.mlsdFacts) of each entry.
+    # @throws ftplib.Error If the directory could not be listed.
+    def entries(self, ftp, top):
+        global dirty
+
+        key = (self.server, top)
+        with lock:
+            stored = cache.get(key)
+        modify = self.fresh.pop(top, None)
+
+        if not stored == None:
+            checked, storedModify, storedEntries = stored
+            if modify == None and time.time() - checked < LISTING_TTL:
+                upToDate = True
+            else:
+                # the parent's listing was just read, so the modify fact from it can be trusted without asking again
+                if modify == None:
+                    modify = modifyFact(ftp, top)
+                upToDate = not modify == None and modify == storedModify
+            if upToDate:
+                with lock:
+                    if key in cache:
+                        cache[key] = (time.time(), storedModify, storedEntries)
+                        cache.move_to_end(key)
+                        dirty = True
+                self.numStored += 1
+                return storedEntries
+
+        entries = Remote.entries(ftp, top)
+        self.numListed += 1
+        if modify == None:
+            modify = modifyFact(ftp, top)
+        # the subdirectories' modify facts are only current because this listing was just read
+        for name, facts in entries:
+            if facts[0] == 'dir':
+                self.fresh[os.path.join(top, name)] = facts[2]
+        store(key, modify, entries)
+        return entries
+
+    ## Lists a single remote directory, from the stored listing if its directory has not changed.
+    #
+    # @param self A pointer to the local class.
+    # @param ftp The logged in connection.
+    # @param top The directory to be listed.
+    # @return A list of dirs and a list of files. Symbolic links are left out.
+    # @throws ftplib.Error If the directory could not be listed.
+    def listDir(self, ftp, top):
+        dirs, nonDirs = [], []
+        for name, facts in self.entries(ftp, top):
+            if facts[0] == 'dir':
+                dirs.append(name)
+            elif facts[0] == 'file':
+                nonDirs.append(name)
+        return dirs, nonDirs
+
+## Stores the listing of a directory, dropping the least recently used listings to stay within MAX_LISTING_ENTRIES.
+#
+# @param key The server and the path of the directory.
+# @param modify The modify fact of the directory, or None if it is not known.
+# @param entries The list of the name and the facts of each entry.
+def store(key, modify, entries):
+    global numEntries, dirty
+
+    with lock:
+        old = cache.pop(key, None)
+        if not old == None:
+            numEntries -= len(old[2])
+        cache[key] = (time.time(), modify, entries)
+        numEntries += len(entries)
+        while numEntries > MAX_LISTING_ENTRIES and len(cache) > 1:
+            numEntries -= len(cache.popitem(last = False)[1][2])
+        dirty = True
+
+## Reads the stored listings from the Support directory, if they have not been read already.
+#
+# @return The stored listings.
+def load():
+    global cache, numEntries
+
+    if cache != None:
+        return cache
+
+    with lock:
+        if cache == None:
+            try:
+                listingsFile = open(supportDir + listingsFileName, 'rb')
+                try:
+                    data = pickle.load(listingsFile)
+                finally:
+                    listingsFile.close()
+                if data[0] != LISTINGS_VERSION:
+                    raise ValueError
+                cache = data[1]
+            except:
+                # missing or unreadable listings are simply started again
+                cache = OrderedDict()
+            numEntries = sum([len(stored[2]) for stored in cache.values()])
+    return cache
+
+## Writes the stored listings to the Support directory if they have changed.
+def save():
+    global dirty
+
+    if not dirty:
+        return
+
+    with lock:
+        # write to a temporary file first so that an interrupted write never leaves broken listings behind
+        try:
+            listingsFile = open(supportDir + listingsFileName + '.tmp', 'wb')
+            try:
+                pickle.dump((LISTINGS_VERSION, cache), listingsFile, pickle.HIGHEST_PROTOCOL)
+            finally:
+                listingsFile.close()
+            os.replace(supportDir + listingsFileName + '.tmp', supportDir + listingsFileName)
+            dirty = False
+        except (IOError, OSError):
+            pass
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+
+# system modules
+import re
+from collections import deque
+
+# the regular expression parser, used to find the literal text every match of a regular expression must contain
+try:
+    from re import _parser as regexParser
+except ImportError:
+    import sre_parse as regexParser
+
+## This module contains the matchers that decide whether a name or a line of text matches a search.
+#
+# @file Matcher.py
+# @version 1.2
+
+## The search string is plain text, found anywhere within a name or line.
+MATCH_LITERAL = 0
+## The search string is a shell-style pattern (*, ?, and [...]) that must match a whole name, or any part of a line.
+MATCH_GLOB = 1
+## The search string is a regular expression, found anywhere within a name or line.
+MATCH_REGEX = 2
+
+## Returns the longest run of plain ASCII characters that every match of a parsed regular expression must contain.
+#
+# @param items The parsed regular expression, or a part of it that every match must contain.
+# @return The lowercased literal, which may be empty.
+def longestLiteral(items):
+    best = ''
+    run = ''
+    for op, value in items:
+        if op == regexParser.LITERAL and value < 0x80:
+            run += chr(value).lower()
+            continue
+
+        # anything else ends the run, though a group or a repeat that must appear at least once still has to contain
+        # whatever its own contents must contain
+        if len(run) > len(best):
+            best = run
+        run = ''
+        inner = ''
+        if op == regexParser.SUBPATTERN:
+            inner = longestLiteral(value[-1])
+        elif op in (regexParser.MAX_REPEAT, regexParser.MIN_REPEAT) and value[0] > 0:
+            inner = longestLiteral(value[2])
+        if len(inner) > len(best):
+            best = inner
+
+    if len(run) > len(best):
+        best = run
+    return best
+
+## Returns the longest run of plain ASCII characters that every match of a regular expression must contain.
+#
+# @param expression The regular expression.
+# @return The lowercased literal, which may be empty.
+def requiredLiteral(expression):
+    try:
+        return longestLiteral(regexParser.parse(expression))
+    except Exception:
+        # anything the parser cannot follow simply goes without a literal
+        return ''
+
+## Translates a shell-style pattern into a regular expression, and finds the longest run of plain ASCII characters
+# that every match must contain.
+#
+# @param glob The shell-style pattern.
+# @return The regular expression (unanchored) and the lowercased literal, which may be empty.
+def translateGlob(glob):
+    expression = ''
+    best = ''
+    run = ''
+    i = 0
+    while i < len(glob):
+        char = glob[i]
+        i += 1
+        if char in '*?[':
+            if char == '[':
+                # a ] straight after the opening [ (or [!) is part of the set rather than its end
+                end = i
+                if end < len(glob) and glob[end] == '!':
+                    end += 1
+                if end < len(glob) and glob[end] == ']':
+                    end += 1
+                end = glob.find(']', end)
+                if end == -1:
+                    # an unclosed [ is just a character
+                    expression += re.escape(char)
+                    run += char
+                    continue
+                chars = glob[i:end].replace('\\', '\\\\')
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                elif chars.startswith('^'):
+                    chars = '\\' + chars
+                expression += '[' + chars + ']'
+                i = end + 1
+            elif char == '*':
+                expression += '.*'
+            else:
+                expression += '.'
+
+            if len(run) > len(best):
+                best = run
+            run = ''
+        else:
+            expression += re.escape(char)
+            if ord(char) < 0x80:
+                run += char.lower()
+            else:
+                if len(run) > len(best):
+                    best = run
+                run = ''
+
+    if len(run) > len(best):
+        best = run
+    return expression, best
+
+## Matches names and lines of text against a search string, which may be plain text, a shell-style pattern, or a regular
+# expression; case is always ignored. The search string is compiled once, when the matcher is made. A pattern or regular
+# expression is only run on a name or line that contains its required literal (the text every match must contain),
+# which is a plain substring check, so most non-matching names and lines cost no more than in a literal search.
+class Matcher:
+    ## Compile the search string.
+    #
+    # @param self A pointer to the local class.
+    # @param string The search string.
+    # @param mode MATCH_LITERAL, MATCH_GLOB, or MATCH_REGEX.
+    # @throws re.error If the search string is not a valid regular expression.
+    def __init__(self, string, mode = MATCH_LITERAL):
+        ## The search string.
+        self.string = string
+        ## MATCH_LITERAL, MATCH_GLOB, or MATCH_REGEX.
+        self.mode = mode
+
+        if mode == MATCH_REGEX:
+            expression = string
+            required = requiredLiteral(string)
+        elif mode == MATCH_GLOB:
+            expression, required = translateGlob(string)
+        else:
+            expression = None
+            required = string.lower()
+        ## The lowercased text every match contains; a name or line without it cannot match.
+        self.required = required
+
+        ## The compiled expression that names and lines are matched against, or None for a literal search.
+        self.pattern = None
+        ## The compiled bytes expression that file contents are matched against a line at a time, or None for a literal search.
+        self.bytesPattern = None
+        if expression != None:
+            self.pattern = re.compile(expression, re.IGNORECASE)
+            # a bytes expression can only stand in for the text expression when the text is plain ASCII
+            if expression.isascii():
+                self.bytesPattern = re.compile(expression.encode('utf-8'), re.IGNORECASE | re.MULTILINE)
+
+        ## The compiled bytes expression that finds the places in a file worth checking: the required literal, or the
+        # whole expression when there is no literal to look for. None if file contents cannot be searched as bytes: a bytes
+        # expression only ignores the case of ASCII letters, so any other text is left to the lines engine.
+        self.finder = None
+        if expression == None:
+            if required.isascii():
+                self.finder = re.compile(re.escape(required.encode('utf-8')), re.IGNORECASE)
+        elif self.bytesPattern != None:
+            if required != '':
+                self.finder = re.compile(re.escape(required.encode('utf-8')), re.IGNORECASE)
+            else:
+                self.finder = self.bytesPattern
+
+    ## Checks a file or folder name against the search string.
+    #
+    # @param self A pointer to the local class.
+    # @param name The name of the file or folder.
+    # @return True if the name matches, False otherwise.
+    def matchName(self, name):
+        if name.lower().rfind(self.required) == -1:
+            return False
+        if self.pattern == None:
+            return True
+        # a shell-style pattern describes the whole name
+        if self.mode == MATCH_GLOB:
+            return self.pattern.fullmatch(name) != None
+        return self.pattern.search(name) != None
+
+    ## Checks a line of text against the search string.
+    #
+    # @param self A pointer to the local class.
+    # @param line The line of text.
+    # @return True if the line matches, False otherwise.
+    def matchLine(self, line):
+        if line.lower().rfind(self.required) == -1:
+            return False
+        return self.pattern == None or self.pattern.search(line) != None
+
+    ## Checks the line of a mapped file that the finder has found a possible match on.
+    #
+    # @param self A pointer to the local class.
+    # @param data The contents of the file.
+    # @param start The index of the first byte of the line.
+    # @param end The index just past the last byte of the line.
+    # @param match The match the finder found on the line.
+    # @return True if the line matches, False otherwise.
+    def matchBytes(self, data, start, end, match):
+        if self.bytesPattern == None:
+            return True
+        # the finder already looked for the whole expression when there was no literal to look for instead, although
+        # a match that runs on past the end of the line still has to be checked against the line alone
+        if self.finder is self.bytesPattern and match.end() <= end:
+            return True
+        return self.bytesPattern.search(data, start, end) != None
+
+## An Aho-Corasick automaton, which finds every one of a list of patterns within a string in a single pass over the string.
+class AhoCorasick:
+    ## Build the automaton for the given patterns.
+    #
+    # @param self A pointer to the local class.
+    # @param patterns The list of patterns to be found.
+    def __init__(self, patterns):
+        ## The list of patterns to be found.
+        self.patterns = list(patterns)
+        ## The transitions out of each state, by character.
+        self.goto = [{}]
+        ## The state to fall back to when a character has no transition.
+        self.fail = [0]
+        ## The indices of the patterns that end at each state.
+        self.output = [set()]
+
+        # the trie of the patterns
+        for i in range(len(self.patterns)):
+            state = 0
+            for char in self.patterns[i]:
+                if not char in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].add(i)
+
+        # the failure links, breadth first so that a shorter suffix always has its link before a longer one
+        pending = deque(self.goto[0].values())
+        while len(pending) > 0:
+            state = pending.popleft()
+            for char, nextState in self.goto[state].items():
+                pending.append(nextState)
+                fallback = self.fail[state]
+                while fallback != 0 and not char in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nextState] = self.goto[fallback].get(char, 0)
+                if self.fail[nextState] == nextState:
+                    self.fail[nextState] = 0
+                self.output[nextState] |= self.output[self.fail[nextState]]
+
+    ## Finds the patterns that occur within a string.
+    #
+    # @param self A pointer to the local class.
+    # @param text The string to be searched.
+    # @return The set of the indices of the patterns found.
+    def search(self, text):
+        found = set()
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state != 0 and not char in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        # a pattern that is empty is found everywhere
+        if '' in self.patterns:
+            found.add(self.patterns.index(''))
+        return found
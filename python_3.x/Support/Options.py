@@ -1,10 +1,10 @@
 #!/usr/bin/env python
 
 # system modules
-import ftplib, getpass, re, os
+import ftplib, getpass, re, os, time
 
 # my modules
-import FileHandler, Output
+import Cache, FileHandler, History, Index, Matcher, Output, Remote, Search
 
 ## This module contains the methods that allow the users to specify specific options for the search.
 #
@@ -131,7 +131,7 @@ def options(fastSearchDir, optionsList, colors):
                 if isValidLogin(address, username, password):
                     temp = optionsList[5]
                     optionsList[5] = address
-                    ftp = ftplib.FTP(address)
+                    ftp = Remote.Connection(address)
                     ftp.login(username, password)
                     if not localDir == None or (not localDir == None and localDir.strip() == ''):
                         try:
@@ -163,7 +163,14 @@ def options(fastSearchDir, optionsList, colors):
             'recent', 'recent searches', 'recent search', 'history'):
             optionsList[8] = not optionsList[8]
             FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
-            print(colors.alert() + '...Recent search results will %s be stored in RecentSearches.txt' % (optionsList[8] and 'now' or 'no longer') + '...\n' + colors.end())
+            print(colors.alert() + '...Recent search results will %s be stored in RecentSearches.db' % (optionsList[8] and 'now' or 'no longer') + '...\n' + colors.end())
+        # the user wants to forget the recent searches
+        elif string in ('clear history', 'clear recent', 'clear recent searches', 'forget history', 'forget recent searches', 'delete history'):
+            try:
+                History.clear()
+                print(colors.alert() + '...The recent searches have been cleared...\n' + colors.end())
+            except History.Error:
+                print(colors.error() + 'The recent searches could not be cleared.\n' + colors.end())
         # the user wants the screen to clear
         elif string in ('c', 'clear', 'clear screen', 'clear shell', 'clear console', 'clear terminal', 'cls', 'clr'):
             optionsList[7] = not optionsList[7]
@@ -175,9 +182,11 @@ def options(fastSearchDir, optionsList, colors):
             string = input(colors.cyan() + 'Enter the number of threads to split the search into: ' + colors.end())
             # ensure that the user entered an interger
             try:
+                if int(string) < 1:
+                    raise ValueError
                 optionsList[9] = int(string)
                 FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
-                print(colors.alert() + '...The search will no be split into ' + str(optionsList[9]) + ' threads...\n' + colors.end())
+                print(colors.alert() + '...The search will now be split into ' + str(optionsList[9]) + ' threads...\n' + colors.end())
             except:
                 print(colors.error() + 'You did not specify a valid integer for the new thread count.' + colors.end())
                 print(colors.alert() + '...The thread count remains at ' + str(optionsList[9]) + '...\n' + colors.end())
@@ -211,6 +220,141 @@ def options(fastSearchDir, optionsList, colors):
             FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
             colors.setColors(optionsList)
             print(colors.alert() + '...Text coloring will %s be used' % (optionsList[11] and 'now' or 'no longer') + '...\n' + colors.end())
+        # the user wants to change the directory walker
+        elif string in ('w', 'walk', 'walker', 'dir walker', 'directory walker', 'scandir', 'listdir', 'standard walker', 'scandir walker'):
+            if optionsList[12] == Search.WALKER_SCANDIR:
+                optionsList[12] = Search.WALKER_STANDARD
+            else:
+                optionsList[12] = Search.WALKER_SCANDIR
+            FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+            print(colors.alert() + '...The search will now use the %s directory walker' % (optionsList[12] == Search.WALKER_SCANDIR and 'scandir' or 'standard') + '...\n' + colors.end())
+        # the user wants to change the number of deep search processes
+        elif string in ('m', 'multiprocess', 'multiprocessing', 'process', 'processes', 'deep search process', 'deep search processes', 'num processes', \
+            'number of processes'):
+            string = input(colors.cyan() + 'Enter the number of processes to scan file contents in (0 to scan them in the walk): ' + colors.end())
+            # ensure that the user entered an interger
+            try:
+                if int(string) < 0:
+                    raise ValueError
+                optionsList[13] = int(string)
+                FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+                print(colors.alert() + '...Deep Searches will now scan file contents %s' % (optionsList[13] == 0 and 'in the walk' \
+                      or 'in ' + str(optionsList[13]) + ' processes') + '...\n' + colors.end())
+            except:
+                print(colors.error() + 'You did not specify a valid integer for the new process count.' + colors.end())
+                print(colors.alert() + '...The process count remains at ' + str(optionsList[13]) + '...\n' + colors.end())
+        # the user wants to change how long a search may run for
+        elif string in ('time', 'time limit', 'timeout', 'deadline', 'search time limit'):
+            string = input(colors.cyan() + 'Enter the number of seconds a search may run for (0 for no limit): ' + colors.end())
+            # ensure that the user entered an interger
+            try:
+                if int(string) < 0:
+                    raise ValueError
+                optionsList[19] = int(string)
+                FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+                print(colors.alert() + '...Searches will now %s' % (optionsList[19] == 0 and 'run until they are finished' \
+                      or 'stop after ' + str(optionsList[19]) + ' seconds') + '...\n' + colors.end())
+            except:
+                print(colors.error() + 'You did not specify a valid integer for the new time limit.' + colors.end())
+                print(colors.alert() + '...The time limit remains at ' + str(optionsList[19]) + '...\n' + colors.end())
+        # the user wants to change how many results a search may find
+        elif string in ('limit', 'max', 'max results', 'result limit', 'results limit', 'search result limit'):
+            string = input(colors.cyan() + 'Enter the number of results a search may find (0 for no limit): ' + colors.end())
+            # ensure that the user entered an interger
+            try:
+                if int(string) < 0:
+                    raise ValueError
+                optionsList[20] = int(string)
+                FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+                print(colors.alert() + '...Searches will now %s' % (optionsList[20] == 0 and 'find every result' \
+                      or 'stop after ' + str(optionsList[20]) + ' results') + '...\n' + colors.end())
+            except:
+                print(colors.error() + 'You did not specify a valid integer for the new result limit.' + colors.end())
+                print(colors.alert() + '...The result limit remains at ' + str(optionsList[20]) + '...\n' + colors.end())
+        # the user wants to change how much memory the result cache may use
+        elif string in ('cache', 'cache size', 'result cache', 'result cache size'):
+            string = input(colors.cyan() + 'Enter the number of MB recent search results may use (0 to turn the cache off): ' + colors.end())
+            # ensure that the user entered an interger
+            try:
+                if int(string) < 0:
+                    raise ValueError
+                optionsList[21] = int(string)
+                FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+                if optionsList[21] == 0:
+                    Cache.resultCache.clear()
+                print(colors.alert() + '...Recent search results will now %s' % (optionsList[21] == 0 and 'not be reused' \
+                      or 'be reused, using up to ' + str(optionsList[21]) + ' MB') + '...\n' + colors.end())
+            except:
+                print(colors.error() + 'You did not specify a valid integer for the new cache size.' + colors.end())
+                print(colors.alert() + '...The cache size remains at ' + str(optionsList[21]) + ' MB...\n' + colors.end())
+        # the user wants to build the filename index for the root directory
+        elif string in ('index', 'build index', 'rebuild index', 'build', 'rebuild', 'reindex', 're-index', 'make index', 'index root'):
+            if not optionsList[6] == None:
+                print(colors.error() + 'Only a local root directory can be indexed. The index has not changed.' + colors.end())
+                print(colors.alert() + '...The root directory remains ' + optionsList[5] + '...\n' + colors.end())
+                continue
+            print(colors.alert() + 'Indexing ' + optionsList[5] + ' ...' + colors.end())
+            startTime = time.time()
+            index = Index.rebuild(optionsList[5], optionsList)
+            numDirs, numFiles = index.size()
+            print(colors.alert() + '...The filename index now holds ' + str(numDirs) + ' folders and ' + str(numFiles) + ' files (built in ' \
+                  + str(round(time.time() - startTime, 2)) + ' seconds)...\n' + colors.end())
+        # the user wants to bring the filename index for the root directory up to date
+        elif string in ('refresh', 'refresh index', 'update index', 'index refresh', 'index update'):
+            if not optionsList[6] == None:
+                print(colors.error() + 'Only a local root directory can be indexed. The index has not changed.' + colors.end())
+                print(colors.alert() + '...The root directory remains ' + optionsList[5] + '...\n' + colors.end())
+                continue
+            print(colors.alert() + 'Refreshing the index of ' + optionsList[5] + ' ...' + colors.end())
+            startTime = time.time()
+            index, numChecked, numListed = Index.refresh(optionsList[5], optionsList)
+            numDirs, numFiles = index.size()
+            print(colors.alert() + '...' + str(numListed) + ' of ' + str(numChecked) + ' folders had changed; the filename index now holds ' \
+                  + str(numDirs) + ' folders and ' + str(numFiles) + ' files (refreshed in ' + str(round(time.time() - startTime, 2)) + ' seconds)...\n' + colors.end())
+        # the user wants to enable or disable searching from the filename index
+        elif string in ('use index', 'use the index', 'index search', 'search index', 'toggle index', 'disable index', 'enable index'):
+            optionsList[14] = not optionsList[14]
+            FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+            print(colors.alert() + '...Searches will %s be answered from the filename index' % (optionsList[14] and 'now' or 'no longer') + '...\n' + colors.end())
+        # the user wants to enable or disable the content index
+        elif string in ('content index', 'content', 'trigram', 'trigrams', 'trigram index', 'deep search index', 'index content', 'index contents'):
+            optionsList[15] = not optionsList[15]
+            FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+            print(colors.alert() + '...The content index will %s be built alongside the filename index' % (optionsList[15] and 'now' or 'no longer') \
+                  + (optionsList[15] and ' (type \'index\' to build it now)' or '') + '...\n' + colors.end())
+        # the user wants to change the deep search engine
+        elif string in ('engine', 'deep search engine', 'mmap', 'memory map', 'memory mapped', 'lines', 'line engine', 'mmap engine'):
+            if optionsList[16] == Search.DEEP_SEARCH_MAPPED:
+                optionsList[16] = Search.DEEP_SEARCH_LINES
+            else:
+                optionsList[16] = Search.DEEP_SEARCH_MAPPED
+            FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+            print(colors.alert() + '...Deep Searches will now %s' % (optionsList[16] == Search.DEEP_SEARCH_MAPPED and 'search the raw bytes of each file' \
+                  or 'read each file line by line') + '...\n' + colors.end())
+        # the user wants to change the file extensions a deep search skips
+        elif string in ('exclude', 'excludes', 'extension', 'extensions', 'excluded extensions', 'exclude extensions', 'skip', 'skip extensions'):
+            string = input(colors.cyan() + 'Enter the extensions to skip, separated by commas (put a dash before an extension to stop skipping it): ' + colors.end())
+            for extension in string.lower().split(','):
+                extension = extension.strip()
+                remove = extension.startswith('-')
+                extension = extension.lstrip('-').strip()
+                if extension == '':
+                    continue
+                if not extension.startswith('.'):
+                    extension = '.' + extension
+                if remove:
+                    optionsList[17].discard(extension)
+                else:
+                    optionsList[17].add(extension)
+            FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+            print(colors.alert() + '...Deep Searches will now skip %s' % (len(optionsList[17]) > 0 and ', '.join(sorted(optionsList[17])) + ' files' \
+                  or 'no files by extension') + '...\n' + colors.end())
+        # the user wants to change how the search string is matched
+        elif string in ('mode', 'match', 'match mode', 'glob', 'regex', 'regular expression', 'regular expressions', 'literal'):
+            optionsList[18] = (optionsList[18] + 1) % 3
+            FileHandler.writeNewOptionsList(fastSearchDir, optionsList, True)
+            print(colors.alert() + '...The search string will now be matched as %s' % (optionsList[18] == Matcher.MATCH_GLOB and 'a shell-style pattern' \
+                  or optionsList[18] == Matcher.MATCH_REGEX and 'a regular expression' or 'plain text') + '...\n' + colors.end())
         elif string in ('show', 'show again', 'show menu', 'menu', 'display', 'display menu', 'option', 'options', 'option menu', 'options menu', 'show option', 'show options'):
             return options(fastSearchDir, optionsList)
         # the user wants to go back to the main menu
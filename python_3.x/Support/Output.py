@@ -4,13 +4,16 @@
 import sys, threading, time, os
 
 # my modules
-import FileHandler, Updater
+import History, Index, Instruments, Search, Updater
 
 ## This module handles standard output to the user.
 #
 # @file Output.py
 # @version 1.2
 
+## The number of times a second the status line is redrawn while a search runs.
+STATUS_REDRAWS_PER_SECOND = 4
+
 ##The class which holds the information regarding print colors to the console.
 class Colors:    
     ## Initialize the colors class.
@@ -114,7 +117,9 @@ def clearScreen():
         # any other operating system commands?
         os.system('cls')
 
-## An independent thread that is responsible for displaying the current status of the ongoing search.
+## An independent thread that is responsible for displaying the current status of the ongoing search. The search only
+# bumps a few counters as it goes; this thread reads them a few times a second and redraws the whole status line in a
+# single write, so that it spends almost all of its time asleep rather than competing with the search.
 class Status(threading.Thread):
     ## Initialize the local class variables with passed in variables.
     #
@@ -137,12 +142,20 @@ class Status(threading.Thread):
         self.search = search
         ## True if the search is done, False otherwise.
         self.done = done
+        ## Set when the search is done, waking the thread straight away rather than at its next redraw.
+        self.finished = threading.Event()
+        if done:
+            self.finished.set()
         ## The pointer to the remote FTP connection, if established
         self.ftpLocation = optionsList[6]
         ## If the screen is to be cleared when the search starts and before results are displayed.
         self.toClearScreen = optionsList[7]
         ## The colors class for output.
         self.colors = colors
+        ## The directory of the search last shown in the status line, and how it was shown, so that it is only worked
+        # out again once the search has moved on to another directory.
+        self.shownDir = None
+        self.shownDirText = ''
     
     ## A peek at the current state of the status thread.
     #
@@ -155,6 +168,7 @@ class Status(threading.Thread):
     # @param self A pointer to the local class.
     def finish(self):
         self.done = True
+        self.finished.set()
         
     ## ***This method is derived from the Python 2.6 source to ensure that FastSearch works with users running Python versions older than 2.6***
     #
@@ -175,17 +189,47 @@ class Status(threading.Thread):
             return '.'
         return os.path.join(*relList)
     
-    ## Sleeps for a given number of hundredths of a second.
+    ## Builds the status line from the counters of the search.
+    #
+    # @param self A pointer to the local class.
+    # @param spin The current character of the pinwheel.
+    # @return The status line, without colors.
+    def statusLine(self, spin):
+        line = 'Searching ' + spin + '   ' + str(self.search.numDirs) + ' Folder%s, ' % (self.search.numDirs != 1 and 's' or '') \
+               + str(self.search.numFiles) + ' File%s' % (self.search.numFiles != 1 and 's' or '')
+        if self.deepSearch and self.ftpLocation == None:
+            line += ', ' + str(round(self.search.numBytes / (1024.0 * 1024.0), 1)) + ' MB Read'
+        
+        # output result count, if any found
+        numResults = self.search.numMatches
+        if numResults > 0:
+            line += '   Found ' + str(numResults) + ' Result%s' % (numResults != 1 and 's' or '')
+        
+        # print two levels in current directory being searched
+        searchDir = self.search.curDir
+        if self.search.optionsList[10] == 2 and not searchDir == None:
+            if not searchDir == self.shownDir:
+                self.shownDir = searchDir
+                self.shownDirText = self.dirText(searchDir)
+            line += '   Searching in: ' + self.shownDirText
+        
+        return line
+    
+    ## Shortens the directory being searched for the status line.
     #
     # @param self A pointer to the local class.
-    # @param count How many counts to wait.
-    def sleep(self, count):
-        for i in range(0, count):
-            time.sleep(0.01)
-            if self.done:
-                return
+    # @param searchDir The directory being searched.
+    # @return The directory as the status line shows it.
+    def dirText(self, searchDir):
+        if not self.ftpLocation == None:
+            return searchDir + os.sep
+        curDir = self.relPath(searchDir, self.path)
+        if len(curDir) > 20:
+            return '[root]' + os.sep + curDir[:curDir.find(os.sep, 20) + 1] + '...'
+        return '[root]' + os.sep + curDir + os.sep
     
-    ## The method executed when the thread starts running. Loops through a 'Searching' animation and displays real-time search count results.
+    ## The method executed when the thread starts running. Redraws a 'Searching' animation and real-time search counts a
+    # few times a second until the search is done.
     #
     # @param self A pointer to the local class.
     def run(self):
@@ -200,71 +244,26 @@ class Status(threading.Thread):
         
         print(self.colors.green() + 'In ' + self.path + ' and all its subfolders, FastSearch is %s' % (self.deepSearch and 'performing a Deep Search ' \
               or 'searching ') + 'for the string \'' + self.string + '\'.' + self.colors.end())
-          
-        # wait for the search to finish and show a progress to reassure the user
-        sys.stdout.write(self.colors.green() + '\nSearching -' + self.colors.end())
-        sys.stdout.flush()
+        sys.stdout.write('\n')
         
-        line = ''
-        dirLine = ''
-        # output results loop until finished
-        while not self.done:
-            spin = ['\\', '|', '/', '-']
-            for i in range(0, len(spin)):
-                self.sleep(10)
-                sys.stdout.write('\b' + spin[i])
-                sys.stdout.flush()
-            
-                if self.done:
-                    break
-            
-            # output result count, if any found
-            numResults = getNumResults(self.search.peek())
-            if numResults > 0:
-                line = '               Found ' + str(numResults) + ' Result%s' % (numResults != 1 and 's' or '')
-                sys.stdout.write(self.colors.green() + line + self.colors.end())
-                sys.stdout.flush()
-			
-			# print two levels in current directory being searched
-            if self.search.optionsList[10] == 2:
-                if self.ftpLocation == None:
-                    curDir = self.relPath(self.search.curDir, self.path)
-                else:
-                    curDir = self.search.curDir
-                
-                if not self.ftpLocation == None:
-                    curDir = curDir + os.sep
-                elif len(curDir) > 20:
-                    curDir = '[root]' + os.sep + curDir[:curDir.find(os.sep, 20) + 1] + '...'
-                else:
-                    curDir = '[root]' + os.sep + curDir + os.sep
-                
-                for char in dirLine:
-                    sys.stdout.write(' ')
-                for char in dirLine:
-                    sys.stdout.write('\b')
-                
-                dirLine = '          Searching in: ' + curDir
-                sys.stdout.write(self.colors.green() + dirLine + self.colors.end())
-                
-                for char in dirLine:
-                    sys.stdout.write('\b')
-                sys.stdout.flush()
+        spin = ['\\', '|', '/', '-']
+        frame = 0
+        width = 0
+        # redraw until finished, waking early as soon as the search is done
+        while not self.finished.wait(1.0 / STATUS_REDRAWS_PER_SECOND):
+            line = self.statusLine(spin[frame % len(spin)])
+            frame += 1
             
-            for char in line:
-                sys.stdout.write('\b')
-		
-		# wipe search count from line, if it was displayed
-        if not line == None:
-            for char in line, dirLine:
-                sys.stdout.write(' ')
-            for char in line, dirLine:
-                sys.stdout.write('\b')
-		
-        sys.stdout.write('\b\b\b\b\b\b\b\b\b\b\b           \b\b\b\b\b\b\b\b\b\b\b')
+            # the whole line goes out in one write, padded to cover whatever was left of a longer line before it
+            sys.stdout.write('\r' + self.colors.green() + line + ' ' * (width - len(line)) + self.colors.end())
+            sys.stdout.flush()
+            width = len(line)
+        
+        # wipe the status line
+        sys.stdout.write('\r' + ' ' * width + '\r')
         sys.stdout.flush()
-		
-        if self.toClearScreen:		
+        
+        if self.toClearScreen:
             clearScreen()
 
 ## This method displays the current options to the user.
@@ -295,19 +294,35 @@ def options(optionsList, colors):
     print('        or no path.')
     print('        NOTE: A full (absolute) path is always shown in the results')
     print('        of remote searches.')
+    print('     Match Mode: %s' % (optionsList[18] == 1 and 'Glob' or optionsList[18] == 2 and 'Regular Expression' or 'Literal'))
+    print('        Match the search string as plain text, as a shell-style pattern')
+    print('        (*, ?, and [...]) that must match a whole name, or as a regular')
+    print('        expression. Case is always ignored. Type \'mode\' to switch.')
     print('     F(u)ll Search: %s' % (optionsList[4] and 'Yes' or 'No'))
     print('        If a full search is disabled, FastSearch will stop at the first')
     print('        result.')
+    print('     Time Limit: %s' % (optionsList[19] == 0 and 'None' or str(optionsList[19]) + ' Seconds'))
+    print('     Result Limit: %s' % (optionsList[20] == 0 and 'None' or str(optionsList[20]) + ' Results'))
+    print('        Stops a search once it has run for this long or found this many')
+    print('        results, and shows what it found so far. Pressing Ctrl+C stops')
+    print('        a search in the same way. Type \'time limit\' or \'result limit\'')
+    print('        to change them.')
+    print('     Result Cache: %s' % (optionsList[21] == 0 and 'Off' or str(optionsList[21]) + ' MB'))
+    print('        Answers a search again from the results of a recent one while')
+    print('        the folders it looked at are unchanged, and answers a search for')
+    print('        longer plain text from those of a search for part of it. Type')
+    print('        \'cache\' to change how much memory it may use (0 turns it off).')
     print('     (S)ave Recent Searches: %s' % (optionsList[8] and 'Yes' or 'No'))
     print('        Store information regarding recent searches (including their')
-    print('        results) in RecentSearches.txt.')
+    print('        results) in RecentSearches.db. Type \'r\' from the main menu to')
+    print('        see them again, or \'clear history\' here to forget them.')
     print('     (C)lear Screen: %s' % (optionsList[7] and 'Yes' or 'No'))
     print('        Choose to clean the screen up before a search is started and')
     print('        before the search results are displayed.')
-    #print '     (T)hreads Used: ' + str(optionsList[9])
-    #print '        Increasing the number of threads used may increase search'
-    #print '        speeds. However, this may be very unsafe. Change at your own'
-    #print '        risk.'
+    print('     (T)hreads Used: ' + str(optionsList[9]))
+    print('        The number of threads that walk the local directories at once.')
+    print('        More threads help most on network drives, where each folder')
+    print('        listing has to wait on the server.')
     print('     (A)ll Animations, (P)inwheel Animation, or No Animation: %s' % (optionsList[10] == 0 and 'No Animations' \
                                     or optionsList[10] == 1 and 'Pinwheel Only' \
                                     or optionsList[10] == 2 and 'All Animations'))
@@ -321,6 +336,37 @@ def options(optionsList, colors):
     print('        you are experiencing issues with random characters being')
     print('        displayed at the beginning of each new line (\033, [94m, etc.),')
     print('        disabling this may help.')
+    print('     Directory (W)alker: %s' % (optionsList[12] == 1 and 'Scandir' or 'Standard'))
+    print('        The scandir walker reads the type of each entry straight from')
+    print('        the directory listing instead of checking every entry on disk,')
+    print('        which is much faster on large or networked drives.')
+    print('     Deep Search Engine: %s' % (optionsList[16] == 1 and 'Memory-Mapped' or 'Lines'))
+    print('        The memory-mapped engine searches the raw bytes of each file and')
+    print('        only counts lines in the files that match, which is much faster')
+    print('        than reading every file line by line. Type \'engine\' to switch.')
+    print('     Excluded Extensions: %s' % (len(optionsList[17]) > 0 and str(len(optionsList[17])) + ' Extensions' or 'None'))
+    print('        A Deep Search skips files with these extensions, along with any')
+    print('        file that turns out to be binary. Type \'exclude\' to change them.')
+    print('     Deep Search (M)ultiprocessing: %s' % (optionsList[13] == 0 and 'Off' or str(optionsList[13]) + ' Processes'))
+    print('        Scans file contents for a Deep Search in separate processes so')
+    print('        that every processor core can be used while the walk carries on.')
+    print('     Use Filename Index: %s' % (optionsList[14] and 'Yes' or 'No'))
+    print('        Answers searches from the filename index instead of walking the')
+    print('        disk, whenever the root directory has been indexed. Type')
+    print('        \'(index)\' to build or rebuild the index for the root directory,')
+    print('        \'refresh\' to quickly bring it up to date with the folders that')
+    print('        have changed, or \'use index\' to turn this on or off.')
+    index = Index.load()
+    if index != None and not index.rootOf(optionsList[5]) == None:
+        print('        The root directory was last indexed ' + time.strftime('%Y-%m-%d %H:%M:%S', \
+              time.localtime(index.built[index.rootOf(optionsList[5])])) + '.')
+    else:
+        print('        The root directory has not been indexed.')
+    print('     Content Index: %s' % (optionsList[15] and 'Yes' or 'No'))
+    print('        Also indexes the contents of each file when the filename index')
+    print('        is built or refreshed, so that a Deep Search only reads the files')
+    print('        that could contain the search string. Type \'content index\' to')
+    print('        turn this on or off.')
     print('\n--ROOT DIRECTORY--')
     print('The root directory for FastSearch always defaults to the directory')
     print('from which FastSearch was executed. The root directory does not have')
@@ -359,6 +405,51 @@ def help(colors):
     print('    would also like FastSearch to perform a Deep Search, you can')
     print('    acheive this by appending the deep search argument.')
     print('    EXAMPLE: python FastSearch.py -return -deepsearch "my string"')
+    print('    A search of an indexed root directory is answered from the')
+    print('    filename index. To walk the disk instead, add the live argument.')
+    print('    EXAMPLE: python FastSearch.py -live my search string')
+    print('    EXAMPLE: python FastSearch.py -return -live my search string')
+    print('    To see each result the moment it is found, rather than once the')
+    print('    whole search is finished, add the stream argument. With the return')
+    print('    argument, each result is also printed as a line as it is found.')
+    print('    EXAMPLE: python FastSearch.py -stream my search string')
+    print('    To match the search string as a shell-style pattern or a regular')
+    print('    expression for this run only, add the glob or regex argument.')
+    print('    EXAMPLE: python FastSearch.py -glob "test_*.py"')
+    print('    EXAMPLE: python FastSearch.py -return -deepsearch -regex "def \\w+_test"')
+    print('    To search for several strings at once in a single walk of the')
+    print('    directory, give each string after the batch argument, or give the')
+    print('    file argument followed by a file with one string per line. The')
+    print('    results of each string are shown (or returned) separately.')
+    print('    EXAMPLE: python FastSearch.py -batch "first string" second')
+    print('    EXAMPLE: python FastSearch.py -batch -file strings.txt')
+    print('    EXAMPLE: python FastSearch.py -return -deepsearch -batch -file strings.txt')
+    print('    Scripts that run many searches with the return argument can start')
+    print('    a daemon, which keeps the indexes and caches in memory and answers')
+    print('    those searches over a Unix domain socket. The return argument uses')
+    print('    the daemon whenever it is running, and searches by itself when not.')
+    print('    On Linux, the daemon also watches the directories of the filename')
+    print('    index and keeps the index up to date as files come and go.')
+    print('    EXAMPLE: python FastSearch.py -daemon')
+    print('    EXAMPLE: python FastSearch.py -daemon stop')
+    print('    To see where a search spends its time, add the stats argument. The')
+    print('    calls and time spent listing directories, telling directories from')
+    print('    files, checking for binary files, and opening, reading, and matching')
+    print('    files are shown after the results, with the slowest directories and')
+    print('    files, and saved to SearchStats.json in the Support folder.')
+    print('    EXAMPLE: python FastSearch.py -stats -return -deepsearch my string')
+    print('    To profile a search, add the profile argument; add the memory')
+    print('    argument as well to trace its memory allocations. The functions')
+    print('    that took the most time, and the lines that allocated the most')
+    print('    memory, are shown after the results, and the profile is saved to')
+    print('    SearchProfile.pstats in the Support folder.')
+    print('    EXAMPLE: python FastSearch.py -profile -memory my search string')
+    print('    To benchmark every search engine (walkers, index, Deep Search')
+    print('    engines, and FTP if pyftpdlib is installed) over a synthetic tree,')
+    print('    cold and warm, give the debug argument, optionally followed by the')
+    print('    number of runs and settings such as width, depth, files, size,')
+    print('    binary, density, engines, root, and json (a file for the report).')
+    print('    EXAMPLE: python FastSearch.py -debug 10 depth=4 json=report.json')
     print('\n--THE ROOT SEARCH DIRECTORY--')
     print('FastSearch has the ability to search either local directory or')
     print('remote directories, including FTP sites. In the options menu,')
@@ -396,6 +487,105 @@ def credits(colors):
     print('effort and make a solution myself.')
     print('--------------------------\n' + colors.end())
 
+## Display the most recent searches, newest first.
+#
+# @param searches The list of searches from History.recent().
+# @param colors The Colors class for printing colors.
+def recentSearches(searches, colors):
+    print(colors.green() + '--Recent Searches--' + colors.end())
+    if len(searches) == 0:
+        print(colors.alert() + '-None Found-\n' + colors.end())
+        return
+
+    for i in range(len(searches)):
+        search = searches[i]
+        print(colors.green() + '[' + str(i + 1) + ']: \'' + search[3] + '\' in ' + search[2] + colors.end())
+        print('  ' + time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(search[1])) + ', ' + str(search[10]) \
+              + ' Result%s in ' % (search[10] != 1 and 's' or '') + str(round(search[9], 2)) + ' Seconds')
+    print('')
+
+## Display the calls and times of each phase of an instrumented search, and the slowest directories and files. With
+# several walker threads, the phases add up to more than the time the search took.
+#
+# @param report The report returned by Instruments.Instruments.report().
+# @param fileName The file the report was saved to, or None if it could not be saved.
+# @param colors The colors class for output.
+def searchStats(report, fileName, colors):
+    print(colors.green() + '--Search Statistics--' + colors.end())
+    print('%d Directories, %d Files, %.1f MB Deep Searched in %.3f Seconds' % (report['dirs'], report['files'], \
+          report['bytes'] / (1024.0 * 1024.0), report['seconds']))
+    if report['usedCache']:
+        print(colors.alert() + 'The search was answered from the results of a recent search.' + colors.end())
+    elif report['usedIndex']:
+        print(colors.alert() + 'The search was answered from the filename index, so no directories were listed.' + colors.end())
+
+    print('%-10s %10s %12s %12s' % ('Phase', 'Calls', 'Seconds', 'Per Call (ms)'))
+    for phase in Instruments.PHASES:
+        calls, seconds = report['phases'][phase]['calls'], report['phases'][phase]['seconds']
+        print('%-10s %10d %12.4f %12s' % (phase, calls, seconds, calls > 0 and '%.4f' % (seconds * 1000 / calls) or '-'))
+
+    for title, key in (('Slowest Directories to List', 'slowestDirs'), ('Slowest Files to Search', 'slowestFiles')):
+        if len(report[key]) > 0:
+            print(colors.green() + '\n::' + title + '::' + colors.end())
+            for item in report[key]:
+                print('%10.4f  %s' % (item['seconds'], item['path']))
+
+    if not fileName == None:
+        print(colors.alert() + '\n--The statistics were saved to ' + fileName + '--' + colors.end())
+    else:
+        print(colors.error() + '\nThe statistics could not be saved.' + colors.end())
+    print('')
+
+## Display the profile of a profiled search: the functions that took the most time and, if memory was traced, the lines
+# of Search.py that allocated the most memory.
+#
+# @param timeSummary The functions that took the most time, as text.
+# @param allocations The list of the line number, function, bytes, blocks, and source of each line that allocated the
+# most memory, or None if memory was not traced.
+# @param peakMemory The most memory traced at once, in bytes.
+# @param fileName The file the profile was saved to, or None if it could not be saved.
+# @param colors The colors class for output.
+def profile(timeSummary, allocations, peakMemory, fileName, colors):
+    print(colors.green() + '--Search Profile--' + colors.end())
+    print(timeSummary)
+
+    if not allocations == None:
+        print(colors.green() + '\n::Memory Allocated in Search.py (peak ' + str(round(peakMemory / (1024.0 * 1024.0), 2)) + ' MB)::' + colors.end())
+        if len(allocations) == 0:
+            print(colors.alert() + '-None Found-' + colors.end())
+        for lineNumber, function, size, count, source in allocations:
+            print('%10.1f KB %8d blocks  Search.py:%d %s' % (size / 1024.0, count, lineNumber, function))
+            print('    ' + source)
+
+    if not fileName == None:
+        print(colors.alert() + '\n--The profile was saved to ' + fileName + '; read it with python -m pstats--' + colors.end())
+    else:
+        print(colors.error() + '\nThe profile could not be saved.' + colors.end())
+    print('')
+
+## Returns a single search result as a line of plain text, for results printed as they are found.
+#
+# @param result The Search.Result.
+# @return The line of text.
+def resultLine(result):
+    line = ''
+    if not result.pattern == None:
+        line = '\'' + result.pattern + '\' '
+    if result.kind == Search.RESULT_FOLDER:
+        return line + 'Folder: ' + result.path
+    elif result.kind == Search.RESULT_FILE:
+        return line + 'File: ' + result.path
+    else:
+        return line + 'In File: ' + result.path + '\n  On Line%s: ' % (len(result.lineNumbers) != 1 and 's' or '') + str(result.lineNumbers)
+
+## Displays a single search result the moment it is found, while the search is still running.
+#
+# @param result The Search.Result.
+# @param colors The colors class for output.
+def streamedResult(result, colors):
+    print(colors.green() + resultLine(result) + colors.end())
+    sys.stdout.flush()
+
 ## Display the search results and the amount of time the entire traversal took.
 #
 # @param path The path of FastSearch.
@@ -404,76 +594,90 @@ def credits(colors):
 # @param results The list of results to be displayed.
 # @param time The time the complete search took.
 # @param colors The colors class for output.
-def results(path, string, optionsList, results, time, colors):
+# @param streamed True if each result was already displayed as it was found, so only the totals are displayed now.
+# @param stopReason Why the search was stopped early (so its results are incomplete), or None if it finished.
+# @param search The search that found the results, to tell the user where they came from, or None.
+def results(path, string, optionsList, results, time, colors, streamed = False, stopReason = None, search = None):
     numResults = getNumResults(results)
     
     # display how many items were found in how many seconds (rounded to two decimals) a ternary operation is emulated
     # for the potential pluralization of 'Result(s)'
     print(colors.green() + '--FastSearch Found \'' + string + '\' ' + str(numResults) + ' Time%s in ' % (numResults != 1 and 's' or '') \
           + optionsList[5] + ' in ' + str(round(time, 2)) + ' Seconds--' + colors.end())
+    if not stopReason == None:
+        print(colors.alert() + '--The search was stopped early (' + stopReason + '), so these results are incomplete--' + colors.end())
+    if not search == None and search.usedIndex:
+        print(colors.alert() + '--These results were answered from the filename index; search with -live to walk the disk instead--' + colors.end())
+    elif not search == None and search.staleIndex:
+        print(colors.alert() + '--The filename index is out of date, so the disk was walked instead; refresh the index to use it again--' + colors.end())
     
-    # a full search was performed
-    if optionsList[4]:
-        itemNum = 1
+    # the results were not already displayed as they were found
+    if not streamed:
+        # a full search was performed
+        if optionsList[4]:
+            itemNum = 1
         
-        # scan through and print the full path for each folder result (if folders are displayed)
-        if optionsList[1] == 1 or optionsList[1] == 2:
-            print(colors.green() + '\n::Matching Folder Names::' + colors.end())
-            if len(results[0]) != 0:
-                for item in results[0]:
-                    print(colors.green() + '[' + str(itemNum) + ']: ' + item + colors.end())
-                    itemNum += 1
-            else:
-                print(colors.alert() + '-None Found-' + colors.end())
+            # scan through and print the full path for each folder result (if folders are displayed)
+            if optionsList[1] == 1 or optionsList[1] == 2:
+                print(colors.green() + '\n::Matching Folder Names::' + colors.end())
+                if len(results[0]) != 0:
+                    for item in results[0]:
+                        print(colors.green() + '[' + str(itemNum) + ']: ' + item + colors.end())
+                        itemNum += 1
+                else:
+                    print(colors.alert() + '-None Found-' + colors.end())
 
-        # scan through and print full paths for each file result (if files are displayed)
-        if optionsList[1] == 0 or optionsList[1] == 2:
-            print(colors.green() + '\n::Matching File Names::' + colors.end())
-            if len(results[1]) != 0:
-                for item in results[1]:
-                    print(colors.green() + '[' + str(itemNum) + ']: ' + item + colors.end())
-                    itemNum += 1
-            else:
-                print(colors.alert() + '-None Found-' + colors.end())
+            # scan through and print full paths for each file result (if files are displayed)
+            if optionsList[1] == 0 or optionsList[1] == 2:
+                print(colors.green() + '\n::Matching File Names::' + colors.end())
+                if len(results[1]) != 0:
+                    for item in results[1]:
+                        print(colors.green() + '[' + str(itemNum) + ']: ' + item + colors.end())
+                        itemNum += 1
+                else:
+                    print(colors.alert() + '-None Found-' + colors.end())
 
-        # scan through and print full paths for each file the string was found within (if a deep search was run)
-        if optionsList[0]:
-            print(colors.green() + '\n::Found in Files::' + colors.end())
-            if len(results[2]) != 0:
-                for item in results[2]:
-                    print(colors.green() + '[' + str(itemNum) + ']: ' + item[0] + '\n  On Line%s: ' % (len(item[1]) != 1 and 's' or '') + str(item[1]) + colors.end())
-                    itemNum += 1
-            else:
-                print(colors.alert() + '-None Found-' + colors.end())
-    # a partial search was performed
-    else:
-        # print the only folder found
-        if optionsList[1] == 1 or optionsList[1] == 2:
-            print(colors.green() + '\n::Matching Folder::' + colors.end())
-            if len(results[0]) != 0:
-                print(colors.green() + '[1]: ' + results[0][0] + colors.end())
-            else:
-                print(colors.alert() + '-None Found-' + colors.end())
+            # scan through and print full paths for each file the string was found within (if a deep search was run)
+            if optionsList[0]:
+                print(colors.green() + '\n::Found in Files::' + colors.end())
+                if len(results[2]) != 0:
+                    for item in results[2]:
+                        print(colors.green() + '[' + str(itemNum) + ']: ' + item[0] + '\n  On Line%s: ' % (len(item[1]) != 1 and 's' or '') + str(item[1]) + colors.end())
+                        itemNum += 1
+                else:
+                    print(colors.alert() + '-None Found-' + colors.end())
+        # a partial search was performed
+        else:
+            # print the only folder found
+            if optionsList[1] == 1 or optionsList[1] == 2:
+                print(colors.green() + '\n::Matching Folder::' + colors.end())
+                if len(results[0]) != 0:
+                    print(colors.green() + '[1]: ' + results[0][0] + colors.end())
+                else:
+                    print(colors.alert() + '-None Found-' + colors.end())
         
-        # print the only file found
-        if optionsList[1] == 0 or optionsList[1] == 2:
-            print(colors.green() + '\n::Matching File::' + colors.end())
-            if len(results[1]) != 0:
-                    print(colors.green() + '[1]: ' + results[1][0] + colors.end())
-            else:
-                print(colors.alert() + '-None Found-' + colors.end())
+            # print the only file found
+            if optionsList[1] == 0 or optionsList[1] == 2:
+                print(colors.green() + '\n::Matching File::' + colors.end())
+                if len(results[1]) != 0:
+                        print(colors.green() + '[1]: ' + results[1][0] + colors.end())
+                else:
+                    print(colors.alert() + '-None Found-' + colors.end())
 
-        # print the only file the string was found within
-        if optionsList[0]:
-            print(colors.green() + '\n::Found in File::' + colors.end())
-            if len(results[2]) != 0:
-                print(colors.green() + '[1]: ' + results[2][0][0] + '\n  On Line%s: ' % (len(results[2][0][1]) != 1 and 's' or '') + str(results[2][0][1]) + colors.end())
-            else:
-                print(colors.alert() + '-None Found-' + colors.end())
+            # print the only file the string was found within
+            if optionsList[0]:
+                print(colors.green() + '\n::Found in File::' + colors.end())
+                if len(results[2]) != 0:
+                    print(colors.green() + '[1]: ' + results[2][0][0] + '\n  On Line%s: ' % (len(results[2][0][1]) != 1 and 's' or '') + str(results[2][0][1]) + colors.end())
+                else:
+                    print(colors.alert() + '-None Found-' + colors.end())
     
     # if the user desires, write this to the recent searches list
-    if optionsList[8]:
-        FileHandler.writeSearchHistory(path, string, optionsList, results, time)
+    if optionsList[8] and numResults > 0:
+        try:
+            History.record(string, optionsList, results, time)
+        except History.Error:
+            print(colors.error() + 'The search could not be saved to the recent searches.' + colors.end())
 
-    if os.name == 'posix':
+    if os.name == 'posix' and not streamed:
         print(colors.alert() + '\n--To open a search result, type its corresponding number from the main menu--\n' + colors.end())
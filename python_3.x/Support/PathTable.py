@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+
+# system modules
+import array, os, threading
+
+## This module stores the paths of search results compactly. A search that finds millions of results would otherwise
+# keep a full path string for each of them, and a list for each file found by a Deep Search, at hundreds of bytes
+# apiece. Instead, each result is a node of a PathTable: the number of the node it lies within, and its name. The
+# directories holding results are interned, so each is stored once however many results it holds, and the names of
+# every node are kept end to end in a single buffer of bytes. The results lists hold only the numbers of the nodes (and,
+# for the files found by a Deep Search, their line numbers) in arrays, and a path is only put back together when it is
+# read from a results list: when the results are displayed, or handed out with the return argument.
+#
+# @file PathTable.py
+# @version 1.2
+
+## The parent of a node that has none: a directory stored whole, or a result stored as a name only.
+NO_PARENT = 0xFFFFFFFF
+
+## The paths of the results of one search, as a tree of nodes.
+class PathTable:
+    ## Initialize an empty table.
+    #
+    # @param self A pointer to the local class.
+    def __init__(self):
+        ## The names of every node, end to end, encoded as the filesystem encodes them.
+        self.names = bytearray()
+        ## The offset in names at which the name of each node starts; each name ends where the next one starts.
+        self.nameStarts = array.array('I')
+        ## The number of the node each node lies within, or NO_PARENT.
+        self.parents = array.array('I')
+        ## Maps the number of the parent and the name of each directory node to its number, so that each is stored once.
+        self.dirNodes = {}
+        ## Maps each directory a walk yielded to the number of the node holding its path as a result stores it.
+        self.dirIds = {}
+        ## Guards the table, since results are added by several walker threads and the Deep Search pool at once.
+        self.lock = threading.Lock()
+
+    ## Returns the number of nodes in the table.
+    #
+    # @param self A pointer to the local class.
+    # @return The number of nodes.
+    def __len__(self):
+        return len(self.parents)
+
+    ## Adds a node. Must be called with the lock held.
+    #
+    # @param self A pointer to the local class.
+    # @param parent The number of the node the new node lies within, or NO_PARENT.
+    # @param name The name of the node.
+    # @return The number of the new node.
+    def addNode(self, parent, name):
+        self.nameStarts.append(len(self.names))
+        self.names += os.fsencode(name)
+        self.parents.append(parent)
+        return len(self.parents) - 1
+
+    ## Returns the node of a directory, adding it and the directories it lies within if they are not in the table.
+    # Must be called with the lock held.
+    #
+    # @param self A pointer to the local class.
+    # @param path The path of the directory.
+    # @return The number of the directory's node.
+    def internDir(self, path):
+        head, tail = os.path.split(path)
+        if tail == '':
+            # the root of the filesystem, or the root of a drive
+            parent, name = NO_PARENT, path
+        elif head == '':
+            # the first directory of a relative path
+            parent, name = NO_PARENT, tail
+        else:
+            parent, name = self.internDir(head), tail
+
+        node = self.dirNodes.get((parent, name))
+        if node == None:
+            node = self.addNode(parent, name)
+            self.dirNodes[(parent, name)] = node
+        return node
+
+    ## Returns the node of a directory, if it is in the table.
+    #
+    # @param self A pointer to the local class.
+    # @param path The path of the directory.
+    # @return The number of the directory's node, or None if it was never added.
+    def findDir(self, path):
+        head, tail = os.path.split(path)
+        if tail == '':
+            parent, name = NO_PARENT, path
+        elif head == '':
+            parent, name = NO_PARENT, tail
+        else:
+            parent, name = self.findDir(head), tail
+            if parent == None:
+                return None
+        return self.dirNodes.get((parent, name))
+
+    ## Returns the state of the table to be pickled, which leaves out the lock.
+    #
+    # @param self A pointer to the local class.
+    # @return The attributes of the table, without the lock.
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+
+    ## Restores the state of a pickled table, with a new lock.
+    #
+    # @param self A pointer to the local class.
+    # @param state The attributes of the table, from __getstate__().
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    ## Adds a result found in a directory that a walk yielded.
+    #
+    # @param self A pointer to the local class.
+    # @param root The directory, as the walk yielded it.
+    # @param dirPath A function returning the path of the directory as the result should store it, called only the
+    # first time the directory holds a result, or None to store the name only.
+    # @param name The name of the file or folder that was found.
+    # @return The number of the result's node.
+    def add(self, root, dirPath, name):
+        with self.lock:
+            if dirPath == None:
+                return self.addNode(NO_PARENT, name)
+            parent = self.dirIds.get(root)
+            if parent == None:
+                parent = self.internDir(dirPath())
+                self.dirIds[root] = parent
+            return self.addNode(parent, name)
+
+    ## Adds a result whose whole path is already known, such as one kept in the result cache.
+    #
+    # @param self A pointer to the local class.
+    # @param path The path of the result.
+    # @return The number of the result's node.
+    def addPath(self, path):
+        with self.lock:
+            head, tail = os.path.split(path)
+            if head == '' or tail == '':
+                return self.addNode(NO_PARENT, path)
+            return self.addNode(self.internDir(head), tail)
+
+    ## Returns the name of a node.
+    #
+    # @param self A pointer to the local class.
+    # @param node The number of the node.
+    # @return The name.
+    def name(self, node):
+        start = self.nameStarts[node]
+        if node + 1 < len(self.nameStarts):
+            return os.fsdecode(bytes(self.names[start:self.nameStarts[node + 1]]))
+        return os.fsdecode(bytes(self.names[start:]))
+
+    ## Puts the path of a node back together.
+    #
+    # @param self A pointer to the local class.
+    # @param node The number of the node.
+    # @return The path.
+    def path(self, node):
+        with self.lock:
+            names = []
+            while not node == NO_PARENT:
+                names.append(self.name(node))
+                node = self.parents[node]
+        names.reverse()
+        return os.path.join(*names)
+
+## A list of the folders or files found by a search, holding the numbers of their nodes in a PathTable. It can be read
+# like a list of paths.
+class PathList:
+    ## Initialize an empty list.
+    #
+    # @param self A pointer to the local class.
+    # @param table The PathTable the paths are stored in.
+    def __init__(self, table):
+        ## The PathTable the paths are stored in.
+        self.table = table
+        ## The number of the node of each result.
+        self.nodes = array.array('I')
+
+    ## Adds a result.
+    #
+    # @param self A pointer to the local class.
+    # @param node The number of the result's node.
+    def append(self, node):
+        self.nodes.append(node)
+
+    ## Returns the number of results.
+    #
+    # @param self A pointer to the local class.
+    # @return The number of results.
+    def __len__(self):
+        return len(self.nodes)
+
+    ## Returns the path of a result, or a list of the paths of a slice of the results.
+    #
+    # @param self A pointer to the local class.
+    # @param i The index or slice.
+    # @return The path, or the list of paths.
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.table.path(node) for node in self.nodes[i]]
+        return self.table.path(self.nodes[i])
+
+    ## Iterates through the paths of the results.
+    #
+    # @param self A pointer to the local class.
+    # @return A generator yielding each path.
+    def __iter__(self):
+        for node in self.nodes:
+            yield self.table.path(node)
+
+## A list of the files a Deep Search found the search string within, holding the numbers of their nodes in a PathTable
+# and their line numbers in a single array. It can be read like a list of the path and the list of line numbers of each
+# file.
+class InFileList:
+    ## Initialize an empty list.
+    #
+    # @param self A pointer to the local class.
+    # @param table The PathTable the paths are stored in.
+    def __init__(self, table):
+        ## The PathTable the paths are stored in.
+        self.table = table
+        ## The number of the node of each result.
+        self.nodes = array.array('I')
+        ## The line numbers of every result, end to end.
+        self.lineNumbers = array.array('I')
+        ## The offset in lineNumbers at which the line numbers of each result start.
+        self.lineStarts = array.array('I')
+
+    ## Adds a result.
+    #
+    # @param self A pointer to the local class.
+    # @param item The number of the result's node and its list of line numbers.
+    def append(self, item):
+        self.lineStarts.append(len(self.lineNumbers))
+        self.lineNumbers.extend(item[1])
+        self.nodes.append(item[0])
+
+    ## Returns the number of results.
+    #
+    # @param self A pointer to the local class.
+    # @return The number of results.
+    def __len__(self):
+        return len(self.nodes)
+
+    ## Returns the line numbers of a result.
+    #
+    # @param self A pointer to the local class.
+    # @param i The index of the result.
+    # @return The list of line numbers.
+    def lines(self, i):
+        if i + 1 < len(self.lineStarts):
+            return self.lineNumbers[self.lineStarts[i]:self.lineStarts[i + 1]].tolist()
+        return self.lineNumbers[self.lineStarts[i]:].tolist()
+
+    ## Returns the path and line numbers of a result, or a list of them for a slice of the results.
+    #
+    # @param self A pointer to the local class.
+    # @param i The index or slice.
+    # @return The path and the list of line numbers, or the list of them.
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('result index out of range')
+        return [self.table.path(self.nodes[i]), self.lines(i)]
+
+    ## Iterates through the path and line numbers of each result.
+    #
+    # @param self A pointer to the local class.
+    # @return A generator yielding the path and the list of line numbers of each result.
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+## Converts the results of a search to plain lists, for handing out or writing as JSON.
+#
+# @param results The list of folders, files, and in files results found, as Search.finish() returns them, or a
+# dictionary from each pattern to them, as BatchSearch.finish() returns them.
+# @return The same results, as lists of paths and lists of paths and line numbers.
+def toLists(results):
+    if isinstance(results, dict):
+        return dict([(pattern, toLists(patternResults)) for pattern, patternResults in results.items()])
+    return [list(results[0]), list(results[1]), list(results[2])]
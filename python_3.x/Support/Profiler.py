@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+# system modules
+import cProfile, io, linecache, os, pstats, threading, tracemalloc
+
+# my modules
+import Search
+
+## This module profiles a search: where its time goes, function by function, with cProfile, and optionally where its
+# memory goes, line by line, with tracemalloc. cProfile only profiles the thread that enables it, and the work of a
+# search happens in the Search thread and its walker threads rather than the main thread, so a hook installed with
+# threading.setprofile starts a profiler in every thread started while profiling, and their statistics are added
+# together at the end. The Deep Search processes of a process pool run in processes of their own, so they are not
+# profiled.
+#
+# @file Profiler.py
+# @version 1.2
+
+## The Support directory, where the profile of the last profiled search is written alongside the options file.
+supportDir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+## The profile file name, which pstats can read.
+profileFileName = 'SearchProfile.pstats'
+
+## The number of functions and lines shown in the summaries.
+PROFILE_TOP = 20
+## The number of frames tracemalloc keeps for each allocation, so that allocations made in the modules a search calls
+# can be traced back to the line of Search.py that led to them.
+TRACEMALLOC_FRAMES = 32
+
+## Profiles the threads of a search from start() until stop().
+class Profiler:
+    ## Initialize a profiler that has not started.
+    #
+    # @param self A pointer to the local class.
+    # @param memory True to trace memory allocations with tracemalloc as well.
+    def __init__(self, memory = False):
+        ## True to trace memory allocations as well.
+        self.memory = memory
+        ## The cProfile.Profile of each thread started while profiling.
+        self.profiles = []
+        ## Guards the list of profiles, since the threads of a search start at the same time.
+        self.lock = threading.Lock()
+        ## The tracemalloc snapshot taken when profiling started, or None.
+        self.startSnapshot = None
+        ## The tracemalloc snapshot taken when profiling stopped, or None.
+        self.endSnapshot = None
+        ## The most memory traced at once, in bytes.
+        self.peakMemory = 0
+
+    ## Starts profiling every thread started from now on. Must be called before the search is started.
+    #
+    # @param self A pointer to the local class.
+    def start(self):
+        if self.memory:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.startSnapshot = tracemalloc.take_snapshot()
+        threading.setprofile(self.profileThread)
+
+    ## Called in each new thread as it starts running: replaces itself with a profiler of the thread's own.
+    #
+    # @param self A pointer to the local class.
+    # @param frame The frame being entered.
+    # @param event The profiling event.
+    # @param arg The argument of the event.
+    def profileThread(self, frame, event, arg):
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    ## Stops profiling. Must be called once the search has finished.
+    #
+    # @param self A pointer to the local class.
+    def stop(self):
+        threading.setprofile(None)
+        if self.memory:
+            self.endSnapshot = tracemalloc.take_snapshot()
+            self.peakMemory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    ## Returns the statistics of every thread profiled, added together.
+    #
+    # @param self A pointer to the local class.
+    # @param stream The stream the statistics print to.
+    # @return The pstats.Stats, or None if no thread was profiled.
+    def stats(self, stream = None):
+        stats = None
+        with self.lock:
+            for profile in self.profiles:
+                if stats == None:
+                    stats = pstats.Stats(profile, stream = stream)
+                else:
+                    stats.add(profile)
+        return stats
+
+    ## Writes the statistics to the Support directory, for reading later with pstats.
+    #
+    # @param self A pointer to the local class.
+    # @return The path the statistics were written to, or None if they could not be written.
+    def save(self):
+        stats = self.stats()
+        if stats == None:
+            return None
+        try:
+            stats.dump_stats(supportDir + profileFileName)
+        except (IOError, OSError):
+            return None
+        return supportDir + profileFileName
+
+    ## Returns the functions that took the most time, including the functions they called.
+    #
+    # @param self A pointer to the local class.
+    # @param top The number of functions.
+    # @return The summary, as text.
+    def timeSummary(self, top = PROFILE_TOP):
+        stream = io.StringIO()
+        stats = self.stats(stream)
+        if stats == None:
+            return ''
+        stats.strip_dirs().sort_stats('cumulative').print_stats(top)
+        return stream.getvalue().strip('\n')
+
+    ## Returns the lines of Search.py that allocated the most memory still held when profiling stopped. Memory allocated
+    # in another module is counted against the line of Search.py that called into it.
+    #
+    # @param self A pointer to the local class.
+    # @param top The number of lines.
+    # @return A list of the line number, the name of the function, the number of bytes, the number of blocks, and the
+    # source of each line, or an empty list if memory was not traced.
+    def allocationSummary(self, top = PROFILE_TOP):
+        if self.endSnapshot == None:
+            return []
+        searchFile = os.path.normcase(os.path.abspath(Search.__file__))
+
+        lines = {}
+        for statistic in self.endSnapshot.compare_to(self.startSnapshot, 'traceback'):
+            if statistic.size_diff <= 0:
+                continue
+            # find the innermost frame in Search.py
+            for frame in reversed(statistic.traceback):
+                if os.path.normcase(os.path.abspath(frame.filename)) == searchFile:
+                    size, count = lines.get(frame.lineno, (0, 0))
+                    lines[frame.lineno] = (size + statistic.size_diff, count + statistic.count_diff)
+                    break
+
+        functions = functionLines(Search)
+        summary = []
+        for lineNumber, (size, count) in sorted(lines.items(), key = lambda item: item[1][0], reverse = True)[:top]:
+            summary.append((lineNumber, functions.get(lineNumber, '?'), size, count, linecache.getline(Search.__file__, lineNumber).strip()))
+        return summary
+
+## Maps each line of the functions and methods of a module to the name of the function or method it belongs to.
+#
+# @param module The module.
+# @return A dictionary from line number to name.
+def functionLines(module):
+    functions = {}
+    for name, value in vars(module).items():
+        if hasattr(value, '__code__'):
+            members = [(name, value)]
+        elif isinstance(value, type) and value.__module__ == module.__name__:
+            members = [(name + '.' + method, function) for method, function in vars(value).items() if hasattr(function, '__code__')]
+        else:
+            continue
+        for memberName, function in members:
+            codeLines(function.__code__, memberName, functions)
+    return functions
+
+## Maps each line of a code object, and of the functions defined within it, to the name of the function it belongs to.
+#
+# @param code The code object.
+# @param name The name of the function.
+# @param functions The dictionary from line number to name to add to.
+def codeLines(code, name, functions):
+    for start, end, lineNumber in code.co_lines():
+        if not lineNumber == None:
+            functions[lineNumber] = name
+    for constant in code.co_consts:
+        if hasattr(constant, 'co_lines'):
+            codeLines(constant, name + '.' + constant.co_name, functions)
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+
+# system modules
+import ftplib, queue, threading
+
+## This module holds the connections to remote (FTP) servers. A Connection remembers how it logged in, so that it can
+# log in again after the server drops it and open more connections to the same server. A ConnectionPool keeps several
+# of those connections logged in at once, so that a search can list several remote directories at the same time rather
+# than waiting on one round-trip after another.
+#
+# @file Remote.py
+# @version 1.2
+
+## The errors that mean a connection was lost, rather than that the server refused a command.
+CONNECTION_ERRORS = (EOFError, OSError, ftplib.error_temp, ftplib.error_reply, ftplib.error_proto)
+## Every error a remote command can fail with.
+ERRORS = (ftplib.Error,) + CONNECTION_ERRORS
+## The number of bytes of a remote file read from the data connection at a time.
+BLOCK_SIZE = 64 * 1024
+
+## A connection to an FTP server that remembers its address and login.
+class Connection(ftplib.FTP):
+    ## Connect to the server.
+    #
+    # @param self A pointer to the local class.
+    # @param host The address of the server.
+    # @param timeout The number of seconds to wait on the server before giving up, or None to wait forever.
+    # @param port The port the server listens on, or 0 for the standard FTP port.
+    def __init__(self, host, timeout = None, port = 0):
+        ## The address of the server.
+        self.address = host
+        ## The port the server listens on, or 0 for the standard FTP port.
+        self.port = port
+        ## The username the connection logged in with, or None if it has not logged in.
+        self.username = None
+        ## The password the connection logged in with.
+        self.password = ''
+        ## The ConnectionPool of extra connections to the same server, or None until one is needed.
+        self.pool = None
+        ## The features the server listed in its reply to FEAT, or None until they are asked for.
+        self.features = None
+        ## True if directories are listed with MLSD, False if with LIST, or None until the features are asked for.
+        self.mlsdSupported = None
+        if timeout == None:
+            ftplib.FTP.__init__(self)
+        else:
+            ftplib.FTP.__init__(self, timeout = timeout)
+        self.connect(host, port)
+
+    ## Log in to the server, remembering the login for reconnecting.
+    #
+    # @param self A pointer to the local class.
+    # @param user The username.
+    # @param passwd The password.
+    # @param acct The account, which is rarely needed.
+    # @return The response of the server.
+    def login(self, user = '', passwd = '', acct = ''):
+        response = ftplib.FTP.login(self, user, passwd, acct)
+        self.username = user
+        self.password = passwd
+        return response
+
+    ## Opens a new connection to the same server, logged in the same way.
+    #
+    # @param self A pointer to the local class.
+    # @return The new Connection.
+    def clone(self):
+        connection = Connection(self.address, self.timeout, self.port)
+        if not self.username == None:
+            connection.login(self.username, self.password)
+        return connection
+
+    ## Connects and logs in to the server again, after the server has dropped the connection.
+    #
+    # @param self A pointer to the local class.
+    def reconnect(self):
+        try:
+            ftplib.FTP.close(self)
+        except:
+            pass
+        self.connect(self.address, self.port, self.timeout)
+        if not self.username == None:
+            ftplib.FTP.login(self, self.username, self.password)
+        # the MLST facts asked for apply to a single session
+        self.mlsdSupported = None
+
+    ## Asks the server which features it supports with FEAT. A server that does not understand FEAT supports none.
+    #
+    # @param self A pointer to the local class.
+    # @return Maps the name of each feature (uppercased) to the rest of its line.
+    def negotiate(self):
+        if self.features == None:
+            self.features = {}
+            try:
+                reply = self.sendcmd('FEAT')
+            except ERRORS:
+                return self.features
+            # the features are listed one to a line, between the first and last lines of the reply
+            for line in reply.splitlines()[1:-1]:
+                words = line.strip().split(None, 1)
+                if len(words) > 0:
+                    self.features[words[0].upper()] = len(words) > 1 and words[1] or ''
+        return self.features
+
+    ## Checks to see if directories can be listed with MLSD, which every server that lists MLST in its features must
+    # support. The first time, the server is also asked to send just the facts that are used.
+    #
+    # @param self A pointer to the local class.
+    # @return True if MLSD can be used, False if LIST must be used instead.
+    def supportsMlsd(self):
+        if self.mlsdSupported == None:
+            self.mlsdSupported = 'MLST' in self.negotiate()
+            if self.mlsdSupported:
+                try:
+                    self.sendcmd('OPTS MLST type;size;modify;')
+                except ERRORS:
+                    pass
+        return self.mlsdSupported
+
+    ## Returns the pool of connections to the server, which holds this connection and enough extra connections to make
+    # up the given size. The extra connections stay open for the next search, until this connection is closed.
+    #
+    # @param self A pointer to the local class.
+    # @param size The number of connections wanted.
+    # @return The ConnectionPool.
+    def connections(self, size):
+        if self.pool == None:
+            self.pool = ConnectionPool(self)
+        self.pool.resize(size)
+        return self.pool
+
+    ## Closes the connection, along with any extra connections to the same server.
+    #
+    # @param self A pointer to the local class.
+    def close(self):
+        if not self.pool == None:
+            self.pool.close()
+            self.pool = None
+        ftplib.FTP.close(self)
+
+## A pool of logged in connections to one FTP server, each used by one thread at a time.
+class ConnectionPool:
+    ## Initialize a pool holding just the given connection.
+    #
+    # @param self A pointer to the local class.
+    # @param connection The Connection the other connections are opened from.
+    def __init__(self, connection):
+        ## The Connection the other connections are opened from.
+        self.primary = connection
+        ## The extra connections opened from the primary connection.
+        self.extras = []
+        ## The connections not in use right now.
+        self.idle = queue.Queue()
+        self.idle.put(connection)
+        ## Guards opening and closing the extra connections.
+        self.lock = threading.Lock()
+
+    ## Returns the number of connections in the pool.
+    #
+    # @param self A pointer to the local class.
+    # @return The number of connections.
+    def size(self):
+        return 1 + len(self.extras)
+
+    ## Opens extra connections until the pool holds the given number of connections. A server that refuses more
+    # connections simply leaves the pool smaller.
+    #
+    # @param self A pointer to the local class.
+    # @param size The number of connections wanted.
+    def resize(self, size):
+        with self.lock:
+            while self.size() < size:
+                try:
+                    connection = self.primary.clone()
+                except ERRORS:
+                    break
+                self.extras.append(connection)
+                self.idle.put(connection)
+
+    ## Waits for a connection that is not in use and takes it.
+    #
+    # @param self A pointer to the local class.
+    # @return The Connection, which must be handed back with release().
+    def acquire(self):
+        return self.idle.get()
+
+    ## Hands back a connection taken with acquire().
+    #
+    # @param self A pointer to the local class.
+    # @param connection The Connection.
+    def release(self, connection):
+        self.idle.put(connection)
+
+    ## Runs a command on a connection that is not in use. If the server has dropped the connection, it is connected
+    # again and the command run once more.
+    #
+    # @param self A pointer to the local class.
+    # @param command The function to run, which is passed the Connection.
+    # @return Whatever the command returns.
+    # @throws ftplib.Error If the server refuses the command.
+    def call(self, command):
+        connection = self.acquire()
+        try:
+            try:
+                return command(connection)
+            except CONNECTION_ERRORS:
+                connection.reconnect()
+                return command(connection)
+        finally:
+            self.release(connection)
+
+    ## Closes the extra connections. The primary connection is left open.
+    #
+    # @param self A pointer to the local class.
+    def close(self):
+        with self.lock:
+            for connection in self.extras:
+                try:
+                    connection.quit()
+                except:
+                    try:
+                        ftplib.FTP.close(connection)
+                    except:
+                        pass
+            self.extras = []
+
+## Reads the facts of an MLSD listing into the facts kept for each entry.
+#
+# @param facts The facts the server sent, by lowercased name.
+# @return The type ('dir', 'file', or 'link'), the size in bytes (or None), and the modify fact (or None) of the entry,
+# or None for an entry that is the directory itself or its parent.
+def mlsdFacts(facts):
+    kind = facts.get('type', 'file').lower()
+    if kind in ('cdir', 'pdir'):
+        return None
+    if kind.startswith('os.unix=slink') or kind.startswith('os.unix=symlink'):
+        kind = 'link'
+    elif not kind == 'dir':
+        kind = 'file'
+
+    size = facts.get('size')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        size = None
+    return kind, size, facts.get('modify')
+
+## Lists a single remote directory with MLSD, which gives the type, size, and modify time of every entry in a form
+# meant for machines, rather than a listing meant to be read.
+#
+# @param ftp The logged in connection.
+# @param top The directory to be listed.
+# @return A list of the name and the facts (see mlsdFacts) of each entry.
+# @throws ftplib.Error If the directory could not be listed.
+def mlsdEntries(ftp, top):
+    entries = []
+    for name, facts in ftp.mlsd(top):
+        facts = mlsdFacts(facts)
+        if not facts == None and not name in ('.', '..'):
+            entries.append((name, facts))
+    return entries
+
+## Lists a single remote directory with LIST, parsing the Unix-style listing that most servers send.
+#
+# @param ftp The logged in connection.
+# @param top The directory to be listed.
+# @return A list of the name and the facts (see mlsdFacts) of each entry; the modify fact is the date and time as the
+# listing shows them.
+# @throws ftplib.Error If the directory could not be listed.
+def listEntries(ftp, top):
+    # set the ftp directory to point at our the current top
+    ftp.cwd(top)
+    names = []
+    # retrieve a list of everything in this folder
+    ftp.retrlines('LIST', names.append)
+
+    entries = []
+    for line in names:
+        # split the ftp line into its sections
+        words = line.split(None, 8)
+
+        # conditions for skipping this line element
+        if len(words) < 6 or words[-1] in ('.', '..'):
+            continue
+
+        try:
+            size = int(words[4])
+        except (IndexError, ValueError):
+            size = None
+        modify = len(words) == 9 and ' '.join(words[5:8]) or None
+
+        # store the directory or file along with its type
+        if words[0][0] == 'l' or words[-1].find(' -> ') > 0:
+            entries.append((words[-1].split(' -> ')[0], ('link', size, modify)))
+        elif words[0][0] == 'd':
+            entries.append((words[-1], ('dir', size, modify)))
+        else:
+            entries.append((words[-1], ('file', size, modify)))
+
+    return entries
+
+## Lists a single remote directory, with MLSD if the server supports it and with LIST otherwise.
+#
+# @param ftp The logged in connection.
+# @param top The directory to be listed.
+# @return A list of the name and the facts (see mlsdFacts) of each entry.
+# @throws ftplib.Error If the directory could not be listed.
+def entries(ftp, top):
+    if isinstance(ftp, Connection) and ftp.supportsMlsd():
+        try:
+            return mlsdEntries(ftp, top)
+        except ftplib.error_perm as error:
+            # a server that claims MLSD but does not understand it is listed with LIST from now on
+            if not str(error)[:3] in ('500', '502', '504'):
+                raise
+            ftp.mlsdSupported = False
+    return listEntries(ftp, top)
+
+## Lists a single remote directory.
+#
+# @param ftp The logged in connection.
+# @param top The directory to be listed.
+# @return A list of dirs and a list of files. Symbolic links are left out.
+# @throws ftplib.Error If the directory could not be listed.
+def listDir(ftp, top):
+    dirs, nonDirs = [], []
+    for name, facts in entries(ftp, top):
+        if facts[0] == 'dir':
+            dirs.append(name)
+        elif facts[0] == 'file':
+            nonDirs.append(name)
+    return dirs, nonDirs
+
+## Downloads a remote file, handing each block to a function as it arrives. If the function wants no more of the file,
+# the download is stopped with ABOR rather than left to finish.
+#
+# @param ftp The logged in connection.
+# @param path The path of the file.
+# @param consume The function each block of bytes is handed to, which returns True for the next block, or False if the
+# rest of the file is not needed.
+# @return True if the whole file was downloaded, False if the download was aborted.
+# @throws ftplib.Error If the file could not be downloaded.
+def retrieve(ftp, path, consume):
+    ftp.voidcmd('TYPE I')
+    dataConnection = ftp.transfercmd('RETR ' + path)
+    finished = True
+    try:
+        while True:
+            data = dataConnection.recv(BLOCK_SIZE)
+            if not data:
+                break
+            if not consume(data):
+                finished = False
+                break
+    finally:
+        dataConnection.close()
+
+    if not finished:
+        abort(ftp)
+        return False
+    ftp.voidresp()
+    return True
+
+## Stops the download running on a connection with ABOR, and reads every reply it leaves behind. Depending on whether the
+# download had finished, the server replies to RETR and ABOR once or twice between them, so a NOOP is sent after the
+# ABOR: everything before its reply belongs to the download.
+#
+# @param ftp The logged in connection.
+# @throws ftplib.Error If the connection was lost.
+def abort(ftp):
+    try:
+        ftp.abort()
+    except ftplib.error_proto:
+        # some servers answer ABOR with an unusual reply, which is read along with the rest below
+        pass
+    ftp.putcmd('NOOP')
+    while not ftp.getmultiline().startswith('200'):
+        pass
+
@@ -1,13 +1,499 @@
 #!/usr/bin/env python
 
 # system modules
-import os, threading
+import collections, itertools, mmap, multiprocessing, os, queue, random, re, threading, time
+
+# my modules
+import Binary, Cache, ContentIndex, Index, Instruments, Listings, Matcher, PathTable, Remote
 
 ## This module contains the specific search methods to ensure optimal performance and abstraction.
 #
 # @file Search.py
 # @version 1.2
 
+## The directory walker built on os.listdir and a stat of each entry.
+WALKER_STANDARD = 0
+## The directory walker built on os.scandir.
+WALKER_SCANDIR = 1
+
+## The Deep Search engine that reads each file as text, line by line.
+DEEP_SEARCH_LINES = 0
+## The Deep Search engine that memory-maps each file and searches its bytes.
+DEEP_SEARCH_MAPPED = 1
+
+## The number of bytes of a file lowercased at a time when searching for several patterns at once.
+DEEP_SEARCH_CHUNK_SIZE = 1024 * 1024
+
+## A folder whose name matches the search string.
+RESULT_FOLDER = 0
+## A file whose name matches the search string.
+RESULT_FILE = 1
+## A file whose contents contain the search string.
+RESULT_IN_FILE = 2
+
+## A search result, handed to the caller of Search.matches() as soon as it is found: its kind (RESULT_FOLDER,
+# RESULT_FILE, or RESULT_IN_FILE), its path in the form the options list asks for, the line numbers of a RESULT_IN_FILE
+# (None otherwise), and for a BatchSearch the pattern it matched (None otherwise).
+Result = collections.namedtuple('Result', ['kind', 'path', 'lineNumbers', 'pattern'], defaults = [None, None])
+
+## The most results that may wait for the caller of Search.matches() before the search is held up.
+STREAM_QUEUE_SIZE = 256
+
+## The search was stopped by the user or the calling program.
+STOP_CANCELLED = 'cancelled'
+## The search ran out of time.
+STOP_TIME_LIMIT = 'time limit reached'
+## The search found as many results as it was allowed to.
+STOP_MAX_RESULTS = 'result limit reached'
+
+## The number of lines the line-by-line Deep Search engine reads between checks for a cancelled search.
+CANCEL_CHECK_LINES = 4096
+
+## The number of files sent to a Deep Search process at a time.
+DEEP_SEARCH_BATCH_SIZE = 32
+## The number of batches per Deep Search process that may wait to be scanned before the walk is held up.
+DEEP_SEARCH_BATCHES_PER_PROCESS = 4
+
+## Searches within an individual file for the desired search string. This is a module-level function, rather than a
+# method of Search, so that it can also be run in the Deep Search process pool.
+#
+# @param path The full path of the file to be searched.
+# @param matcher The Matcher.Matcher for the search string.
+# @param cancelled A function returning True once the search has been cancelled, checked every CANCEL_CHECK_LINES lines.
+# @param instruments The Instruments.Instruments to add the time spent opening, reading, and matching the file to, or
+# None if the search is not instrumented.
+# @return A list of line number(s) the result was found on.
+def searchFile(path, matcher, cancelled = None, instruments = None):
+    # declare deep search local variables
+    results = []
+    lineNumber = 1
+    if instruments != None:
+        started = time.perf_counter()
+    # bytes that cannot be decoded are replaced rather than ending the search
+    fileStream = open(path, 'r', errors = 'replace')
+    lines = fileStream
+    if instruments != None:
+        instruments.add(Instruments.PHASE_OPEN, time.perf_counter() - started)
+        lines = instruments.readLines(fileStream, DEEP_SEARCH_CHUNK_SIZE)
+
+    # scan through each line of the file looking for our search string
+    for line in lines:
+        # when a result is found, append it to the results list
+        if matcher.matchLine(line):
+            results.append(lineNumber)
+        # increment the line number since the loop won't keep track
+        lineNumber += 1
+        
+        if lineNumber % CANCEL_CHECK_LINES == 0 and cancelled != None and cancelled():
+            break
+
+    # don't forget to close the files!
+    lines = None
+    fileStream.close()
+
+    # return the deep search results
+    return results
+
+## Searches within an individual file for the desired search string by memory-mapping the file and searching its raw
+# bytes, ignoring case. Nothing is decoded or copied line by line; line numbers are only worked out for the matches, by
+# counting the newlines that come before each one, so a file without a match costs a single pass over its bytes. For a
+# pattern or regular expression, only the lines holding its required literal are checked against the whole expression.
+#
+# @param path The full path of the file to be searched.
+# @param matcher The Matcher.Matcher for the search string.
+# @param cancelled A function returning True once the search has been cancelled, checked between chunks of the file.
+# @param instruments The Instruments.Instruments to add the time spent opening and matching the file to, or None if
+# the search is not instrumented.
+# @return A list of line number(s) the result was found on.
+def searchFileMapped(path, matcher, cancelled = None, instruments = None):
+    # a search string that cannot be matched against raw bytes is matched a line at a time instead
+    if matcher.finder == None:
+        return searchFile(path, matcher, cancelled, instruments)
+
+    results = []
+    if instruments != None:
+        started = time.perf_counter()
+    fileStream = open(path, 'rb')
+    try:
+        # an empty file cannot be mapped, and has nothing to find anyway
+        try:
+            data = mmap.mmap(fileStream.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            return results
+        if instruments != None:
+            opened = time.perf_counter()
+            instruments.add(Instruments.PHASE_OPEN, opened - started)
+
+        try:
+            lineNumber = 1
+            counted = 0
+            pos = 0
+            while pos < len(data):
+                if cancelled != None and cancelled():
+                    break
+                # a chunk always ends at a line break, so that no line is split between two chunks
+                chunkEnd = len(data)
+                if pos + DEEP_SEARCH_CHUNK_SIZE < len(data):
+                    chunkEnd = data.find(b'\n', pos + DEEP_SEARCH_CHUNK_SIZE)
+                    if chunkEnd == -1:
+                        chunkEnd = len(data)
+
+                match = matcher.finder.search(data, pos, chunkEnd)
+                while match != None:
+                    start = data.rfind(b'\n', 0, match.start()) + 1
+                    # there is no line after the final line break, although an empty match may be found there
+                    if start == len(data):
+                        break
+                    end = data.find(b'\n', match.start())
+                    if end == -1:
+                        end = len(data)
+
+                    if matcher.matchBytes(data, start, end, match):
+                        # count the lines between the last match and this one
+                        lineNumber += data[counted:start].count(b'\n')
+                        counted = start
+                        results.append(lineNumber)
+
+                    # a line is only reported once, so carry on from the start of the next line
+                    if end >= chunkEnd:
+                        break
+                    match = matcher.finder.search(data, end + 1, chunkEnd)
+                pos = chunkEnd + 1
+        finally:
+            data.close()
+            if instruments != None:
+                instruments.add(Instruments.PHASE_MATCH, time.perf_counter() - opened)
+    finally:
+        fileStream.close()
+
+    return results
+
+## Searches within a batch of files in a Deep Search process. A file that cannot be read is skipped rather than losing
+# the rest of the batch.
+#
+# @param batch A list of the full path of each file to be searched, and the directory it is in and its name, as the walk
+# yielded them.
+# @param matcher The Matcher.Matcher for the search string.
+# @param engine The Deep Search engine to search each file with.
+# @param instruments A new Instruments.Instruments to add the time spent on each file to, or None if the search is not
+# instrumented.
+# @return A list of the directory and name and the line number(s) of each file the search string was found within, and
+# the instruments, which are a copy in this process.
+def searchFiles(batch, matcher, engine, instruments = None):
+    matches = []
+    for path, place in batch:
+        if instruments != None:
+            started = time.perf_counter()
+        try:
+            lineNumbers = deepSearchEngines[engine](path, matcher, None, instruments)
+        except:
+            continue
+        finally:
+            if instruments != None:
+                instruments.addFile(path, time.perf_counter() - started)
+        if len(lineNumbers) != 0:
+            matches.append((place, lineNumbers))
+    return matches, instruments
+
+## Searches within an individual file for every one of a list of patterns a decoded line at a time, just as searchFile
+# does for a single search string. Used for patterns that cannot be found in raw bytes.
+#
+# @param path The full path of the file to be searched.
+# @param patterns The list of (lowercased) patterns, as bytes.
+# @param cancelled A function returning True once the search has been cancelled, checked every CANCEL_CHECK_LINES lines.
+# @param instruments The Instruments.Instruments to add the time spent opening, reading, and matching the file to, or
+# None if the search is not instrumented.
+# @return A dictionary from the index of each pattern found to the list of line number(s) it was found on.
+def searchFileMultiLines(path, patterns, cancelled = None, instruments = None):
+    found = {}
+    patterns = [pattern.decode('utf-8') for pattern in patterns]
+    lineNumber = 1
+    if instruments != None:
+        started = time.perf_counter()
+    # bytes that cannot be decoded are replaced rather than ending the search
+    fileStream = open(path, 'r', errors = 'replace')
+    lines = fileStream
+    if instruments != None:
+        instruments.add(Instruments.PHASE_OPEN, time.perf_counter() - started)
+        lines = instruments.readLines(fileStream, DEEP_SEARCH_CHUNK_SIZE)
+
+    for line in lines:
+        line = line.lower()
+        for i in range(len(patterns)):
+            if patterns[i] in line:
+                if i in found:
+                    found[i].append(lineNumber)
+                else:
+                    found[i] = [lineNumber]
+        lineNumber += 1
+
+        if lineNumber % CANCEL_CHECK_LINES == 0 and cancelled != None and cancelled():
+            break
+
+    lines = None
+    fileStream.close()
+    return found
+
+## Searches within an individual file for every one of a list of patterns. The file is memory-mapped and lowercased a
+# chunk of whole lines at a time, and a single regular expression matching any of the patterns finds the lines worth
+# looking at; each of those lines is then checked for every pattern, so patterns that overlap one another are all found.
+#
+# @param path The full path of the file to be searched.
+# @param patterns The list of (lowercased) patterns, as bytes.
+# @param combined The compiled bytes regular expression matching any of the patterns.
+# @param cancelled A function returning True once the search has been cancelled, checked between chunks of the file.
+# @param instruments The Instruments.Instruments to add the time spent opening and matching the file to, or None if
+# the search is not instrumented.
+# @return A dictionary from the index of each pattern found to the list of line number(s) it was found on.
+def searchFileMulti(path, patterns, combined, cancelled = None, instruments = None):
+    # lowercasing bytes only folds the case of ASCII letters, so any other pattern is matched against decoded lines
+    for pattern in patterns:
+        if not pattern.isascii():
+            return searchFileMultiLines(path, patterns, cancelled, instruments)
+
+    found = {}
+    if instruments != None:
+        started = time.perf_counter()
+    fileStream = open(path, 'rb')
+    try:
+        # an empty file cannot be mapped, and has nothing to find anyway
+        try:
+            data = mmap.mmap(fileStream.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            return found
+        if instruments != None:
+            opened = time.perf_counter()
+            instruments.add(Instruments.PHASE_OPEN, opened - started)
+
+        try:
+            lineNumber = 1
+            pos = 0
+            while pos < len(data):
+                if cancelled != None and cancelled():
+                    break
+                # a chunk always ends on a line break, so that no line is split between two chunks
+                end = len(data)
+                if pos + DEEP_SEARCH_CHUNK_SIZE < len(data):
+                    end = data.find(b'\n', pos + DEEP_SEARCH_CHUNK_SIZE) + 1
+                    if end == 0:
+                        end = len(data)
+                chunk = data[pos:end].lower()
+
+                # counted is the start of the line that lineNumber refers to
+                counted = 0
+                match = combined.search(chunk)
+                while match != None:
+                    start = chunk.rfind(b'\n', 0, match.start()) + 1
+                    lineEnd = chunk.find(b'\n', match.end())
+                    if lineEnd == -1:
+                        lineEnd = len(chunk)
+                    lineNumber += chunk.count(b'\n', counted, start)
+                    counted = start
+
+                    line = chunk[start:lineEnd]
+                    for i in range(len(patterns)):
+                        if not patterns[i] in line:
+                            continue
+                        if i in found:
+                            found[i].append(lineNumber)
+                        else:
+                            found[i] = [lineNumber]
+
+                    # carry on from the start of the next line
+                    match = combined.search(chunk, lineEnd + 1)
+                lineNumber += chunk.count(b'\n', counted)
+                pos = end
+        finally:
+            data.close()
+            if instruments != None:
+                instruments.add(Instruments.PHASE_MATCH, time.perf_counter() - opened)
+    finally:
+        fileStream.close()
+
+    return found
+
+## Searches within a batch of files for a list of patterns in a Deep Search process.
+#
+# @param batch A list of the full path of each file to be searched, and the directory it is in and its name, as the walk
+# yielded them.
+# @param patterns The list of (lowercased) patterns, as bytes.
+# @param combined The compiled bytes regular expression matching any of the patterns.
+# @param instruments A new Instruments.Instruments to add the time spent on each file to, or None if the search is not
+# instrumented.
+# @return A list of the directory and name of each file any pattern was found within, and a dictionary from the index
+# of each pattern found to its line number(s); and the instruments, which are a copy in this process.
+def searchFilesMulti(batch, patterns, combined, instruments = None):
+    matches = []
+    for path, place in batch:
+        if instruments != None:
+            started = time.perf_counter()
+        try:
+            found = searchFileMulti(path, patterns, combined, None, instruments)
+        except:
+            continue
+        finally:
+            if instruments != None:
+                instruments.addFile(path, time.perf_counter() - started)
+        if len(found) != 0:
+            matches.append((place, found))
+    return matches, instruments
+
+## The Deep Search engines, by the value of the Deep Search Engine option.
+deepSearchEngines = {DEEP_SEARCH_LINES: searchFile, DEEP_SEARCH_MAPPED: searchFileMapped}
+
+## Searches the contents of a file as they arrive, a block at a time, for a file that can only be read as a stream (a
+# remote file being downloaded). Only whole lines are searched; the unfinished line at the end of each block is held back
+# until the rest of it arrives, so line numbers stay right however the blocks fall. The lines are found just as the
+# memory-mapped engine finds them, by looking for the finder in the raw bytes and counting newlines only up to each match.
+class StreamSearch:
+    ## Initialize the local class variables with passed in variables.
+    #
+    # @param self A pointer to the local class.
+    # @param matcher The Matcher.Matcher for the search string.
+    # @param stopAtFirst True to stop at the first matching line, for a Partial Search.
+    # @param cancelled A function returning True once the search has been cancelled, checked for every block.
+    def __init__(self, matcher, stopAtFirst = False, cancelled = None):
+        ## The Matcher.Matcher for the search string.
+        self.matcher = matcher
+        ## True to stop at the first matching line.
+        self.stopAtFirst = stopAtFirst
+        ## A function returning True once the search has been cancelled.
+        self.cancelled = cancelled
+        ## The line number(s) the search string was found on.
+        self.results = []
+        ## The number of the first line held back.
+        self.lineNumber = 1
+        ## The unfinished line held back from the last block.
+        self.tail = b''
+        ## The number of bytes searched so far.
+        self.numBytes = 0
+        ## True if the first block showed that the file is binary.
+        self.binary = False
+
+    ## Searches the whole lines of a block of the file.
+    #
+    # @param self A pointer to the local class.
+    # @param data The next bytes of the file.
+    # @return True to keep reading, False if the rest of the file is not needed.
+    def feed(self, data):
+        # a binary file is not worth the rest of its download, just as it is not worth reading locally
+        if self.numBytes == 0 and Binary.isBinaryBlock(data[:Binary.BLOCK_SIZE]):
+            self.binary = True
+            return False
+        self.numBytes += len(data)
+
+        data = self.tail + data
+        end = data.rfind(b'\n') + 1
+        self.tail = data[end:]
+        if end > 0:
+            self.searchLines(data, end)
+
+        if self.stopAtFirst and len(self.results) > 0:
+            return False
+        return self.cancelled == None or not self.cancelled()
+
+    ## Searches the unfinished line at the end of the file, which has no line break after it.
+    #
+    # @param self A pointer to the local class.
+    # @return A list of line number(s) the result was found on.
+    def finish(self):
+        if len(self.tail) > 0 and not self.binary and not (self.stopAtFirst and len(self.results) > 0):
+            self.searchLines(self.tail, len(self.tail))
+            self.tail = b''
+        return self.results
+
+    ## Searches the lines at the start of a string of bytes.
+    #
+    # @param self A pointer to the local class.
+    # @param data The bytes, starting at the start of a line.
+    # @param end The index just past the last line to be searched, which is just past a line break or the end of data.
+    def searchLines(self, data, end):
+        matcher = self.matcher
+        counted = 0
+        if matcher.finder == None:
+            # a search string that cannot be matched against raw bytes is matched a decoded line at a time instead
+            for line in data[:end].splitlines():
+                if matcher.matchLine(line.decode('utf-8', 'replace')):
+                    self.results.append(self.lineNumber + counted)
+                counted += 1
+            self.lineNumber += data.count(b'\n', 0, end)
+            return
+
+        lineNumber = self.lineNumber
+        match = matcher.finder.search(data, 0, end)
+        while match != None:
+            start = data.rfind(b'\n', 0, match.start()) + 1
+            # there is no line after the final line break, although an empty match may be found there
+            if start >= end:
+                break
+            lineEnd = data.find(b'\n', match.start(), end)
+            if lineEnd == -1:
+                lineEnd = end
+
+            if matcher.matchBytes(data, start, lineEnd, match):
+                # count the lines between the last match and this one
+                lineNumber += data.count(b'\n', counted, start)
+                counted = start
+                self.results.append(lineNumber)
+                if self.stopAtFirst:
+                    break
+
+            # a line is only reported once, so carry on from the start of the next line
+            if lineEnd >= end:
+                break
+            match = matcher.finder.search(data, lineEnd + 1, end)
+        self.lineNumber = lineNumber + data.count(b'\n', counted, end)
+
+## A token for stopping a running search early: when another thread cancels it, once its time limit has passed, or
+# once the search has found as many results as it may. A search checks its token between directories and between
+# chunks of the file being Deep Searched, and keeps the results it found up to that point. One token may be shared by
+# several searches to stop them all at once.
+class CancelToken:
+    ## Initialize the local class variables with passed in variables.
+    #
+    # @param self A pointer to the local class.
+    # @param timeLimit The number of seconds the search may run for, or 0 for no limit.
+    # @param maxResults The number of results the search may find, or 0 for no limit.
+    def __init__(self, timeLimit = 0, maxResults = 0):
+        ## Set once the search should stop.
+        self.event = threading.Event()
+        ## The number of seconds the search may run for, or 0 for no limit.
+        self.timeLimit = timeLimit
+        ## The time by which the search must stop, set when the search starts.
+        self.deadline = None
+        ## The number of results the search may find, or 0 for no limit.
+        self.maxResults = maxResults
+        ## Why the search was stopped (STOP_CANCELLED, STOP_TIME_LIMIT, or STOP_MAX_RESULTS), or None if it wasn't.
+        self.reason = None
+
+    ## Starts the clock on the time limit, if it has not been started already.
+    #
+    # @param self A pointer to the local class.
+    def start(self):
+        if self.timeLimit > 0 and self.deadline == None:
+            self.deadline = time.time() + self.timeLimit
+
+    ## Tells the search to stop.
+    #
+    # @param self A pointer to the local class.
+    # @param reason Why the search is being stopped.
+    def cancel(self, reason = STOP_CANCELLED):
+        if self.reason == None:
+            self.reason = reason
+        self.event.set()
+
+    ## Checks to see if the search should stop.
+    #
+    # @param self A pointer to the local class.
+    # @return True if the token was cancelled or its time limit has passed, False otherwise.
+    def isCancelled(self):
+        if self.event.is_set():
+            return True
+        if self.deadline != None and time.time() > self.deadline:
+            self.cancel(STOP_TIME_LIMIT)
+            return True
+        return False
+
 ## An independent thread that performs the actual search.
 class Search(threading.Thread):
     ## Initialize the local class variables with passed in variables.
@@ -15,23 +501,84 @@ class Search(threading.Thread):
     # @param self A pointer to the local class.
     # @param string The search string to be found.
     # @param optionsList The settings list for how the search will be performed.
-    def __init__(self, string, optionsList):
+    # @param live True if the disk must be walked even when the filename index covers the root directory.
+    # @param token The CancelToken for stopping the search early; by default, one with the limits in the options list.
+    # @param instruments The Instruments.Instruments to count the calls and times of each phase of the search in, or None.
+    # @throws re.error If the search string is meant to be a regular expression, but is not a valid one.
+    def __init__(self, string, optionsList, live = False, token = None, instruments = None):
         threading.Thread.__init__(self)
         
         ## The search string to be found.
         self.string = string
         ## The settings list for how the search will be performed.
         self.optionsList = optionsList
+        ## Matches names and lines against the search string, compiled once for the whole search.
+        self.matcher = self.compileMatcher(string)
+        ## True if the disk must be walked even when the filename index covers the root directory.
+        self.live = live
+        ## True if the search was answered from the filename index.
+        self.usedIndex = False
+        ## True if the filename index covers the root directory but no longer matches the disk, so the disk was walked.
+        self.staleIndex = False
+        ## True if the search was answered from the results of a recent search.
+        self.usedCache = False
+        ## The pool of connections a remote search lists directories over, or None for a search over a single connection.
+        self.ftpPool = None
+        ## The Listings a remote search reads its directory listings through, or None to list every directory from the server.
+        self.listings = None
+        ## The content index, if a Deep Search is using it.
+        self.contentIndex = None
+        ## The files the content index shows may contain the search string.
+        self.candidates = None
         
+        ## The PathTable the paths of the results are stored in.
+        self.paths = PathTable.PathTable()
         ## The list of folders found matching the search string.
-        self.folderResults = []
+        self.folderResults = PathTable.PathList(self.paths)
         ## The list of files found matching the search string.
-        self.fileResults = []
+        self.fileResults = PathTable.PathList(self.paths)
         ## The list of files containing the search string.
-        self.inFileResults = []
+        self.inFileResults = PathTable.InFileList(self.paths)
         
         ## The current directory being searched.
         self.curDir = None
+        ## True once the search should stop adding results (a Partial Search has found its result, or it was cancelled).
+        self.stopped = False
+        ## The CancelToken for stopping the search early.
+        self.token = token
+        if token == None:
+            self.token = CancelToken(optionsList[19], optionsList[20])
+        ## True if the search was stopped early, so its results are incomplete.
+        self.incomplete = False
+        ## The Instruments.Instruments counting the calls and times of each phase of the search, or None.
+        self.instruments = instruments
+        ## Guards the results lists when several walker threads are searching.
+        self.lock = threading.Lock()
+        ## The first unexpected error raised in a walker thread of a parallel search, or None.
+        self.workerError = None
+        ## The process pool that Deep Search files are sent to, if one is used.
+        self.pool = None
+        ## The files waiting to be sent to the process pool.
+        self.batch = []
+        ## Limits the number of batches sent to the process pool that have not come back yet.
+        self.inFlight = None
+        ## The queue results are handed to the caller through as they are found, if the caller is reading matches().
+        self.stream = None
+        
+        # progress counters for the status display; they are updated without a lock, so they may run slightly behind
+        # while several walker threads are searching
+        ## The number of directories scanned so far.
+        self.numDirs = 0
+        ## The number of files scanned so far.
+        self.numFiles = 0
+        ## The number of bytes of the files handed to a Deep Search so far.
+        self.numBytes = 0
+        ## The number of results found so far.
+        self.numMatches = 0
+        ## A random sample of the directories walked, kept if the results are to be cached, or None otherwise.
+        self.sampleDirs = None
+        if self.cacheable():
+            self.sampleDirs = []
     
     ## A peek at the current state of the search thread.
     #
@@ -48,6 +595,69 @@ class Search(threading.Thread):
     def finish(self):
         # return the list of results
         return [self.folderResults, self.fileResults, self.inFileResults]
+
+    ## Starts the search and yields each result as soon as it is found, rather than waiting for the whole walk to
+    # finish. Call this instead of start(). The search is held up whenever STREAM_QUEUE_SIZE results are waiting to
+    # be read, and a caller that stops reading early (by breaking out of the loop, or closing the generator) ends the
+    # search. The results lists that finish() returns are filled in as usual.
+    #
+    # @param self A pointer to the local class.
+    # @return A generator yielding a Result for each folder, file, and in file result found.
+    def matches(self):
+        self.stream = queue.Queue(STREAM_QUEUE_SIZE)
+        self.start()
+        try:
+            while True:
+                result = self.stream.get()
+                # a None tells the caller that the search is finished
+                if result == None:
+                    return
+                yield result
+        finally:
+            if self.is_alive():
+                # the caller stopped early, so end the search, throwing away whatever it is still handing over
+                self.cancel()
+                while self.is_alive():
+                    try:
+                        self.stream.get(timeout = 0.01)
+                    except queue.Empty:
+                        pass
+
+    ## Stops the search as soon as it reaches a directory or chunk boundary, keeping the results found so far. May be
+    # called from any thread.
+    #
+    # @param self A pointer to the local class.
+    def cancel(self):
+        self.token.cancel()
+        self.isCancelled()
+
+    ## Checks to see if the search should stop, either because a Partial Search has its result or because the search
+    # was cancelled or ran out of time.
+    #
+    # @param self A pointer to the local class.
+    # @return True if the search should stop, False otherwise.
+    def isCancelled(self):
+        if self.stopped:
+            return True
+        if self.token.isCancelled():
+            self.incomplete = True
+            self.stopped = True
+            return True
+        return False
+
+    ## Hands a result to the caller of matches(), if there is one, waiting while too many results are unread.
+    #
+    # @param self A pointer to the local class.
+    # @param kind RESULT_FOLDER, RESULT_FILE, or RESULT_IN_FILE.
+    # @param item The item added to the results list.
+    # @param pattern The pattern the result matched, for a BatchSearch.
+    def streamResult(self, kind, item, pattern = None):
+        if self.stream == None:
+            return
+        if kind == RESULT_IN_FILE:
+            self.stream.put(Result(kind, self.paths.path(item[0]), item[1], pattern))
+        else:
+            self.stream.put(Result(kind, self.paths.path(item), None, pattern))
     
     
     ## ***This method is derived from the Python 2.6 source of os.walk***
@@ -60,33 +670,14 @@ class Search(threading.Thread):
     # @param topDown True for a top-down search, False otherwise.
     # @return The current root, a list of dirs in the cwd, and a list of files in the cwd.
     def ftpWalk(self, ftp, top, topDown = True):
-        # set the ftp directory to point at our the current top
-        ftp.cwd(top)
-        names = []
-
+        if self.isCancelled():
+            return
         # if we do not have permission to grab a certain directory, continue to the next iteration
         try:
-            # retrieve a list of everything in this folder
-            ftp.retrlines('LIST', names.append)
-        except:
+            dirs, nonDirs = self.remoteList(ftp, top)
+        except Remote.ERRORS:
             return
 
-        dirs, nonDirs = [], []
-        for line in names:
-            # split the ftp line into its sections
-            words = line.split(None, 8)
-            
-            linkCount = words[-1].find(' -> ')
-            # conditions for skipping this line element
-            if len(words) < 6 or words[-1] in ('.', '..') or linkCount > 0:
-                continue
-            
-            # store the directory or file in its respective list
-            if words[0][0] == 'd':
-                dirs.append(words[-1])
-            else:
-                nonDirs.append(words[-1])
-
         if topDown:
             yield top, dirs, nonDirs
         for name in dirs:
@@ -106,12 +697,18 @@ class Search(threading.Thread):
     # @param topDown True for a top-down search, False otherwise.
     # @return The current root, a list of dirs in the cwd, and a list of files in the cwd.
     def localWalk(self, top, topDown = True):
+        if self.isCancelled():
+            return
+        if self.instruments != None:
+            started = time.perf_counter()
         # if we do not have permission to grab a certain directory, continue to the next iteration
         try:
             # retrieve a list of everything in this folder
             names = os.listdir(top)
         except:
             return
+        if self.instruments != None:
+            listed = time.perf_counter()
     
         dirs, nonDirs = [], []
         for name in names:
@@ -120,6 +717,8 @@ class Search(threading.Thread):
                 dirs.append(name)
             else:
                 nonDirs.append(name)
+        if self.instruments != None:
+            self.timeListing(top, started, listed, len(names))
     
         if topDown:
             yield top, dirs, nonDirs
@@ -131,7 +730,312 @@ class Search(threading.Thread):
                     yield x
         if not topDown:
             yield top, dirs, nonDirs
-    
+
+    ## Lists a single local directory with os.scandir. The type of each entry is read from the directory entry itself (d_type),
+    # so no stat call is made for an entry unless the filesystem does not supply its type or the entry is a symbolic link.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory to be listed.
+    # @return A list of dirs, a list of files, and a set of the dirs which are symbolic links, or None if the directory could not be read.
+    def scanDir(self, top):
+        dirs, nonDirs, links = [], [], set()
+        if self.instruments != None:
+            started = time.perf_counter()
+        try:
+            with os.scandir(top) as entries:
+                for entry in entries:
+                    # a broken symbolic link or a vanished entry is treated like a file, just as os.path.isdir does
+                    try:
+                        isDir = entry.is_dir()
+                    except OSError:
+                        isDir = False
+
+                    # store the directory or file in its respective list
+                    if isDir:
+                        dirs.append(entry.name)
+                        if entry.is_symlink():
+                            links.add(entry.name)
+                    else:
+                        nonDirs.append(entry.name)
+        except OSError:
+            return None
+        # the types come with the listing, so the whole scan counts as listing the directory
+        if self.instruments != None:
+            self.timeListing(top, started)
+
+        return dirs, nonDirs, links
+
+    ## Recursively walks through the local location for the search using os.scandir rather than os.listdir and per-entry stats.
+    #
+    # @param self A pointer to the local class.
+    # @param top The current top directory.
+    # @param topDown True for a top-down search, False otherwise.
+    # @return The current root, a list of dirs in the cwd, and a list of files in the cwd.
+    def scandirWalk(self, top, topDown = True):
+        if self.isCancelled():
+            return
+        # if we do not have permission to grab a certain directory, continue to the next iteration
+        listing = self.scanDir(top)
+        if listing == None:
+            return
+        dirs, nonDirs, links = listing
+
+        if topDown:
+            yield top, dirs, nonDirs
+        for name in dirs:
+            if not name in links:
+                # recursively enter this subdirectory
+                for x in self.scandirWalk(os.path.join(top, name), topDown):
+                    yield x
+        if not topDown:
+            yield top, dirs, nonDirs
+
+    ## Lists a single local directory with os.listdir and a stat of each entry, just as localWalk does.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory to be listed.
+    # @return A list of dirs, a list of files, and a set of the dirs which are symbolic links, or None if the directory could not be read.
+    def listDir(self, top):
+        if self.instruments != None:
+            started = time.perf_counter()
+        try:
+            names = os.listdir(top)
+        except:
+            return None
+        if self.instruments != None:
+            listed = time.perf_counter()
+
+        dirs, nonDirs, links = [], [], set()
+        for name in names:
+            # store the directory or file in its respective list
+            path = os.path.join(top, name)
+            if os.path.isdir(path):
+                dirs.append(name)
+                if os.path.islink(path):
+                    links.add(name)
+            else:
+                nonDirs.append(name)
+        if self.instruments != None:
+            self.timeListing(top, started, listed, len(names))
+
+        return dirs, nonDirs, links
+
+    ## Lists a single remote directory, from the stored listings if the search uses them.
+    #
+    # @param self A pointer to the local class.
+    # @param ftp The logged in connection.
+    # @param top The directory to be listed.
+    # @return A list of dirs and a list of files.
+    # @throws ftplib.Error If the directory could not be listed.
+    def remoteList(self, ftp, top):
+        if self.instruments != None:
+            started = time.perf_counter()
+        if self.listings != None:
+            listing = self.listings.listDir(ftp, top)
+        else:
+            listing = Remote.listDir(ftp, top)
+        if self.instruments != None:
+            self.timeListing(top, started)
+        return listing
+
+    ## Adds the time spent listing a directory to the instruments.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory that was listed.
+    # @param started The time (from time.perf_counter()) the listing started.
+    # @param listed The time the names were listed, if a stat of each entry followed to tell the directories from the
+    # files, or None if the listing gave the type of each entry.
+    # @param numStats The number of entries that were stat'ed.
+    def timeListing(self, top, started, listed = None, numStats = 0):
+        finished = time.perf_counter()
+        if listed == None:
+            listed = finished
+        self.instruments.add(Instruments.PHASE_LISTDIR, listed - started)
+        if numStats > 0:
+            self.instruments.add(Instruments.PHASE_STAT, finished - listed, numStats)
+        self.instruments.addDir(top, finished - started)
+
+    ## Lists a single remote directory on whichever pooled connection is free, connecting again if the server has
+    # dropped the connection.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory to be listed.
+    # @return A list of dirs, a list of files, and an empty set (symbolic links are left out of remote listings), or None if the directory could not be read.
+    def remoteListDir(self, top):
+        try:
+            dirs, nonDirs = self.ftpPool.call(lambda ftp: self.remoteList(ftp, top))
+        except Remote.ERRORS:
+            return None
+        return dirs, nonDirs, set()
+
+    ## Lists a single directory with the walker selected in the options list, or over the pooled connections for a
+    # remote search.
+    #
+    # @param self A pointer to the local class.
+    # @param top The directory to be listed.
+    # @return A list of dirs, a list of files, and a set of the dirs which are symbolic links, or None if the directory could not be read.
+    def readDir(self, top):
+        if self.ftpPool != None:
+            return self.remoteListDir(top)
+        elif self.optionsList[12] == WALKER_SCANDIR:
+            return self.scanDir(top)
+        else:
+            return self.listDir(top)
+
+    ## Returns the filename index if this search can be answered from it. An index whose sampled directories have
+    # changed since it was built or refreshed is not used, since its results would be out of date.
+    #
+    # @param self A pointer to the local class.
+    # @return The index, or None if the disk must be walked.
+    def loadIndex(self):
+        if self.live or not self.optionsList[14]:
+            return None
+        index = Index.load()
+        if index == None or not index.covers(self.optionsList[5]):
+            return None
+        if not index.isFresh(self.optionsList[5]):
+            self.staleIndex = True
+            return None
+        self.usedIndex = True
+        return index
+
+    ## Looks up the files that may contain the search string in the content index, if a Deep Search can use it.
+    #
+    # @param self A pointer to the local class.
+    def loadContentIndex(self):
+        if self.live or not self.optionsList[0] or not self.optionsList[15] or not ContentIndex.usable(self.matcher.required):
+            return
+        contentIndex = ContentIndex.load()
+        if contentIndex == None or not contentIndex.covers(self.optionsList[5]):
+            return
+        self.contentIndex = contentIndex
+        self.candidates = contentIndex.candidates(self.matcher.required)
+
+    ## Checks to see if a file needs to be read by a Deep Search.
+    #
+    # @param self A pointer to the local class.
+    # @param root The directory the file is in.
+    # @param fileName The name of the file.
+    # @param stat The result of os.stat for the file, or None if it is not known.
+    # @return False if the content index shows the file cannot contain the search string, True otherwise.
+    def mayContain(self, root, fileName, stat = None):
+        if self.contentIndex == None:
+            return True
+        return self.contentIndex.mayContain(os.path.join(os.path.abspath(root), fileName), self.candidates, stat)
+
+    ## Checks to see if the results of the search may be kept in the result cache: only complete, Full Searches of a
+    # local root directory are kept, and only while the cache is turned on. A Deep Search is never kept, since editing a
+    # file in place does not change the mtime of its directory, so its cached results could not be checked.
+    #
+    # @param self A pointer to the local class.
+    # @return True if the results may be cached, False otherwise.
+    def cacheable(self):
+        return self.optionsList[6] == None and self.optionsList[4] and not self.optionsList[0] and self.optionsList[21] > 0
+
+    ## Returns the key the results of the search are kept under in the result cache.
+    #
+    # @param self A pointer to the local class.
+    # @return The absolute root directory, the search string, and the options that change the results.
+    def cacheKey(self):
+        string = self.string
+        if self.optionsList[18] == Matcher.MATCH_LITERAL:
+            string = string.lower()
+        return (os.path.abspath(self.optionsList[5]), string, (self.optionsList[0], self.optionsList[1], self.optionsList[2], \
+                self.optionsList[3], frozenset(self.optionsList[17]), self.optionsList[18]))
+
+    ## Returns the absolute path of a search result, if the form of the results allows it.
+    #
+    # @param self A pointer to the local class.
+    # @param path The path stored in the results list.
+    # @return The absolute path, or None if only names are stored.
+    def absResultPath(self, path):
+        if self.optionsList[3] == 0:
+            return path
+        elif self.optionsList[3] == 1:
+            return os.path.abspath(os.path.join(self.optionsList[5], path))
+        return None
+
+    ## Reads the mtimes of the root directory, of a random sample of the directories walked, and of the directories
+    # holding the results, so that a cached copy of the results can be checked before it is used again.
+    #
+    # @param self A pointer to the local class.
+    # @return Maps the absolute path of each sampled directory to its mtime.
+    def sampleMtimes(self):
+        dirs = set([os.path.abspath(self.optionsList[5])])
+        dirs.update([os.path.abspath(path) for path in self.sampleDirs])
+
+        resultDirs = set()
+        for item in itertools.chain(self.folderResults, self.fileResults):
+            if len(resultDirs) >= Cache.MAX_RESULT_DIRS:
+                break
+            path = self.absResultPath(item)
+            if not path == None:
+                resultDirs.add(os.path.dirname(path))
+        dirs.update(resultDirs)
+
+        mtimes = {}
+        for path in dirs:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                pass
+        return mtimes
+
+    ## Keeps the results of the search in the result cache, if they may be cached.
+    #
+    # @param self A pointer to the local class.
+    # @param mtimes The sampled directory mtimes to keep with the results, or None to sample them now.
+    def cacheResults(self, mtimes = None):
+        if not self.cacheable() or self.incomplete:
+            return
+        if mtimes == None:
+            mtimes = self.sampleMtimes()
+        Cache.resultCache.store(self.cacheKey(), self.finish(), mtimes, self.optionsList[21] * 1024 * 1024)
+
+    ## Answers the search from the result cache, if a recent search can answer it. The results of the same search are
+    # used as they are. The results of a search for part of a plain text search string are narrowed down instead: only
+    # the cached names are checked against the search string.
+    #
+    # @param self A pointer to the local class.
+    # @return True if the search was answered from the cache, False if the tree must be walked.
+    def answerFromCache(self):
+        if self.live or not self.cacheable():
+            return False
+        narrowable = self.optionsList[18] == Matcher.MATCH_LITERAL
+        entry, exact = Cache.resultCache.find(self.cacheKey(), narrowable)
+        if entry == None:
+            return False
+        self.usedCache = True
+
+        resultsLists = (self.folderResults, self.fileResults, self.inFileResults)
+        if exact:
+            for kind in range(3):
+                for item in entry.results[kind]:
+                    if kind == RESULT_IN_FILE:
+                        self.addResult(resultsLists[kind], [self.paths.addPath(item[0]), item[1]])
+                    else:
+                        self.addResult(resultsLists[kind], self.paths.addPath(item))
+        else:
+            for kind in range(2):
+                for item in entry.results[kind]:
+                    if self.matcher.matchName(os.path.basename(item)):
+                        self.addResult(resultsLists[kind], self.paths.addPath(item))
+
+        # the narrower results stay as up to date as the results they came from
+        self.cacheResults(entry.mtimes)
+        return True
+
+    ## Returns the local walk selected in the options list.
+    #
+    # @param self A pointer to the local class.
+    # @param top The top directory of the walk.
+    # @return A generator yielding the current root, a list of dirs in the cwd, and a list of files in the cwd.
+    def walk(self, top):
+        if self.optionsList[12] == WALKER_SCANDIR:
+            return self.scandirWalk(top)
+        else:
+            return self.localWalk(top)
+
     ## ***This method is derived from the Python 2.6 source to ensure that FastSearch works with users running Python versions older than 2.6***
     #
     # Returns a relative version of the path specified.
@@ -158,24 +1062,170 @@ class Search(threading.Thread):
     # @param fileName The name of the file to be searched.
     # @return A list of line number(s) the result was found on.
     def deepSearch(self, path, fileName):
-        # declare deep search local variables
-        results = []
-        lineNumber = 1
-        fileStream = open(os.path.join(path, fileName), 'r')
-
-        # scan through each line of the file looking for our search string
-        for line in fileStream:
-            # when a result is found, append it to the results list
-            if line.lower().rfind(self.string) != -1:
-                results.append(lineNumber)
-            # increment the line number since the loop won't keep track
-            lineNumber += 1
-
-        # don't forget to close the files!
-        fileStream.close()
+        if not self.optionsList[6] == None:
+            return self.remoteDeepSearch(path, fileName)
+        return deepSearchEngines[self.optionsList[16]](os.path.join(path, fileName), self.matcher, self.isCancelled, self.instruments)
 
-        # return the deep search results
-        return results
+    ## Searches within a remote file for the search string, by downloading it and searching each block as it arrives. The
+    # download is aborted as soon as the rest of the file is not needed: once a Partial Search has its line, once the
+    # search is cancelled, or once the file turns out to be binary. Downloads run over the pooled connections when there
+    # are several, so that each walker thread can have a file downloading at once.
+    #
+    # @param self A pointer to the local class.
+    # @param path The remote directory of the file.
+    # @param fileName The name of the file to be searched.
+    # @return A list of line number(s) the result was found on.
+    def remoteDeepSearch(self, path, fileName):
+        path = os.path.join(path, fileName)
+        
+        def command(ftp):
+            search = StreamSearch(self.matcher, not self.optionsList[4], lambda: self.stopped or self.isCancelled())
+            if self.instruments == None:
+                Remote.retrieve(ftp, path, search.feed)
+            else:
+                # the time spent matching each block is timed, and everything else counts as reading the file
+                matching = [0.0]
+                def feed(data):
+                    started = time.perf_counter()
+                    try:
+                        return search.feed(data)
+                    finally:
+                        matching[0] += time.perf_counter() - started
+                started = time.perf_counter()
+                try:
+                    Remote.retrieve(ftp, path, feed)
+                finally:
+                    self.instruments.add(Instruments.PHASE_READ, time.perf_counter() - started - matching[0])
+                    self.instruments.add(Instruments.PHASE_MATCH, matching[0])
+            self.numBytes += search.numBytes
+            return search.finish()
+        
+        # a file that cannot be downloaded is skipped rather than ending the search
+        try:
+            if self.ftpPool != None:
+                return self.ftpPool.call(command)
+            return command(self.optionsList[6])
+        except Remote.ERRORS:
+            return []
+
+    ## Compiles the search string in the match mode selected in the options list.
+    #
+    # @param self A pointer to the local class.
+    # @param string The search string.
+    # @return The Matcher.Matcher for the search string.
+    def compileMatcher(self, string):
+        return Matcher.Matcher(string, self.optionsList[18])
+
+    ## Checks a file or folder name against the search string.
+    #
+    # @param self A pointer to the local class.
+    # @param name The name of the file or folder.
+    # @return A list of the results lists (folders, files, and in files) the name should be added to.
+    def nameMatches(self, name):
+        if self.matcher.matchName(name):
+            return [[self.folderResults, self.fileResults, self.inFileResults]]
+        return []
+
+    ## Searches within a file for the search string.
+    #
+    # @param self A pointer to the local class.
+    # @param path The path to the file to be searched.
+    # @param fileName The name of the file to be searched.
+    # @return A list of the results lists (folders, files, and in files) the file should be added to, each with the line number(s) of the match.
+    def contentMatches(self, path, fileName):
+        lineNumbers = self.deepSearch(path, fileName)
+        if len(lineNumbers) != 0:
+            return [([self.folderResults, self.fileResults, self.inFileResults], lineNumbers)]
+        return []
+
+    ## Returns the function a Deep Search process runs on each batch of files, and the arguments that follow the batch.
+    #
+    # @param self A pointer to the local class.
+    # @return The function and a tuple of its remaining arguments.
+    def deepSearchTask(self):
+        return searchFiles, (self.matcher, self.optionsList[16], self.poolInstruments())
+
+    ## Returns the instruments a Deep Search process adds the time spent on a batch of files to.
+    #
+    # @param self A pointer to the local class.
+    # @return A new Instruments.Instruments, to be merged into this search's once the batch comes back, or None if the
+    # search is not instrumented.
+    def poolInstruments(self):
+        if self.instruments == None:
+            return None
+        return Instruments.Instruments()
+
+    ## Hands a file to the Deep Search process pool. Files are sent in batches so that each trip to a process carries
+    # enough work to be worth it; the walk only waits here when too many batches are already waiting to be scanned. The
+    # result node of a file is only added once the file is found to match.
+    #
+    # @param self A pointer to the local class.
+    # @param root The directory the file is in.
+    # @param fileName The name of the file to be searched.
+    def queueDeepSearch(self, root, fileName):
+        with self.lock:
+            self.batch.append((os.path.join(os.path.abspath(root), fileName), (root, fileName)))
+            if len(self.batch) < DEEP_SEARCH_BATCH_SIZE:
+                return
+            batch = self.batch
+            self.batch = []
+
+        self.submitDeepSearch(batch)
+
+    ## Sends a batch of files to the Deep Search process pool, blocking while the in-flight limit is reached.
+    #
+    # @param self A pointer to the local class.
+    # @param batch A list of the full path of each file to be searched, and the directory it is in and its name.
+    def submitDeepSearch(self, batch):
+        self.inFlight.acquire()
+        function, args = self.deepSearchTask()
+        self.pool.apply_async(function, (batch,) + args, callback = self.collectDeepSearch, error_callback = self.failDeepSearch)
+
+    ## Called by the process pool with the matches from one batch of files.
+    #
+    # @param self A pointer to the local class.
+    # @param result A list of the directory and name and the line numbers of each file the search string was found
+    # within, and the instruments of the batch (or None).
+    def collectDeepSearch(self, result):
+        matches, instruments = result
+        if instruments != None:
+            self.instruments.merge(instruments)
+        for (root, fileName), lineNumbers in matches:
+            self.addResult(self.inFileResults, [self.resultNode(root, fileName), lineNumbers])
+        self.inFlight.release()
+
+    ## Called by the process pool if a batch could not be searched at all.
+    #
+    # @param self A pointer to the local class.
+    # @param error The exception raised by the batch.
+    def failDeepSearch(self, error):
+        self.inFlight.release()
+
+    ## Starts the Deep Search process pool if the options list asks for one.
+    #
+    # @param self A pointer to the local class.
+    def startDeepSearchPool(self):
+        if self.optionsList[0] and self.optionsList[13] > 0 and self.optionsList[6] == None:
+            self.pool = multiprocessing.Pool(self.optionsList[13])
+            self.inFlight = threading.BoundedSemaphore(self.optionsList[13] * DEEP_SEARCH_BATCHES_PER_PROCESS)
+
+    ## Sends the last partial batch to the Deep Search process pool and waits for the pool to finish.
+    #
+    # @param self A pointer to the local class.
+    def finishDeepSearchPool(self):
+        if self.pool == None:
+            return
+
+        # a Partial Search that already has its result doesn't need to wait on the remaining batches
+        if not self.stopped and len(self.batch) > 0:
+            self.submitDeepSearch(self.batch)
+            self.batch = []
+        if self.stopped:
+            self.pool.terminate()
+        else:
+            self.pool.close()
+        self.pool.join()
+        self.pool = None
     
     ## Checks to see if the current item is a hidden file or folder and should be excluded.
     #
@@ -195,15 +1245,84 @@ class Search(threading.Thread):
     # @param string The string to check.
     # @return True if the file should be excluded from a Deep Search, False otherwise.
     def deepSearchExclude(self, string):
-        if string.endswith('.exe') or string.endswith('.zip') or string.endswith('.tar') \
-           or string.endswith('.bz') or string.endswith('.gz') or string.endswith('.hqx') or string.endswith('.app') \
-           or string.endswith('.dll') or string.endswith('.mov') or string.endswith('.mpeg') or string.endswith('.mpg') \
-           or string.endswith('.wmv') or string.endswith('.avi') or string.endswith('.dv') or string.endswith('.jpg') \
-           or string.endswith('.jpeg') or string.endswith('.bmp') or string.endswith('.png') or string.endswith('.psd'):
-            return True
-        else:
+        return os.path.splitext(string)[1].lower() in self.optionsList[17]
+
+    ## Checks to see if a file should be read by a Deep Search: its extension must not be excluded, the content index
+    # (if one is used) must show it may contain the search string, and it must not be binary.
+    #
+    # @param self A pointer to the local class.
+    # @param root The directory the file is in.
+    # @param fileName The name of the file.
+    # @return True if the file should be searched, False otherwise.
+    def deepSearchable(self, root, fileName):
+        if self.deepSearchExclude(fileName):
+            return False
+        # only local files can be checked for changes or binary content without fetching them
+        if not self.optionsList[6] == None:
+            return self.mayContain(root, fileName)
+
+        path = os.path.join(root, fileName)
+        if self.instruments != None:
+            started = time.perf_counter()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return self.mayContain(root, fileName)
+        if self.instruments != None:
+            statted = time.perf_counter()
+            self.instruments.add(Instruments.PHASE_STAT, statted - started)
+        # the stat tells the content index whether the file has changed since it was indexed
+        if not self.mayContain(root, fileName, stat):
             return False
+        if self.instruments != None:
+            statted = time.perf_counter()
+        binary = Binary.isBinary(path, stat)
+        if self.instruments != None:
+            self.instruments.add(Instruments.PHASE_BINARY, time.perf_counter() - statted)
+        if binary:
+            return False
+        self.numBytes += stat.st_size
+        return True
     
+    ## Stores the path of a search result in the form requested by the options list (full, relative, or no path). The
+    # path of the directory is only worked out the first time the directory holds a result.
+    #
+    # @param self A pointer to the local class.
+    # @param root The directory the result was found in.
+    # @param name The name of the file or folder that was found.
+    # @return The number of the result's node in the PathTable, to be stored in the results list.
+    def resultNode(self, root, name):
+        if self.optionsList[3] == 0 or not self.optionsList[6] == None:
+            dirPath = lambda: os.path.abspath(root)
+        elif self.optionsList[3] == 1:
+            dirPath = lambda: self.relPath(root, self.optionsList[5])
+        else:
+            dirPath = None
+        return self.paths.add(root, dirPath, name)
+
+    ## Adds an item to one of the results lists. Results may be added by several walker threads at once, so the lock
+    # ensures that a Partial Search keeps exactly one result no matter which thread finds it first.
+    #
+    # @param self A pointer to the local class.
+    # @param results The results list to add to.
+    # @param item The item to be added.
+    def addResult(self, results, item):
+        with self.lock:
+            if self.stopped:
+                return
+            results.append(item)
+            self.numMatches += 1
+            for kind, kindResults in enumerate((self.folderResults, self.fileResults, self.inFileResults)):
+                if kindResults is results:
+                    self.streamResult(kind, item)
+            # if this is not a full search, we're done
+            if not self.optionsList[4]:
+                self.stopped = True
+            elif self.token.maxResults > 0 and self.numMatches >= self.token.maxResults:
+                self.token.cancel(STOP_MAX_RESULTS)
+                self.incomplete = True
+                self.stopped = True
+
     ## Searches this item in the walk for the specific search string by the given options within optionsList.
     #
     # @param self A pointer to the local class.
@@ -212,6 +1331,20 @@ class Search(threading.Thread):
     # @param files A list of files within this root.
     # @return A Full Search returns a 0 upon successful scanning, and a Partial Search returns a -1.
     def scanItem(self, root, dirs, files):
+        if self.isCancelled():
+            return -1
+        self.numDirs += 1
+        self.numFiles += len(files)
+
+        # keep a random sample of the directories walked, to tell later whether a cached copy of the results is stale
+        if self.sampleDirs != None:
+            if len(self.sampleDirs) < Cache.SAMPLE_SIZE:
+                self.sampleDirs.append(root)
+            else:
+                i = random.randrange(self.numDirs)
+                if i < Cache.SAMPLE_SIZE:
+                    self.sampleDirs[i] = root
+
         # if folders are to be shown
         if self.optionsList[1] == 1 or self.optionsList[1] == 2:
             # the folder name is stored in the second tuple value
@@ -222,18 +1355,13 @@ class Search(threading.Thread):
                     continue
                 
                 # check to see if the current folder name matches the search string
-                if folder.lower().rfind(self.string) != -1:
+                for results in self.nameMatches(folder):
                     # add it to the results list
-                    if self.optionsList[3] == 0 or not self.optionsList[6] == None:
-                        self.folderResults.append(os.path.join(os.path.abspath(root), folder))
-                    elif self.optionsList[3] == 1:
-                        self.folderResults.append(os.path.join(self.relPath(root, self.optionsList[5]), folder))
-                    else:
-                        self.folderResults.append(folder)
+                    self.addResult(results[0], self.resultNode(root, folder))
                     
-                    # if this is not a full search, we're done
-                    if not self.optionsList[4]:
-                        return -1
+                # if this is not a full search, we're done
+                if self.stopped:
+                    return -1
                         
         # if files are to be shown
         if self.optionsList[1] == 0 or self.optionsList[1] == 2:
@@ -243,63 +1371,335 @@ class Search(threading.Thread):
                 if (not self.optionsList[2]) and self.hiddenExclude(fileName):
                     continue
                 
-                # check to see if the user wants a deep search and that the file is a readable type
-                if self.optionsList[0] and not self.deepSearchExclude(fileName):
-                    lineNumbers = self.deepSearch(os.path.abspath(root), fileName)
-                    # if the deep search found a result, append it along with the line number(s) of the match
-                    if len(lineNumbers) != 0:
-                        if self.optionsList[3] == 0 or not self.optionsList[6] == None:
-                            self.inFileResults.append([os.path.join(os.path.abspath(root), fileName), lineNumbers])
-                        elif self.optionsList[3] == 1:
-                            self.inFileResults.append([os.path.join(self.relPath(root, self.optionsList[5]), fileName), lineNumbers])
-                        else:
-                            self.inFileResults.append([fileName, lineNumbers])
-                        
+                if self.instruments != None and self.optionsList[0]:
+                    started = time.perf_counter()
+                # check to see if the user wants a deep search and that the file is a readable type that may contain the string
+                if self.optionsList[0] and not self.isCancelled() and self.deepSearchable(root, fileName):
+                    if self.pool != None:
+                        self.queueDeepSearch(root, fileName)
+                    else:
+                        # a file that cannot be opened is skipped rather than ending the search
+                        try:
+                            matches = self.contentMatches(os.path.abspath(root), fileName)
+                        except (IOError, OSError):
+                            matches = []
+                        if self.instruments != None:
+                            self.instruments.addFile(os.path.join(root, fileName), time.perf_counter() - started)
+                        # if the deep search found a result, append it along with the line number(s) of the match
+                        for results, lineNumbers in matches:
+                            self.addResult(results[2], [self.resultNode(root, fileName), lineNumbers])
+                            
                         # if this is not a full search, we're done
-                        if not self.optionsList[4]:
+                        if self.stopped:
                             return -1
                     
                 # check to see if the current file name matches the search string
-                if fileName.lower().rfind(self.string) != -1:
+                for results in self.nameMatches(fileName):
                     # add it to the results list
-                    if self.optionsList[3] == 0 or not self.optionsList[6] == None:
-                    	self.fileResults.append(os.path.join(os.path.abspath(root), fileName))
-                    elif self.optionsList[3] == 1:
-                        self.fileResults.append(os.path.join(self.relPath(root, self.optionsList[5]), fileName))
-                    else:
-                        self.fileResults.append(fileName)
+                    self.addResult(results[1], self.resultNode(root, fileName))
                         
-                    # if this is not a full search, we're done
-                    if not self.optionsList[4]:
-                        return -1
+                # if this is not a full search, we're done
+                if self.stopped:
+                    return -1
         return 0
+
+    ## Pulls directories from the shared frontier, lists and scans each one, and pushes its subdirectories back onto the
+    # frontier for any of the walker threads to pick up. Runs in each walker thread of a parallel search.
+    #
+    # @param self A pointer to the local class.
+    # @param frontier The queue of directories waiting to be searched.
+    def parallelWorker(self, frontier):
+        while True:
+            top = frontier.get()
+            # a None tells the thread that the walk is finished
+            if top == None:
+                frontier.task_done()
+                return
+
+            try:
+                # once a Partial Search has its result (or the search is cancelled), the rest of the frontier is simply drained
+                if self.isCancelled():
+                    continue
+
+                # if we do not have permission to grab a certain directory, continue to the next iteration
+                listing = self.readDir(top)
+                if listing == None:
+                    continue
+                dirs, files, links = listing
+
+                self.curDir = top
+                if self.scanItem(top, dirs, files) == -1:
+                    continue
+
+                for name in dirs:
+                    if not name in links:
+                        frontier.put(os.path.join(top, name))
+            except Exception as error:
+                # the thread keeps draining the frontier so that the walk still ends, and the first error is raised
+                # again by parallelSearch() once it has
+                with self.lock:
+                    if self.workerError == None:
+                        self.workerError = error
+                self.cancel()
+            finally:
+                frontier.task_done()
+
+    ## Searches the local location with the number of walker threads given in the options list. Rather than splitting the
+    # tree up front, every thread pulls its next directory from a shared frontier, which keeps all threads busy however
+    # lopsided the tree is; the threads spend most of their time waiting on directory listings, which release the GIL.
+    #
+    # @param self A pointer to the local class.
+    # @param top The top directory of the walk.
+    # @param numThreads The number of walker threads to launch.
+    # @throws Exception The first error a walker thread ran into, once every walker thread has stopped.
+    def parallelSearch(self, top, numThreads):
+        self.workerError = None
+        frontier = queue.Queue()
+        frontier.put(top)
+
+        workers = []
+        for i in range(numThreads):
+            worker = threading.Thread(target = self.parallelWorker, args = (frontier,))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        # wait for every directory to be searched, then release the walker threads
+        frontier.join()
+        for worker in workers:
+            frontier.put(None)
+        for worker in workers:
+            worker.join()
+        if not self.workerError == None:
+            raise self.workerError
         
+    ## The method executed when the thread starts running.
+    #
+    # @param self A pointer to the local class.
+    def run(self):
+        self.token.start()
+        try:
+            self.traverse()
+        finally:
+            # tell a caller reading matches() that there are no more results to come
+            if self.stream != None:
+                self.stream.put(None)
+
     ## This method is responsible for the top-down traversal from the root directory specified.
     # A full list of search matches is stored in the results list and returned upon search completion.
     # (finish() must be called to actually return this list.)
     #
     # @param self A pointer to the local class.
     # @return The list of the results.
-    def run(self):
+    def traverse(self):
         # the search walk starts at the specified root directory; the search is a top-down traversal
         if self.optionsList[6] == None:
-            # perform a local search
-            for root, dirs, files in self.localWalk(self.optionsList[5]):
-                self.curDir = root
-                value = self.scanItem(root, dirs, files)
-                if value == -1:
-                    break
+            # answer the search from the results of a recent search, if one can
+            if self.answerFromCache():
+                return
+
+            self.startDeepSearchPool()
+            try:
+                index = self.loadIndex()
+                self.loadContentIndex()
+                if index == None and self.optionsList[9] > 1:
+                    # perform a local search split across the requested number of threads
+                    self.parallelSearch(self.optionsList[5], self.optionsList[9])
+                else:
+                    if index != None:
+                        # answer the search from the filename index instead of walking the disk
+                        walk = index.walk(os.path.abspath(self.optionsList[5]))
+                    else:
+                        walk = self.walk(self.optionsList[5])
+
+                    # perform a local search
+                    for root, dirs, files in walk:
+                        self.curDir = root
+                        value = self.scanItem(root, dirs, files)
+                        if value == -1 or self.stopped:
+                            break
+            finally:
+                # wait for the content scans to catch up with the walk
+                self.finishDeepSearchPool()
+                # keep the binary verdicts for the next search
+                Binary.save()
+            self.cacheResults()
         else:
-            # perform a remote search
-            for root, dirs, files in self.ftpWalk(self.optionsList[6], self.optionsList[6].pwd()):
-                self.curDir = root
-                value = self.scanItem(root, dirs, files)
-                if value == -1:
-                    break
+            ftp = self.optionsList[6]
+            # use the listings stored by past searches of the server where they are still up to date
+            if not self.live:
+                self.listings = Listings.Listings(ftp)
+            if self.optionsList[9] > 1 and isinstance(ftp, Remote.Connection):
+                # perform a remote search, listing directories over as many connections as there are threads
+                top = ftp.pwd()
+                self.ftpPool = ftp.connections(self.optionsList[9])
+                try:
+                    self.parallelSearch(top, self.ftpPool.size())
+                finally:
+                    self.ftpPool = None
+            else:
+                # perform a remote search
+                for root, dirs, files in self.ftpWalk(ftp, ftp.pwd()):
+                    self.curDir = root
+                    value = self.scanItem(root, dirs, files)
+                    if value == -1:
+                        break
+            # keep the listings for the next search
+            Listings.save()
             
             # reset the current working directory on the server in case the user does a second search
             if not self.optionsList[5].find('/') == -1:
                 self.optionsList[6].cwd(self.optionsList[5][self.optionsList[5].find('/'):])
             else:
                 self.optionsList[6].cwd('/')
-                
\ No newline at end of file
+                
+
+## A search for a list of patterns at once. The tree is walked a single time: every name is matched against all of the
+# patterns in one pass with an Aho-Corasick automaton, and every file is read once, with a single regular expression
+# picking out the lines that hold any of the patterns. The patterns are always plain text. finish() returns the results
+# of each pattern separately.
+class BatchSearch(Search):
+    ## Initialize the local class variables with passed in variables.
+    #
+    # @param self A pointer to the local class.
+    # @param patterns The list of search strings to be found.
+    # @param optionsList The settings list for how the search will be performed.
+    # @param live True if the disk must be walked even when the filename index covers the root directory.
+    # @param token The CancelToken for stopping the search early; by default, one with the limits in the options list.
+    # @param instruments The Instruments.Instruments to count the calls and times of each phase of the search in, or None.
+    def __init__(self, patterns, optionsList, live = False, token = None, instruments = None):
+        ## The list of search strings to be found, lowercased, without blanks or repeats.
+        self.patterns = []
+        for pattern in patterns:
+            if not pattern.lower() in self.patterns and not pattern.strip() == '':
+                self.patterns.append(pattern.lower())
+
+        Search.__init__(self, ', '.join(self.patterns), optionsList, live, token, instruments)
+
+        ## The automaton that finds every pattern within a name.
+        self.automaton = Matcher.AhoCorasick(self.patterns)
+        ## The patterns as bytes, for searching within files.
+        self.encoded = [pattern.encode('utf-8') for pattern in self.patterns]
+        ## A regular expression matching any of the patterns, used to find the lines worth checking within a file.
+        self.combined = re.compile(b'|'.join([re.escape(pattern) for pattern in self.encoded]))
+        ## The same regular expression for names, used to skip the automaton for the many names that match no pattern.
+        self.combinedNames = re.compile('|'.join([re.escape(pattern) for pattern in self.patterns]))
+        ## The results lists (folders, files, and in files) of each pattern.
+        self.patternResults = [[PathTable.PathList(self.paths), PathTable.PathList(self.paths), PathTable.InFileList(self.paths)] \
+                               for pattern in self.patterns]
+        ## The indices of the patterns that have at least one result.
+        self.found = set()
+
+    ## Executed when the thread is finished.
+    #
+    # @param self A pointer to the local class.
+    # @return A dictionary from each pattern to its list of folders, files, and in files results found.
+    def finish(self):
+        results = {}
+        for i in range(len(self.patterns)):
+            results[self.patterns[i]] = self.patternResults[i]
+        return results
+
+    ## Adds an item to the results lists of one pattern, as well as to the combined results lists that peek() shows.
+    # A Partial Search keeps the first result of each pattern, and is done once every pattern has one.
+    #
+    # @param self A pointer to the local class.
+    # @param results The results list of a pattern to add to.
+    # @param item The item to be added.
+    def addResult(self, results, item):
+        with self.lock:
+            if self.stopped:
+                return
+            for i in range(len(self.patterns)):
+                for kind in range(3):
+                    if self.patternResults[i][kind] is results:
+                        if not self.optionsList[4] and i in self.found:
+                            return
+                        results.append(item)
+                        [self.folderResults, self.fileResults, self.inFileResults][kind].append(item)
+                        self.numMatches += 1
+                        self.streamResult(kind, item, self.patterns[i])
+                        self.found.add(i)
+                        if not self.optionsList[4] and len(self.found) == len(self.patterns):
+                            self.stopped = True
+                        elif self.token.maxResults > 0 and self.numMatches >= self.token.maxResults:
+                            self.token.cancel(STOP_MAX_RESULTS)
+                            self.incomplete = True
+                            self.stopped = True
+                        return
+
+    ## The results of a batch search are never cached.
+    #
+    # @param self A pointer to the local class.
+    # @return False.
+    def cacheable(self):
+        return False
+
+    ## The patterns of a batch search are always plain text, whatever the match mode selected in the options list.
+    #
+    # @param self A pointer to the local class.
+    # @param string The patterns, joined.
+    # @return The literal Matcher.Matcher for the patterns.
+    def compileMatcher(self, string):
+        return Matcher.Matcher(string)
+
+    ## Checks a file or folder name against every pattern.
+    #
+    # @param self A pointer to the local class.
+    # @param name The name of the file or folder.
+    # @return A list of the results lists (folders, files, and in files) of each pattern the name matches.
+    def nameMatches(self, name):
+        name = name.lower()
+        if self.combinedNames.search(name) == None:
+            return []
+        return [self.patternResults[i] for i in self.automaton.search(name)]
+
+    ## Searches within a file for every pattern.
+    #
+    # @param self A pointer to the local class.
+    # @param path The path to the file to be searched.
+    # @param fileName The name of the file to be searched.
+    # @return A list of the results lists of each pattern found within the file, each with the line number(s) of the match.
+    def contentMatches(self, path, fileName):
+        found = searchFileMulti(os.path.join(path, fileName), self.encoded, self.combined, self.isCancelled, self.instruments)
+        return [(self.patternResults[i], found[i]) for i in found]
+
+    ## Returns the function a Deep Search process runs on each batch of files, and the arguments that follow the batch.
+    #
+    # @param self A pointer to the local class.
+    # @return The function and a tuple of its remaining arguments.
+    def deepSearchTask(self):
+        return searchFilesMulti, (self.encoded, self.combined, self.poolInstruments())
+
+    ## Called by the process pool with the matches from one batch of files.
+    #
+    # @param self A pointer to the local class.
+    # @param result A list of the directory and name of each file any pattern was found within, with the line numbers of
+    # each pattern, and the instruments of the batch (or None).
+    def collectDeepSearch(self, result):
+        matches, instruments = result
+        if instruments != None:
+            self.instruments.merge(instruments)
+        for (root, fileName), found in matches:
+            node = self.resultNode(root, fileName)
+            for i in found:
+                self.addResult(self.patternResults[i][2], [node, found[i]])
+        self.inFlight.release()
+
+    ## Looks up the files that may contain any of the patterns in the content index, if a Deep Search can use it.
+    #
+    # @param self A pointer to the local class.
+    def loadContentIndex(self):
+        if self.live or not self.optionsList[0] or not self.optionsList[15]:
+            return
+        # every pattern must be usable with the index, or the index could rule out a file that matches one of them
+        for pattern in self.patterns:
+            if not ContentIndex.usable(pattern):
+                return
+        contentIndex = ContentIndex.load()
+        if contentIndex == None or not contentIndex.covers(self.optionsList[5]):
+            return
+        self.contentIndex = contentIndex
+        self.candidates = set()
+        for pattern in self.patterns:
+            self.candidates |= contentIndex.candidates(pattern)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+# system modules
+import ctypes, ctypes.util, errno, os, select, struct, threading, time
+
+# my modules
+import Search
+
+## This module keeps the filename index in memory up to date while the daemon runs, by asking Linux's inotify to report
+# every entry created in, deleted from, or moved into or out of each indexed directory. The events are gathered for a
+# moment so that a burst of them (an unpacked archive, a build) is applied at once, and only the entries they name are
+# checked against the disk; a new or moved-in directory is listed, along with everything below it, just as a live walk
+# would list it. If the kernel's event queue overflows, the events that were lost cannot be known, so the index is
+# refreshed instead: every directory is stat'ed, but only those whose mtime has changed are listed again.
+#
+# inotify is reached through ctypes, so this only works on Linux; elsewhere the daemon answers from the index as it was
+# last built or refreshed.
+#
+# @file Watcher.py
+# @version 1.2
+
+## The number of seconds to wait for more events once one has arrived, so that a burst is applied all at once.
+COALESCE_DELAY = 0.1
+## The longest number of seconds events are held back while more keep arriving, so that searches see a change within
+# about a second even while the directory tree is busy.
+MAX_DELAY = 0.5
+## The number of seconds the watching thread waits for events before checking whether it has been told to stop.
+POLL_TIMEOUT = 0.5
+## The number of bytes read from inotify at a time.
+READ_SIZE = 64 * 1024
+
+# the inotify flags, from <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+## The events watched in each directory: an entry appearing or disappearing, and the directory itself going away.
+WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW
+
+## The header of each event: the watch descriptor, the mask, the cookie, and the length of the name that follows.
+eventHeader = struct.Struct('iIII')
+
+## The C library, or None if it does not have inotify.
+libc = None
+if hasattr(os, 'uname') and os.uname()[0] == 'Linux':
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno = True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        libc = None
+
+## Checks to see if this platform has inotify.
+#
+# @return True if an index can be watched, False otherwise.
+def available():
+    return not libc == None
+
+## Watches every directory of a filename index and applies the changes reported to the index, from a thread of its own.
+class Watcher(threading.Thread):
+    ## Initialize a watcher of the given index.
+    #
+    # @param self A pointer to the local class.
+    # @param index The Index.Index to keep up to date.
+    # @param optionsList The settings list for how a directory will be listed.
+    # @param lock The lock held while the index is changed, which searches hold while they read it.
+    # @throws OSError If inotify could not be started.
+    def __init__(self, index, optionsList, lock):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        ## The index being kept up to date.
+        self.index = index
+        ## The settings list for how a directory will be listed.
+        self.optionsList = optionsList
+        ## The lock held while the index is changed.
+        self.lock = lock
+        ## The Search whose directory listing is used, so that a directory is listed just as a live walk lists it.
+        self.search = Search.Search('', optionsList)
+        ## True once the watching thread has been told to stop.
+        self.stopped = threading.Event()
+        ## True if the index has changed since it was loaded, so that it should be written back.
+        self.changed = False
+        ## The number of changes applied to the index.
+        self.numChanges = 0
+        ## The number of times the event queue overflowed and the index had to be refreshed.
+        self.numOverflows = 0
+
+        ## Maps each watch descriptor to the absolute path of the directory it watches.
+        self.paths = {}
+        ## Maps the absolute path of each watched directory to its watch descriptor.
+        self.watches = {}
+
+        ## The inotify file descriptor.
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            number = ctypes.get_errno()
+            raise OSError(number, os.strerror(number))
+
+    ## Starts watching every directory in the index, then starts the watching thread.
+    #
+    # @param self A pointer to the local class.
+    # @throws OSError If a directory could not be watched, for instance because the limit on the number of watches
+    # (fs.inotify.max_user_watches) was reached.
+    def start(self):
+        with self.lock:
+            try:
+                for path in list(self.index.dirs):
+                    self.watch(path)
+            except OSError:
+                self.close()
+                raise
+        threading.Thread.start(self)
+
+    ## Tells the watching thread to stop, and waits for it.
+    #
+    # @param self A pointer to the local class.
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+        self.close()
+
+    ## Closes the inotify file descriptor, which removes every watch.
+    #
+    # @param self A pointer to the local class.
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.paths, self.watches = {}, {}
+
+    ## Watches a directory. Watching a directory that is already watched under another path (because it was moved)
+    # moves its watch to the new path.
+    #
+    # @param self A pointer to the local class.
+    # @param path The absolute path of the directory.
+    # @return True if the directory is watched, False if it is gone or is not a directory.
+    # @throws OSError If the directory could not be watched for any other reason.
+    def watch(self, path):
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            number = ctypes.get_errno()
+            if number in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return False
+            raise OSError(number, os.strerror(number), path)
+
+        old = self.paths.get(wd)
+        if not old == None and self.watches.get(old) == wd:
+            del self.watches[old]
+        self.paths[wd] = path
+        self.watches[path] = wd
+        return True
+
+    ## Stops watching the directories that are no longer in the index.
+    #
+    # @param self A pointer to the local class.
+    def unwatchForgotten(self):
+        for path, wd in list(self.watches.items()):
+            if not path in self.index.dirs:
+                libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[path]
+                self.paths.pop(wd, None)
+
+    ## Lists a new directory and everything below it into the index, watching each directory before it is listed so that
+    # no entry added in between is missed.
+    #
+    # @param self A pointer to the local class.
+    # @param top The absolute path of the directory.
+    def record(self, top):
+        stack = [top]
+        while len(stack) > 0:
+            path = stack.pop()
+            if not self.watch(path):
+                self.index.forget(path)
+                continue
+            dirs = self.index.record(self.search, path)
+            if dirs == None:
+                self.index.forget(path)
+                continue
+            for name in reversed(dirs):
+                stack.append(os.path.join(path, name))
+
+    ## Reads the events waiting on the inotify file descriptor.
+    #
+    # @param self A pointer to the local class.
+    # @param changed The set of the directory and name of each entry that has changed, to add to.
+    # @return True if the event queue overflowed or an indexed root itself went away, so that the index must be refreshed.
+    def readEvents(self, changed):
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return False
+
+        refresh = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = eventHeader.unpack_from(data, offset)
+            offset += eventHeader.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            path = self.paths.get(wd)
+            if mask & IN_Q_OVERFLOW:
+                refresh = True
+            elif mask & IN_IGNORED:
+                # the kernel removed the watch when its directory went away
+                if not path == None and self.watches.get(path) == wd:
+                    del self.watches[path]
+                self.paths.pop(wd, None)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # a directory below a root is dealt with by the event in the directory that held it
+                if path in self.index.roots:
+                    refresh = True
+            elif not path == None and len(name) > 0:
+                changed.add((path, name))
+        return refresh
+
+    ## Applies the changes to the index.
+    #
+    # @param self A pointer to the local class.
+    # @param changed The set of the directory and name of each entry that has changed.
+    # @param refresh True if the index must be refreshed because events were lost.
+    def apply(self, changed, refresh):
+        with self.lock:
+            # the index may have been replaced while the lock was waited for
+            if self.stopped.is_set():
+                return
+            if refresh:
+                self.numOverflows += 1
+                for root in self.index.roots[:]:
+                    self.index.refresh(root, self.optionsList)
+                # the directories the refresh listed for the first time are listed again once they are watched, since
+                # entries may have been added to them in between
+                for path in [path for path in self.index.dirs if not path in self.watches]:
+                    if not path in self.watches:
+                        self.record(path)
+            else:
+                for top, name in sorted(changed):
+                    path = self.index.updateEntry(top, name)
+                    if not path == None:
+                        self.record(path)
+            self.unwatchForgotten()
+            self.changed = True
+            self.numChanges += len(changed)
+
+    ## Waits for events and applies them to the index until told to stop. A watch that cannot be added (because the
+    # limit on the number of watches was reached) leaves the directory unwatched, and it is caught up with the next time
+    # the index is refreshed.
+    #
+    # @param self A pointer to the local class.
+    def run(self):
+        while not self.stopped.is_set():
+            if len(select.select([self.fd], [], [], POLL_TIMEOUT)[0]) == 0:
+                continue
+
+            # gather events until none arrive for a moment, or until they have been held back long enough
+            changed, refresh = set(), False
+            started = time.time()
+            while True:
+                refresh = self.readEvents(changed) or refresh
+                wait = min(COALESCE_DELAY, started + MAX_DELAY - time.time())
+                if wait <= 0 or len(select.select([self.fd], [], [], wait)[0]) == 0:
+                    break
+
+            try:
+                self.apply(changed, refresh)
+            except OSError:
+                pass